@@ -4,13 +4,6 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import os
 
-import yaml
-import distutils.version
-
-# Inits the logging system. Only shell logging, and exception and warning catching.
-# File logging can be started by calling log.start_file_logger(name).
-from .utils import log
-
 
 def merge(user, default):
     """Merges a user configuration with the default one."""
@@ -27,18 +20,41 @@ def merge(user, default):
 
 NAME = 'sdss_install'
 
-# Loads config
-yaml_version = distutils.version.StrictVersion(yaml.__version__)
-with open(os.path.dirname(__file__) + '/etc/{0}.yml'.format(NAME)) as ff:
-    if yaml_version >= distutils.version.StrictVersion('5.1'):
-        config = yaml.load(ff, Loader=yaml.FullLoader)
-    else:
-        config = yaml.load(ff)
-
-# If there is a custom configuration file, updates the defaults using it.
-custom_config_fn = os.path.expanduser('~/.{0}/{0}.yml'.format(NAME))
-if os.path.exists(custom_config_fn):
-    config = merge(yaml.load(open(custom_config_fn)), config)
+
+def load_config():
+    """Loads the configuration, updated with the custom configuration file, if any."""
+
+    import yaml
+
+    # yaml.FullLoader is new in PyYAML 5.1
+    loader = getattr(yaml, 'FullLoader', None)
+    with open(os.path.dirname(__file__) + '/etc/{0}.yml'.format(NAME)) as ff:
+        config = yaml.load(ff, Loader=loader) if loader else yaml.load(ff)
+
+    # If there is a custom configuration file, updates the defaults using it.
+    custom_config_fn = os.path.expanduser('~/.{0}/{0}.yml'.format(NAME))
+    if os.path.exists(custom_config_fn):
+        with open(custom_config_fn) as ff:
+            custom_config = yaml.load(ff, Loader=loader) if loader else yaml.load(ff)
+        config = merge(custom_config, config)
+
+    return config
+
+
+def __getattr__(name):
+    """Loads the config and the logging system on first use, which keeps the
+    import of sdss_install, and so the startup of sdss_install, fast."""
+
+    if name == 'config':
+        globals()['config'] = load_config()
+        return globals()['config']
+    elif name == 'log':
+        # Inits the logging system. Only shell logging, and exception and warning catching.
+        # File logging can be started by calling log.start_file_logger(name).
+        from .utils import log
+        globals()['log'] = log
+        return log
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
 
 
 __version__ = '0.2.2dev'
@@ -34,6 +34,9 @@ def sdss_install():
         help='Use evilmake to install product.')
     mode.add_argument('-T', '--make-target', action='store', dest='make_target',
         help='Target to make when installing product.')
+    parser.add_argument('-j', '--jobs', action='store', dest='jobs', metavar='N', type=int,
+        help='Run N parallel make jobs (default: the number of CPUs available; ' +
+        'no_parallel_make = True in etc/config.ini forces 1 make job).')
     parser.add_argument('-d', '--default', action='store_true', dest='default',
         help='Make this version the default version.')
     parser.add_argument('-n', '--no-build', action='store_true', dest='no_build',
@@ -50,6 +53,13 @@ def sdss_install():
         help='Overwrite any existing installation of this product/version.')
     parser.add_argument('-k', '--keep', action='store_true', dest='keep',
         help='Keep the exported build directory.')
+    parser.add_argument('--delta', action='store_true', dest='delta',
+        help='Seed the install of a GitHub tag from the nearest installed version of ' +
+        'the product, with its build products, fetching only the new tag and ' +
+        'rebuilding only what make finds changed.')
+    parser.add_argument('--resume', action='store_true', dest='resume',
+        help='Resume a failed install of this product/version from its work directory, ' +
+        'skipping the phases it completed, e.g. the fetch and the build.')
     parser.add_argument('-m', '--modules-home', action='store', dest='modules_home',
         metavar='DIR',help='Set or override the value of $MODULESHOME',
         default=getenv('MODULESHOME'))
@@ -86,4 +96,93 @@ def sdss_install():
         default=str())
     parser.add_argument('-H', '--https', action='store_true', dest='https',
         help='Use GitHub https instead of ssh', default=False)
+    parser.add_argument('--cache-dir', action='store', dest='cache_dir',
+        metavar='DIR', help='Set or override the value of $SDSS_INSTALL_CACHE_DIR, ' +
+        'the directory of sdss_install caches (default: $SDSS_INSTALL_PRODUCT_ROOT/.cache)',
+        default=getenv('SDSS_INSTALL_CACHE_DIR'))
+    try: ref_cache_ttl = int(environ['SDSS_INSTALL_REF_CACHE_TTL'])
+    except: ref_cache_ttl = 600
+    parser.add_argument('--ref-cache-ttl', action='store', dest='ref_cache_ttl',
+        metavar='SECONDS', type=int, default=ref_cache_ttl,
+        help='Reuse cached GitHub branches and tags for SECONDS (0 disables the on-disk cache).')
+    parser.add_argument('--no-mirror', action='store_true', dest='no_mirror',
+        help='Clone directly from GitHub, without the local mirror in the cache directory.')
+    parser.add_argument('--mirror-dir', action='store', dest='mirror_dir', metavar='DIR',
+        help='Set or override the value of $SDSS_INSTALL_MIRROR_DIR, the directory of ' +
+        'the GitHub mirrors (DIR/git) and SVN snapshots (DIR/svn), e.g. on shared ' +
+        'storage (default: the cache directory).',
+        default=getenv('SDSS_INSTALL_MIRROR_DIR'))
+    parser.add_argument('--offline', action='store_true', dest='offline',
+        help='Install only from the mirror directory, without contacting GitHub or SVN. ' +
+        'The mirrors are refreshed by sdss_install_mirror on a connected host.')
+    parser.add_argument('--shallow', action='store_true', dest='shallow',
+        help='Clone only the requested GitHub branch or tag, without its history.')
+    parser.add_argument('--filter-blobs', action='store_true', dest='filter_blobs',
+        help='With --shallow, make a partial clone (--filter=blob:none) when cloning from GitHub.')
+    parser.add_argument('--log-dir', action='store', dest='log_dir', metavar='DIR',
+        help='Write the output of the commands of each install phase to ' +
+        'DIR/PRODUCT-VERSION/PHASE.log.')
+    parser.add_argument('--include', action='append', dest='include', metavar='PATH',
+        help='Fetch only PATH of the product (may be repeated, or a comma separated ' +
+        'list), besides its top-level files and etc/ (default: the include option ' +
+        'of the product etc/config.ini).')
+    parser.add_argument('--exclude', action='append', dest='exclude', metavar='PATH',
+        help='Do not fetch the directory PATH of the product (may be repeated, or a ' +
+        'comma separated list; default: the exclude option of the product etc/config.ini).')
+    parser.add_argument('--svn-parallel', action='store_true', dest='svn_parallel',
+        help='Export the top-level subdirectories of SVN products with at most ' +
+        '--workers concurrent exports, all at the same revision.')
+    parser.add_argument('--artifact-cache', action='store_true', dest='artifact_cache',
+        help='Restore the install from the artifact cache, if the same commit was ' +
+        'already built with the same build type, Python and dependencies, ' +
+        'and store new installs in it.')
+    parser.add_argument('--wheel', action='store_true', dest='wheel',
+        help='Install tagged Python products from a wheel, built with pip once per ' +
+        'product, version, revision and Python ABI and kept in the wheel cache ' +
+        '(CACHE_DIR/wheels), instead of running setup.py install.')
+    parser.add_argument('--compile-bytecode', action='store_true', dest='compile_bytecode',
+        help='Compile the python/ and site-packages trees of the install to bytecode, ' +
+        'in parallel.')
+    parser.add_argument('--bytecode-mode', action='store', dest='bytecode_mode',
+        metavar='MODE', default='checked-hash',
+        choices=['timestamp','checked-hash','unchecked-hash'],
+        help='Set the .pyc invalidation MODE of --compile-bytecode: timestamp, ' +
+        'checked-hash (the default) or unchecked-hash.')
+    parser.add_argument('--dedup', action='store_true', dest='dedup',
+        help='Replace the files of tag installs by hardlinks to a single copy of each ' +
+        'file in the content-addressed store $SDSS_INSTALL_PRODUCT_ROOT/.store.')
+    parser.add_argument('--gc', action='store_true', dest='gc',
+        help='Remove the files of the store of --dedup which are no longer used ' +
+        'by any install (with --test, only report them).')
+    parser.add_argument('--report', action='store', dest='report', metavar='FILE',
+        help='Write the wall time, CPU time, subprocesses and output, disk and network ' +
+        'bytes of each install phase and subprocess to the JSON file FILE. Network ' +
+        'bytes are those of the host during each phase (Linux only).')
+    parser.add_argument('--index', action='store', dest='index', metavar='FILE',
+        help='Set or override the value of $SDSS_INSTALL_INDEX, the SQLite index of the ' +
+        'installed products, updated by each install (default: ' +
+        '$SDSS_INSTALL_PRODUCT_ROOT/.sdss_install.db).',
+        default=getenv('SDSS_INSTALL_INDEX'))
+    parser.add_argument('--list', action='store_true', dest='list',
+        help='List the installed products, or the versions of product, from the index.')
+    parser.add_argument('--query', action='store', dest='query', metavar='SQL',
+        help='Print the result of the read-only SQL query of the index, e.g. ' +
+        '"SELECT product, version FROM dependencies WHERE dependency = \'tree\'".')
+    parser.add_argument('--manifest', action='store', dest='manifest',
+        metavar='FILE', help='Install the products and versions listed in the YAML or JSON ' +
+        'manifest FILE, in dependency order.')
+    parser.add_argument('--workers', action='store', dest='workers', metavar='N',
+        type=int, default=4, help='Run at most N concurrent installs with --manifest, ' +
+        'and at most N concurrent fetches of external dependencies or svn exports ' +
+        'with --svn-parallel.')
+    return parser
+
+
+def sdss_install_mirror():
+    '''Add command line arguments for bin file sdss_install_mirror'''
+    parser = sdss_install()
+    parser.description = ('Create or refresh the GitHub mirror of a product (-G), ' +
+                          'or the SVN snapshot of a product version, in the mirror ' +
+                          'directory used by sdss_install --offline. With --manifest, ' +
+                          'refresh every product of the manifest.')
     return parser
@@ -4,24 +4,25 @@
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 # The line above will help with 2to3 support.
-import glob
 import logging
-import subprocess
 import datetime
-from sys import argv, executable, path
+from sys import argv, executable, path, version_info
 from shutil import copyfile, copytree, rmtree
-from os import chdir, environ, getcwd, getenv, makedirs, walk
-from os.path import basename, dirname, exists, isdir, join
-from subprocess import Popen, PIPE
-from argparse import ArgumentParser
-from json import loads, dumps, load
-try: from ConfigParser import SafeConfigParser, RawConfigParser
-except ImportError: from configparser import SafeConfigParser, RawConfigParser
+from os import chdir, environ, getcwd, getenv, listdir, makedirs, remove, rename, walk
+from os.path import basename, dirname, exists, isdir, isfile, join, relpath
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from glob import glob
+from json import load
+from re import findall
 #from .most_recent_tag import most_recent_tag
 from .modules import Modules
-from sdss_install.application import Argument
-from sdss_install.install4 import Install4
-from sdss_install.install5 import Install5
+from sdss_install.utils.cache import get_cache_dir
+from sdss_install.utils.checkpoint import Checkpoint
+from sdss_install.utils.cpu import get_cpu_count
+from sdss_install.utils.execute import execute_command
+from sdss_install.utils.lock import Lock
+from sdss_install.utils.report import report
 
 class Install:
     '''
@@ -29,6 +30,9 @@ class Install:
         for SVN and GitHub installations, respectively
     '''
 
+    # Number of lines of command output kept for error messages
+    output_tail = 1000
+
     def __init__(self, options=None):
         self.set_options(options=options)
         self.set_logger(options=options)
@@ -77,14 +81,24 @@ class Install:
         self.build_type = None
         self.github_remote_url = None
         self.external_product = None
+        self.artifact_key = None
+        self.restored = False
+        self.seeded = False
+        self.no_parallel_make = False
+        self.checkpoint = None
+        self.lock = None
+        self.reused = False
+        self.started = datetime.datetime.now()
 
     def set_install4(self):
         '''Set a class Install4 instance.'''
+        from sdss_install.install4 import Install4
         self.install4 = Install4(logger=self.logger, options=self.options)
         if not self.install4: self.logger.error('Unable to set self.install4')
 
     def set_install5(self):
         '''Set a class Install5 instance.'''
+        from sdss_install.install5 import Install5
         self.install5 = Install5(logger=self.logger, options=self.options)
         if not self.install5: self.logger.error('Unable to set self.install5')
 
@@ -128,6 +142,7 @@ class Install:
                 self.install4.build_type    = self.build_type
             else: self.logger.error('Unable to export_data to class Install5')
 
+    @report.phase
     def set_ready(self):
         '''Call set_ready() of class Install4 or class Install5.'''
         self.ready = self.logger and self.options
@@ -142,6 +157,7 @@ class Install:
                 else: self.ready = False
             if self.ready: self.import_data()
 
+    @report.phase
     def set_product(self):
         '''Call set_product() of class Install4 or class Install5.'''
         if self.ready:
@@ -149,6 +165,7 @@ class Install:
             else:                   self.install4.set_product()
             self.import_data()
 
+    @report.phase
     def set_directory(self):
         '''
             Initialize dict self.directory and set value for key 'original' to
@@ -163,6 +180,7 @@ class Install:
                 self.ready = False
             self.export_data()
 
+    @report.phase
     def set_directory_install(self):
         '''Set dict self.directory values for keys 'root' and 'install'.'''
         if self.ready:
@@ -208,33 +226,197 @@ class Install:
                                              self.product['version'])
             self.export_data()
 
+    def get_done_path(self):
+        '''Return the path of the completion marker of the product version.'''
+        return join(dirname(self.directory['install']),".%(version)s.done" % self.product)
+
+    def lock_install(self):
+        '''
+            Acquire the lock of the product version in the product root, held
+            until finalize(), so that concurrent installs of the same product
+            version run one after the other. If this one had to wait and the
+            process holding the lock completed the install, as recorded by the
+            completion marker written by finalize(), its install is reused.
+            Otherwise the marker is removed before installing.
+        '''
+        if self.ready and not self.options.test:
+            self.lock = Lock(path=join(dirname(self.directory['install']),
+                                       ".%(version)s.lock" % self.product),
+                             timeout=0)
+            if not self.lock.acquire():
+                self.logger.info("Waiting for another install of %(name)s %(version)s"
+                                 % self.product)
+                self.lock.timeout = None
+                self.ready = self.lock.acquire()
+                if not self.ready:
+                    self.logger.error("Unable to lock {}".format(self.lock.path))
+                elif (not self.options.module_only and
+                      isfile(self.get_done_path()) and isdir(self.directory['install'])):
+                    self.reused = True
+                    self.logger.info("Reusing %(install)s, installed by another process"
+                                     % self.directory)
+            if self.ready and not self.reused and not self.options.module_only:
+                try: remove(self.get_done_path())
+                except OSError: pass
+
+    def mark_install(self):
+        '''Write the completion marker of the product version, while it is locked.'''
+        if (self.ready and self.lock and not self.reused and not self.options.module_only
+            and isdir(self.directory['install'])):
+            try: open(self.get_done_path(),'w').close()
+            except (IOError,OSError) as e:
+                self.logger.warning("Unable to write {0}: {1}".format(self.get_done_path(),e))
+
+    def unlock_install(self):
+        '''Release the lock of the product version.'''
+        if self.lock:
+            self.lock.release()
+            self.lock = None
+
+    @report.phase
     def set_directory_work(self):
         '''
             Set dict self.directory value for key 'work',
             used to install product and/or module file.
-            Remove existing work directory.
+            Remove existing work directory, unless it is resumed (--resume).
         '''
         if self.ready:
             self.import_data()
             if self.options.module_only:
                 self.directory['work']=self.directory['install']
             else:
-                self.directory['work'] = join(self.directory['original'],
-                                             "%(name)s-%(version)s" %
-                                             self.product)
-                if isdir(self.directory['work']):
+                if self.options.test or self.options.keep:
+                    self.directory['work'] = join(self.directory['original'],
+                                                 "%(name)s-%(version)s" %
+                                                 self.product)
+                else:
+                    # Stage next to the install directory, on the same
+                    # filesystem, so the work tree can be renamed into place.
+                    self.directory['work'] = join(dirname(self.directory['install']),
+                                                 ".%(version)s.work" % self.product)
+                self.set_checkpoint()
+                if (isdir(self.directory['work']) and
+                    not (self.checkpoint and self.checkpoint.phases)):
                     self.logger.info("Detected old working directory, " +
                         "%(work)s. Deleting..." % self.directory)
                     rmtree(self.directory['work'])
+                if not isdir(dirname(self.directory['work'])):
+                    try: makedirs(dirname(self.directory['work']))
+                    except OSError as ose:
+                        self.logger.error("mkdir: " +
+                            "cannot create directory '{0}': {1}"
+                            .format(dirname(self.directory['work']),ose.strerror))
+                        self.ready = False
             self.export_data()
 
+    def get_checkpoint_key(self):
+        '''Return the key of the checkpoint: the product, version and build options.'''
+        return {'product': self.product['name'],
+                'version': self.product['version'],
+                'github': bool(self.options.github),
+                'options': dict((option,getattr(self.options,option,None))
+                                for option in ('evilmake','force_build_type','make_target',
+                                               'no_build','no_python_package',
+                                               'documentation','include','exclude'))}
+
+    def set_checkpoint(self):
+        '''
+            Set self.checkpoint, the completed phases of the install, kept in its
+            work directory. With --resume, the checkpoint of a previous run of the
+            same install is loaded, after moving back the work directory which a
+            failed trunk or branch install had moved into place.
+        '''
+        self.checkpoint = None
+        if self.ready and not self.options.test:
+            self.checkpoint = Checkpoint(directory=self.directory['work'],
+                                         key=self.get_checkpoint_key())
+            if self.options.resume:
+                moved = Checkpoint(directory=self.directory['install'],key=self.checkpoint.key)
+                if not isdir(self.directory['work']) and moved.load():
+                    self.logger.info("Moving %(install)s back to %(work)s" % self.directory)
+                    rename(self.directory['install'],self.directory['work'])
+                if isdir(self.directory['work']) and self.checkpoint.load():
+                    if ('install_directory' in self.checkpoint and
+                        not isdir(self.directory['install'])):
+                        self.checkpoint.reset(phase='install_directory')
+                    if self.checkpoint.phases:
+                        self.logger.info("Resuming the install in %(work)s after: "
+                                         % self.directory + ', '.join(self.checkpoint.phases))
+                elif isdir(self.directory['work']):
+                    self.logger.info("No checkpoint of this install in %(work)s"
+                                     % self.directory)
+
+    def is_checkpoint(self,phase=None):
+        '''Return True if phase was completed by a previous run, or this one.'''
+        return bool(self.checkpoint and phase in self.checkpoint)
+
+    def add_checkpoint(self,phase=None):
+        '''Record the completed phase in the checkpoint of the install.'''
+        if self.ready and self.checkpoint:
+            # A trunk or branch work directory is moved into place by build()
+            self.checkpoint.directory = (self.directory['work']
+                                         if isdir(self.directory['work'])
+                                         else self.directory['install'])
+            if not self.checkpoint.add(phase=phase):
+                self.logger.debug("Unable to write the checkpoint {}"
+                                  .format(self.checkpoint.get_path()))
+
+    def remove_checkpoint(self):
+        '''Remove the checkpoint files of a finished install.'''
+        if self.checkpoint:
+            for directory in (self.directory['work'],self.directory['install']):
+                self.checkpoint.directory = directory
+                self.checkpoint.remove()
+
+    def get_revision(self,remote=False):
+        '''
+            Return the revision of the product version, or None if unknown: the
+            git commit checked out in the work directory, or, if remote, the
+            commit of the GitHub branch or tag in its repository, which is not
+            taken from the ref cache for branches, since their heads move.
+            For SVN, the last changed revision of the product version.
+        '''
+        revision = None
+        if self.options.github and remote:
+            refs = (self.install5.get_refs(version=self.product['version'],
+                                           fresh=not self.product.get('is_tag'))
+                    if self.install5 else None)
+            if refs:
+                revision = refs['tags' if self.product.get('is_tag') else 'heads'].get(
+                    self.product['version'])
+            return revision
+        if not self.options.github and self.product.get('last_changed_revision'):
+            return 'r' + self.product['last_changed_revision']
+        if self.options.github:
+            command = ['git','-C',self.directory['work'],'rev-parse','HEAD']
+        else:
+            url = self.product['url']
+            if self.product.get('revision'): url += '@' + self.product['revision']
+            command = self.svncommand + ['info',url]
+        (out,err,proc_returncode) = self.execute_command(command=command)
+        if proc_returncode == 0 and out:
+            if self.options.github: revision = out.strip()
+            else:
+                for line in out.splitlines():
+                    if line.startswith('Last Changed Rev:'):
+                        revision = 'r' + line.split(':',1)[1].strip()
+        return revision
+
+    @report.phase
     def clean_directory_install(self,install_dir=None):
-        '''Remove existing install directory if exists and if option --force.'''
+        '''
+            Remove existing install directory if exists and if option --force.
+            The product install directory is moved aside, and only removed by
+            finalize() once the new install has succeeded.
+        '''
         if self.ready:
             self.import_data()
+            backup = not install_dir
             install_dir = install_dir if install_dir else self.directory['install']
             if isdir(install_dir) and not self.options.test:
-                if self.options.force:
+                if backup and self.is_checkpoint('install_directory'):
+                    self.logger.info("Resuming the install in %(install)s" % self.directory)
+                elif self.options.force:
                     try: cwd = getcwd()
                     except OSError as ose:
                         self.logger.error("Check current directory: {0}".format(ose.strerror))
@@ -250,7 +432,13 @@ class Install:
                         else:
                             self.logger.info("Preparing to install in " +
                                 "{} (overwriting due to force option)".format(install_dir))
-                            rmtree(install_dir)
+                            if backup:
+                                self.directory['backup'] = join(dirname(install_dir),
+                                    ".%(version)s.old" % self.product)
+                                if isdir(self.directory['backup']):
+                                    rmtree(self.directory['backup'])
+                                rename(install_dir,self.directory['backup'])
+                            else: rmtree(install_dir)
                 else:
                     self.logger.error("Install directory, %(install)s, already exists!"
                         % self.directory)
@@ -261,51 +449,156 @@ class Install:
                 % self.directory)
             self.export_data()
 
+    def restore_directory_install(self):
+        '''
+            Remove the install directory moved aside by --force if the install
+            succeeded, otherwise put it back in place of the failed install.
+        '''
+        backup = self.directory.get('backup') if self.directory else None
+        if backup and isdir(backup):
+            if self.ready:
+                rmtree(backup,ignore_errors=True)
+            else:
+                self.logger.info("Restoring previous install %(install)s" % self.directory)
+                if self.checkpoint:
+                    # Keep a failed trunk or branch install, moved into place, to resume it
+                    moved = Checkpoint(directory=self.directory['install'],
+                                       key=self.checkpoint.key)
+                    if not isdir(self.directory['work']) and moved.load():
+                        rename(self.directory['install'],self.directory['work'])
+                    self.checkpoint.reset(phase='install_directory')
+                    self.checkpoint.directory = self.directory['work']
+                    if isdir(self.directory['work']): self.checkpoint.save()
+                if isdir(self.directory['install']):
+                    rmtree(self.directory['install'],ignore_errors=True)
+                rename(backup,self.directory['install'])
+
     def set_sdss_github_remote_url():
         '''Wrapper for method Install5.set_sdss_github_remote_url()'''
         if self.ready and self.options.github and self.install5:
             self.install5.set_sdss_github_remote_url()
             self.import_data()
 
+    @report.phase
     def set_svncommand(self):
         '''Wrapper for method Install4.set_svncommand()'''
         if self.ready and not self.options.github:
             self.install4.set_svncommand()
 
+    @report.phase
     def set_exists(self):
         '''Call set_exists() of class Install4 or class Install5'''
         if self.ready:
             if not self.options.github: self.install4.set_exists()
             self.import_data()
 
+    @report.phase
     def fetch(self):
-        '''Call set_fetch() of class Install4 or class Install5'''
+        '''
+            Call set_fetch() of class Install4 or class Install5, unless the fetch
+            of the same revision is resumed (--resume).
+        '''
+        if self.ready and self.is_checkpoint('fetch'):
+            revision = self.get_revision(remote=True)
+            if revision == self.checkpoint.revision:
+                self.logger.info("Skipping fetch of %(name)s %(version)s (resumed)"
+                                 % self.product)
+                return
+            self.logger.info("Revision changed from {0} to {1}. Fetching again."
+                             .format(self.checkpoint.revision,revision))
+            if ('install_directory' in self.checkpoint and
+                isdir(self.directory['install'])):
+                rmtree(self.directory['install'])
+            rmtree(self.directory['work'])
+            self.checkpoint.reset()
         if self.ready:
-            if self.options.github: self.install5.fetch()
-            else:                   self.install4.fetch()
+            if self.options.github:
+                if not self.fetch_delta(): self.install5.fetch()
+            else: self.install4.fetch()
             self.import_data()
+            if self.checkpoint:
+                self.checkpoint.revision = self.get_revision()
+                self.add_checkpoint(phase='fetch')
+
+    @staticmethod
+    def get_version_key(version=None):
+        '''Return the sort key of version, comparing its numbers as numbers.'''
+        return tuple((0,int(token),'') if token.isdigit() else (1,0,token)
+                     for token in findall(r'\d+|\D+',version))
+
+    def get_delta_source(self):
+        '''
+            Return the install directory of the installed version of the product
+            nearest to, preferably below, this version, which is a git working
+            tree with its modulefile template, i.e. not a Python package, or None.
+        '''
+        product_dir = dirname(self.directory['install'])
+        candidates = list()
+        for version in (listdir(product_dir) if isdir(product_dir) else list()):
+            path = join(product_dir,version)
+            if (version != self.product['version'] and not version.startswith('.') and
+                isdir(join(path,'.git')) and
+                exists(join(path,'etc',self.product['name'] + '.module'))):
+                candidates.append((self.get_version_key(version),path))
+        key = self.get_version_key(self.product['version'])
+        lower = [candidate for candidate in candidates if candidate[0] < key]
+        return (max(lower)[1] if lower else
+                min(candidates)[1] if candidates else None)
 
+    def fetch_delta(self):
+        '''
+            Seed the work directory of a tag install from the nearest installed
+            version of the product (--delta), fetching only the difference.
+            Return True on success. Otherwise, the partial work directory is
+            removed, for a full fetch.
+        '''
+        seeded = False
+        if self.ready and self.options.delta and self.product.get('is_tag'):
+            source_dir = self.get_delta_source()
+            if source_dir:
+                self.logger.info("Seeding %(work)s from " % self.directory + source_dir)
+                self.install5.delta(source_dir=source_dir)
+                seeded = self.seeded = self.install5.ready
+                if not seeded:
+                    self.logger.warning("Unable to seed %(work)s. " % self.directory +
+                                        "Fetching %(name)s %(version)s in full." % self.product)
+                    rmtree(self.directory['work'],ignore_errors=True)
+                    self.install5.ready = True
+            else:
+                self.logger.info("No installed version of %(name)s to seed " % self.product +
+                                 "the install from. Fetching in full.")
+        return seeded
+
+    @report.phase
     def install_external_dependencies(self):
-        '''Install external dependencies.'''
+        '''
+            Install external dependencies, fetching at most --workers of them
+            concurrently, then set their paths in the order they are listed.
+        '''
         if self.ready:
             if (self.options.external_dependencies and
                 isinstance(self.options.external_dependencies,dict)
                 ):
+                install_products = list()
+                paths_list = list()
                 for key in self.options.external_dependencies:
-                    if self.ready:
-                        self.external_product = dict()
-                        external_dependency = self.options.external_dependencies[key]
-                        install_product = (external_dependency['install_product']
+                    external_dependency = self.options.external_dependencies[key]
+                    install_products.append(external_dependency['install_product']
                                             if external_dependency
                                             and 'install_product' in external_dependency
                                             else None)
-                        paths = (external_dependency['paths']
-                                 if external_dependency
-                                 and 'paths' in external_dependency
-                                 else None)
-                        if install_product:
-                            self.install_external_product(install_product=install_product)
-                        else:
+                    paths_list.append(external_dependency['paths']
+                                      if external_dependency
+                                      and 'paths' in external_dependency
+                                      else None)
+                workers = max(1,min(self.options.workers or 1,len(install_products)))
+                with ThreadPoolExecutor(max_workers=workers) as executor:
+                    installs = list(executor.map(self.get_external_install,install_products))
+                for (install,install_product,paths) in zip(installs,install_products,paths_list):
+                    if self.ready:
+                        self.external_product = install.external_product
+                        self.ready = install.ready
+                        if not install_product:
                             self.logger.debug('No install_product found.')
                         # Needs to be called after self.install_external_product()
                         if paths:
@@ -321,6 +614,23 @@ class Install:
                                         .format(isinstance(self.options.external_dependencies,dict))
                                         )
 
+    def get_external_install(self,install_product=None):
+        '''
+            Return a copy of this install, with its own Install4 and Install5
+            instances, which has installed the given external product. The
+            copies let several external products be fetched concurrently.
+        '''
+        install = copy(self)
+        install.external_product = dict()
+        if getattr(self,'install4',None): install.install4 = copy(self.install4)
+        install.set_install5()
+        install.install5.ready = self.ready
+        install.install5.product = self.product
+        install.install5.directory = self.directory
+        if install_product:
+            install.install_external_product(install_product=install_product)
+        return install
+
     def install_external_product(self,install_product=None):
         '''Install external products'''
         if self.ready:
@@ -391,13 +701,15 @@ class Install:
                                                version=version))
                     self.ready = self.ready and self.install5.ready
                 if self.ready:
-                    self.set_external_product_install_dir()
-                    self.clean_directory_install(
-                        install_dir=dirname(self.external_product['install_dir']))
-                    self.install5.external_product = self.external_product
-                    self.install5.clone()
-                    self.ready = self.ready and self.install5.ready
-                    self.install5.checkout()
+                    # The product directory is removed by --force, so lock the product
+                    with Lock(path=join(self.directory['root'],'external','.%s.lock' % product)):
+                        self.set_external_product_install_dir()
+                        self.clean_directory_install(
+                            install_dir=dirname(self.external_product['install_dir']))
+                        self.install5.external_product = self.external_product
+                        self.install5.clone()
+                        self.ready = self.ready and self.install5.ready
+                        self.install5.checkout()
             else:
                 self.ready = False
                 self.logger.error('Unable to install_external_github_product. ' +
@@ -519,17 +831,20 @@ class Install:
                   self.logger.info('WARNING: Unable to set_external_path. ' +
                                     'path: {0}, path_type: {1}'.format(path,path_type))
 
+    @report.phase
     def checkout(self):
         '''Call Install5.checkout'''
         if self.ready:
             self.install5.checkout()
             self.import_data()
 
+    @report.phase
     def set_sdss_github_remote_url(self):
         '''Set the set_sdss_github_remote_url() of class Install5'''
         if self.ready and self.options.github:
             self.install5.set_sdss_github_remote_url()
 
+    @report.phase
     def reset_options_from_config(self):
         '''
             Set absent command-line options from etc/config.ini file,
@@ -544,6 +859,8 @@ class Install:
             config_filename = join('etc','config.ini')
             config_file = join(self.directory['work'],config_filename)
             if exists(config_file):
+                try: from ConfigParser import SafeConfigParser
+                except ImportError: from configparser import SafeConfigParser
                 config = SafeConfigParser()
                 try: config.optionxform = unicode
                 except: config.optionxform = str
@@ -616,6 +933,13 @@ class Install:
                                     .format(config_filename,
                                             self.options.make_target))
                         except: pass
+                    elif option=='no_parallel_make':
+                        try:
+                            if config.getboolean(section,option):
+                                self.no_parallel_make = True
+                                self.logger.info("Using {0} to disable parallel make"
+                                    .format(join('etc','config.ini')))
+                        except: pass
                     elif option=='evilmake' and not self.options.evilmake:
                         try:
                             self.options.evilmake = config.getboolean(section,
@@ -624,10 +948,13 @@ class Install:
                                 self.logger.info("Using {0} to set " +
                                     "--evilmake option".format(config_filename))
                         except: pass
+                    elif option in ('include','exclude'):
+                        pass # Read before the fetch, by Install4 or Install5
                     else:
                         self.logger.error('Unable to process_install_section. ' +
                             'config={0}, section={1}'.format(config,section))
 
+    @report.phase
     def set_build_type(self):
         '''Analyze the code to determine the build type'''
         self.build_message = None
@@ -651,10 +978,12 @@ class Install:
                     self.build_message = ("Proceeding without a setup.py " +
                         "or Makefile...")
 
+    @report.phase
     def logger_build_message(self):
         '''Log the build message.'''
         if self.build_message: self.logger.info(self.build_message)
 
+    @report.phase
     def make_directory_install(self):
         '''Make install directory.'''
         # If this is a trunk or branch install or nothing to build,
@@ -665,12 +994,18 @@ class Install:
                     self.options.evilmake or not
                     self.build_type or
                     self.options.test):
+                if self.is_checkpoint('install_directory'):
+                    if self.is_checkpoint('build'): return
+                    # Discard the output of the build which did not complete
+                    rmtree(self.directory['install'])
                 try:
                     makedirs(self.directory['install'])
                 except OSError as ose:
                     self.logger.error(ose.strerror)
                     self.ready = False
+                self.add_checkpoint(phase='install_directory')
 
+    @report.phase
     def set_modules(self):
         '''Set a class Modules instance.'''
         self.modules = Modules(options=self.options,
@@ -679,15 +1014,133 @@ class Install:
                                directory=self.directory,
                                build_type=self.build_type)
 
+    @report.phase
     def set_environ(self):
-        '''Set environment variables WORKING_DIR and INSTALL_DIR.'''
+        '''
+            Set environment variables WORKING_DIR and INSTALL_DIR, and MAKEFLAGS
+            for parallel recursive makes, unless MAKEFLAGS already sets a job count.
+        '''
         if self.ready:
             environ['WORKING_DIR'] = self.directory['work']
             environ['INSTALL_DIR'] = self.directory['install']
+            jobs = self.get_jobs()
+            makeflags = environ.get('MAKEFLAGS',str())
+            if jobs > 1 and '-j' not in makeflags:
+                environ['MAKEFLAGS'] = ('-j{} '.format(jobs) + makeflags).strip()
 
+    def get_jobs(self,make=True):
+        '''
+            Return the number of parallel jobs (--jobs, default the available
+            CPUs). The make jobs are 1 for no_parallel_make in etc/config.ini,
+            which does not apply to the other jobs.
+        '''
+        if not self.options.jobs: self.options.jobs = get_cpu_count()
+        return 1 if make and self.no_parallel_make else max(1,self.options.jobs)
+
+    def get_make_command(self, target=None):
+        '''Return the make command, with the --jobs option if parallel.'''
+        jobs = self.get_jobs()
+        command = ['make','-j',str(jobs)] if jobs > 1 else ['make']
+        return command + [target] if target else command
+
+    def set_artifact_key(self):
+        '''
+            Set self.artifact_key to everything which determines the install tree:
+            the product, its git commit or SVN revision, the install directory,
+            whose absolute path is recorded in .pyc files, egg-info and rpaths,
+            the build type and options, the Python version and the loaded
+            dependency versions. Trunk and
+            branch installs, working trees which may be updated in place, are
+            not cached, since the cache hardlinks their files.
+        '''
+        self.artifact_key = None
+        if self.ready and self.options.artifact_cache and self.product['is_not_tag']:
+            self.logger.info("Not using the artifact cache for %(name)s %(version)s, "
+                             % self.product + "a trunk or branch install")
+        elif self.ready and self.options.artifact_cache and isdir(self.directory['work']):
+            revision = self.get_revision()
+            if revision:
+                dependencies = list()
+                if self.modules and self.modules.dependencies:
+                    for (product,version) in self.modules.dependencies:
+                        product_dir = environ.get(basename(product).upper() + '_DIR')
+                        dependencies.append([product,version,product_dir])
+                keywords = getattr(self.modules,'keywords',None) if self.modules else None
+                self.artifact_key = {
+                    'product': self.product['name'],
+                    'version': self.product['version'],
+                    'revision': revision,
+                    'install': self.directory['install'],
+                    'build_type': sorted(self.build_type) if self.build_type else None,
+                    'sparse': self.product.get('sparse'),
+                    'options': [self.options.evilmake,
+                                self.options.no_python_package,
+                                self.options.make_target,
+                                self.options.documentation],
+                    'pyversion': (keywords['pyversion'] if keywords
+                                  else "python{0:d}.{1:d}".format(*version_info)),
+                    'python': executable,
+                    'dependencies': sorted(dependencies)}
+            else:
+                self.logger.debug('Unable to determine the revision of %(name)s/%(version)s'
+                                  % self.product + ', not using the artifact cache.')
+
+    def get_artifacts(self):
+        '''Return the artifact cache, or None if there is no cache directory.'''
+        cache_dir = get_cache_dir(options=self.options)
+        from sdss_install.utils.artifacts import Artifacts
+        return Artifacts(directory=join(cache_dir,'artifacts')) if cache_dir else None
+
+    @report.phase
+    def restore_artifact(self):
+        '''
+            Restore the install directory from the artifact cache (--artifact-cache),
+            in which case build, build_documentation and build_package are skipped.
+        '''
+        if self.ready and not self.options.test:
+            self.set_artifact_key()
+            artifacts = self.get_artifacts() if self.artifact_key else None
+            path = artifacts.get_path(key=self.artifact_key) if artifacts else None
+            if path and isdir(path):
+                restore_dir = join(dirname(self.directory['install']),
+                                   '.{0}.artifact'.format(self.product['version']))
+                if isdir(restore_dir): rmtree(restore_dir)
+                if artifacts.restore(key=self.artifact_key,destination=restore_dir):
+                    if isdir(self.directory['install']):
+                        rmtree(self.directory['install'])
+                    rename(restore_dir,self.directory['install'])
+                    self.restored = True
+                    self.logger.info("Restored %(install)s from the artifact cache"
+                                     % self.directory)
+                else:
+                    self.logger.warning("Unable to restore {0} from {1}"
+                        .format(self.directory['install'],path))
+
+    @report.phase
+    def store_artifact(self):
+        '''Store the finished install directory in the artifact cache (--artifact-cache).'''
+        if (self.ready and self.artifact_key and not self.restored
+            and not self.options.test and isdir(self.directory['install'])):
+            artifacts = self.get_artifacts()
+            if artifacts and artifacts.store(key=self.artifact_key,
+                                             source=self.directory['install']):
+                self.logger.info("Stored %(install)s in the artifact cache"
+                                 % self.directory)
+            else:
+                self.logger.warning("Unable to store %(install)s in the artifact cache"
+                                    % self.directory)
+
+    @report.phase
     def build(self):
         '''Build the installed product.'''
-        if self.ready:
+        if self.ready and not self.restored and self.is_checkpoint('build'):
+            self.logger.info("Skipping build of %(name)s %(version)s (resumed)" % self.product)
+            self.package = not (self.product['is_not_tag'] or
+                                self.options.no_python_package or
+                                self.options.evilmake or not
+                                self.build_type)
+            chdir(self.directory['work'] if self.package else self.directory['install'])
+        elif self.ready and not self.restored:
             if (self.product['is_not_tag'] or
                 self.options.no_python_package or
                 self.options.evilmake or not
@@ -698,21 +1151,26 @@ class Install:
                 else:
                     self.logger.info("Installing in %(install)s" %
                         self.directory)
-                    copytree(self.directory['work'],self.directory['install'])
+                    self.move_directory_work()
                     chdir(self.directory['install'])
                     if 'evilmake' in self.build_type:
                         if not self.options.skip_module:
                             self.modules.load(product=self.product['name'],
                                               version=self.product['version'])
-                        command = ['evilmake','clean']
-                        self.logger.info('Running "{0}" in {1}'
-                            .format(' '.join(command),
-                                    self.directory['install']))
-                        (out,err,proc_returncode) = self.execute_command(command=command)
-                        self.logger.debug(out)
-                        if proc_returncode != 0:
-                            self.logger.error("Evilmake response:")
-                            self.logger.error(err)
+                        # Keep the build products of a tree seeded by --delta
+                        if self.seeded:
+                            self.logger.info("Skipping evilmake clean of %(install)s (--delta)"
+                                             % self.directory)
+                        else:
+                            command = ['evilmake','clean']
+                            self.logger.info('Running "{0}" in {1}'
+                                .format(' '.join(command),
+                                        self.directory['install']))
+                            (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                             phase='build')
+                            if proc_returncode != 0:
+                                self.logger.error("Evilmake response:")
+                                self.logger.error(err)
                         command = ['evilmake']
                         if self.options.make_target:
                             command += [self.options.make_target]
@@ -720,8 +1178,8 @@ class Install:
                             .format(' '.join(command),
                                     self.directory['install']))
                         (out,err,proc_returncode) = self.execute_command(command=command,
-                                                                         argument='ignore')
-                        self.logger.debug(out)
+                                                                         argument='ignore',
+                                                                         phase='build')
                         if proc_returncode != 0:
                             self.logger.error("Evilmake response:")
                             self.logger.error(err)
@@ -729,16 +1187,16 @@ class Install:
                         if not self.options.skip_module:
                             self.modules.load(product=self.product['name'],
                                               version=self.product['version'])
-                        command = (['make','-C', 'src']
-                                   if exists(join(self.directory['work'],'src'))
-                                   else ['make'])
+                        command = (self.get_make_command() + ['-C', 'src']
+                                   if exists(join(self.directory['install'],'src'))
+                                   else self.get_make_command())
                         if self.options.make_target:
                             command += [self.options.make_target]
                         self.logger.info('Running "{0}" in {1}'
                             .format(' '.join(command),
                                     self.directory['install']))
-                        (out,err,proc_returncode) = self.execute_command(command=command)
-                        self.logger.debug(out)
+                        (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                         phase='build')
                         if proc_returncode != 0:
                             self.logger.error("Error during compile:")
                             self.logger.error(err)
@@ -749,15 +1207,17 @@ class Install:
             else:
                 self.package = True
                 chdir(self.directory['work'])
-                if 'python' in self.build_type:
+                if 'python' in self.build_type and self.options.wheel:
+                    self.install_wheel()
+                elif 'python' in self.build_type:
                     command = [executable,
                                'setup.py',
                                'install',
                                "--prefix=%(install)s" % self.directory]
                     self.logger.debug(' '.join(command))
                     if not self.options.test:
-                        (out,err,proc_returncode) = self.execute_command(command=command)
-                        self.logger.debug(out)
+                        (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                         phase='build')
                         if proc_returncode != 0:
                             self.logger.error("Error during installation:")
                             self.logger.error(err)
@@ -795,10 +1255,89 @@ class Install:
                                 .format(src,dst))
                             if not self.options.test:
                                 copyfile(src,dst)
+            self.add_checkpoint(phase='build')
+
+    def get_wheels(self):
+        '''Return the wheel cache, or None if there is no cache directory.'''
+        cache_dir = get_cache_dir(options=self.options)
+        from sdss_install.utils.wheels import Wheels
+        return Wheels(directory=join(cache_dir,'wheels')) if cache_dir else None
+
+    @report.phase
+    def install_wheel(self):
+        '''
+            Install the Python package of the product in the install directory
+            from its wheel in the wheel cache (--wheel). A missing wheel is
+            built with pip from the work directory and stored in the cache.
+        '''
+        if self.ready:
+            from sdss_install.utils.wheels import get_abi
+            pip = [executable,'-m','pip','--disable-pip-version-check']
+            offline = ['--no-build-isolation','--no-index'] if self.options.offline else []
+            key = {'product': self.product['name'],
+                   'version': self.product['version'],
+                   'abi': get_abi(),
+                   'revision': self.checkpoint.revision if self.checkpoint else None}
+            wheels = self.get_wheels()
+            wheel_files = wheels.get(key=key) if wheels and not self.options.test else None
+            wheel_dir = None
+            if wheel_files:
+                self.logger.info("Installing {} from the wheel cache"
+                                 .format(', '.join(basename(w) for w in wheel_files)))
+            else:
+                wheel_dir = join(self.directory['work'],'.wheels')
+                command = pip + ['wheel','--no-deps','--wheel-dir',wheel_dir] + offline + ['.']
+                self.logger.debug(' '.join(command))
+                if not self.options.test:
+                    (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                     phase='build')
+                    wheel_files = sorted(glob(join(wheel_dir,'*.whl')))
+                    if proc_returncode != 0 or not wheel_files:
+                        self.logger.error("Error during the build of the wheel:")
+                        self.logger.error(err)
+                        self.ready = False
+                    elif wheels and wheels.store(key=key,wheels=wheel_files):
+                        self.logger.info("Stored {} in the wheel cache"
+                                         .format(', '.join(basename(w) for w in wheel_files)))
+                        wheel_files = wheels.get(key=key) or wheel_files
+            if self.ready:
+                command = (pip + ['install','--no-deps','--no-index','--ignore-installed',
+                                  '--no-warn-script-location',
+                                  "--prefix=%(install)s" % self.directory] +
+                           (wheel_files or [join(wheel_dir,'*.whl')]))
+                self.logger.debug(' '.join(command))
+                if not self.options.test:
+                    (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                     phase='build')
+                    if proc_returncode != 0:
+                        self.logger.error("Error during installation:")
+                        self.logger.error(err)
+                        self.ready = False
+            if wheel_dir and isdir(wheel_dir): rmtree(wheel_dir,ignore_errors=True)
+
+    def move_directory_work(self):
+        '''
+            Move the finished work directory into place as the install directory,
+            with a single rename when possible, otherwise copy it.
+        '''
+        moved = False
+        if not self.options.keep:
+            try:
+                rename(self.directory['work'],self.directory['install'])
+                moved = True
+            except OSError as ose:
+                self.logger.debug("Unable to rename {0} to {1}: {2}. Copying instead."
+                    .format(self.directory['work'],self.directory['install'],ose.strerror))
+        if not moved:
+            copytree(self.directory['work'],self.directory['install'])
 
+    @report.phase
     def build_documentation(self):
         '''Build the documentaion of the installed product.'''
-        if self.ready and self.options.documentation:
+        if (self.ready and self.options.documentation and not self.restored and
+            self.is_checkpoint('build_documentation')):
+            self.logger.info("Skipping documentation build (resumed)")
+        elif self.ready and self.options.documentation and not self.restored:
             if 'python' in self.build_type:
                 if exists(join('doc','index.rst')):
                     #
@@ -843,8 +1382,8 @@ class Install:
                     command = [executable, 'setup.py', 'build_sphinx']
                     self.logger.debug(' '.join(command))
                     if not self.options.test:
-                        (out,err,proc_returncode) = self.execute_command(command=command)
-                        self.logger.debug(out)
+                        (out,err,proc_returncode) = self.execute_command(
+                            command=command,phase='build_documentation')
                         if proc_returncode != 0:
                             self.logger.error(
                                 "Error during documentation build:")
@@ -887,29 +1426,117 @@ class Install:
                 else:
                     self.logger.warning("Documentation build requested, " +
                                      "but no documentation found.")
+            self.add_checkpoint(phase='build_documentation')
 
     #
     # At this point either we have already completed a Python installation
     # or we still need to compile the C/C++ product (we had to construct
     # doc/Makefile first).
     #
+    @report.phase
     def build_package(self):
         '''Build the C/C++ product.'''
-        if self.ready and 'c' in self.build_type and self.package:
+        if (self.ready and 'c' in self.build_type and self.package and not self.restored and
+            self.is_checkpoint('build_package')):
+            self.logger.info("Skipping build of the C/C++ product (resumed)")
+        elif self.ready and 'c' in self.build_type and self.package and not self.restored:
             environ[self.product['name'].upper()+'_DIR'] = self.directory['work']
-            command = ['make', 'install']
+            command = self.get_make_command(target='install')
             self.logger.debug(' '.join(command))
             if not self.options.test:
-                (out,err,proc_returncode) = self.execute_command(command=command)
-                self.logger.debug(out)
+                (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                 phase='build_package')
                 if proc_returncode != 0:
                     self.logger.error("Error during compile:")
                     self.logger.error(err)
                     self.ready = False
+            self.add_checkpoint(phase='build_package')
+
+    def get_python_dirs(self):
+        '''Return the python/ and site-packages directories of the install directory.'''
+        python_dirs = glob(join(self.directory['install'],'lib*','python*','site-packages'))
+        if isdir(join(self.directory['install'],'python')):
+            python_dirs.insert(0,join(self.directory['install'],'python'))
+        return python_dirs
+
+    def compile_python_dirs(self,force=False,relative=False):
+        '''
+            Compile the python/ and site-packages directories of the install
+            directory to bytecode, with the --bytecode-mode invalidation mode
+            of --compile-bytecode (otherwise timestamp) and --jobs workers.
+            With relative, the source paths recorded in the .pyc files are
+            relative to the install directory, which the import system
+            replaces by the actual paths.
+            Modules which fail to compile are only reported.
+        '''
+        from compileall import compile_dir
+        from py_compile import PycInvalidationMode
+        mode = getattr(PycInvalidationMode,
+                       (self.options.bytecode_mode if self.options.compile_bytecode
+                        else 'timestamp').upper().replace('-','_'))
+        for python_dir in self.get_python_dirs():
+            self.logger.info("Compiling {0} to bytecode ({1})"
+                             .format(python_dir,mode.name.lower().replace('_','-')))
+            ddir = relpath(python_dir,self.directory['install']) if relative else None
+            if not compile_dir(python_dir,ddir=ddir,quiet=1,workers=self.get_jobs(make=False),
+                               invalidation_mode=mode,force=force):
+                self.logger.warning("Unable to compile some modules of {}"
+                                    .format(python_dir))
+
+    @report.phase
+    def compile_bytecode(self):
+        '''
+            Compile the Python modules of the install directory to bytecode
+            (--compile-bytecode), so that jobs importing the product never
+            write .pyc files onto the shared product root.
+        '''
+        if (self.ready and self.options.compile_bytecode and not self.options.test and
+            not (self.options.dedup and not self.product['is_not_tag'])):
+            # Replace the timestamp .pyc files written by setup.py or pip
+            self.compile_python_dirs(force=self.options.bytecode_mode != 'timestamp')
 
+    @report.phase
+    def dedup_install(self):
+        '''
+            Replace the files of a tag install directory by hardlinks to their
+            blobs in the content-addressed store of the product root (--dedup).
+            The deduplicated sources take the modification time of their blob,
+            so their .pyc files are compiled again, without the path of the
+            install directory, before being deduplicated. This also compiles
+            the install with --compile-bytecode, which is left to this phase.
+            Trunk and branch installs, which may be updated in place, are skipped.
+        '''
+        if (self.ready and self.options.dedup and not self.options.test and
+            isdir(self.directory['install'])):
+            if self.product['is_not_tag']:
+                self.logger.info("Not deduplicating %(install)s, " % self.directory +
+                                 "a trunk or branch install")
+                return
+            from sdss_install.utils.report import format_bytes
+            from sdss_install.utils.store import Store, get_store_dir
+            store = Store(directory=get_store_dir(options=self.options))
+            pycs = list()
+            def select(path):
+                if path.endswith('.pyc'): pycs.append(path)
+                return not path.endswith('.pyc')
+            (files,saved,failed) = store.dedup(tree=self.directory['install'],select=select)
+            if pycs or self.options.compile_bytecode:
+                self.compile_python_dirs(force=True,relative=True)
+                (pyc_files,pyc_saved,pyc_failed) = store.dedup(
+                    tree=self.directory['install'],select=lambda path: path.endswith('.pyc'))
+                (files,saved,failed) = (files + pyc_files,saved + pyc_saved,
+                                        failed + pyc_failed)
+            self.logger.info("Deduplicated {0} files ({1}) of {2} in {3}"
+                             .format(files,format_bytes(saved),self.directory['install'],
+                                     store.directory))
+            if failed:
+                self.logger.warning("Unable to deduplicate {} files, ".format(failed) +
+                                    "the store must be on the filesystem of the install")
+
+    @report.phase
     def clean(self):
-        '''Remove the work directory tree.'''
-        if self.ready:
+        '''Remove the work directory tree, unless it was moved into place.'''
+        if self.ready and isdir(self.directory['work']):
             try: rmtree(self.directory['work'])
             except: pass
 
@@ -918,6 +1545,11 @@ class Install:
         # Don't put <if self.ready> here:
         if self.directory and self.directory['original']:
             chdir(self.directory['original'])
+        if self.ready: self.remove_checkpoint()
+        self.restore_directory_install()
+        self.update_index()
+        self.mark_install()
+        self.unlock_install()
         finalize = "Done" if self.ready else "Fail"
 #        if self.options.github and self.options.module_only:
 #            rmtree(join(self.product['name'],self.product['version']))
@@ -933,27 +1565,75 @@ class Install:
         elif self.modules and self.modules.built:
             finalize_ps = ("Ready to load module %(name)s/%(version)s"
                             % self.product)
+        report.finalize(logger=self.logger,filename=self.options.report)
         self.logger.info(finalize)
         if finalize_ps: self.logger.info(finalize_ps)
 
-    def execute_command(self, command=None, argument=None):
-        '''Execute the passed terminal command.'''
+    @report.phase
+    def update_index(self):
+        '''
+            Record the finished install, with its revision, build type, size,
+            times and dependencies, in the install index of the product root.
+            A failure to update the index is only a warning.
+        '''
+        if (self.ready and not self.options.test and not self.options.module_only and
+            not self.reused and self.product and isdir(self.directory['install'])):
+            from sqlite3 import Error
+            from sdss_install.utils.index import Index, get_index_path, get_size
+            path = get_index_path(options=self.options)
+            finished = datetime.datetime.now()
+            install = {'repository': 'github' if self.options.github else 'svn',
+                       'product': self.product['name'],
+                       'version': self.product['version'],
+                       'revision': self.checkpoint.revision if self.checkpoint else None,
+                       'build_type': (','.join(sorted(self.build_type))
+                                      if self.build_type else None),
+                       'path': self.directory['install'],
+                       'modulefile': self.product.get('modulefile'),
+                       'size': get_size(self.directory['install']),
+                       'started': self.started.isoformat(),
+                       'finished': finished.isoformat(),
+                       'wall': round((finished - self.started).total_seconds(),3)}
+            dependencies = list()
+            if self.modules and self.modules.dependencies:
+                for (product,version) in self.modules.dependencies:
+                    dependencies.append((product,version,'module'))
+            if isinstance(self.options.external_dependencies,dict):
+                for (product,external) in self.options.external_dependencies.items():
+                    install_product = (external.get('install_product')
+                                       if isinstance(external,dict) else None)
+                    dependencies.append((product,
+                                         install_product.get('version')
+                                         if isinstance(install_product,dict) else None,
+                                         'external'))
+            if path:
+                try:
+                    Index(path=path).add(install=install,dependencies=dependencies)
+                    self.logger.debug("Recorded %(name)s %(version)s in the index "
+                                      % self.product + path)
+                except (Error,OSError) as e:
+                    self.logger.warning("Unable to update the index {0}: {1}".format(path,e))
+
+    def get_logfile(self, phase=None):
+        '''Return the log file of the given phase in the --log-dir directory, or None.'''
+        return (join(self.options.log_dir,
+                     "%(name)s-%(version)s" % self.product,
+                     phase + '.log')
+                if phase and self.options.log_dir and self.product else None)
+
+    def execute_command(self, command=None, argument=None, phase=None):
+        '''
+            Execute the passed terminal command, streaming its output to the
+            debug log and to the log file of the given phase. Only the last
+            self.output_tail lines of the output are returned.
+        '''
         (out,err,proc_returncode) = (None,None,None)
         if command:
-            proc = Popen(command, stdout=PIPE, stderr=PIPE)
-            if proc:
-                (out, err) = proc.communicate() if proc else (None,None)
-                proc_returncode = proc.returncode if proc else None
-                if argument:
-                    out = out.decode("utf-8",argument) if isinstance(out,bytes) else out
-                    err = err.decode("utf-8",argument) if isinstance(err,bytes) else err
-                else:
-                    out = out.decode("utf-8") if isinstance(out,bytes) else out
-                    err = err.decode("utf-8") if isinstance(err,bytes) else err
-            else:
-                self.ready = False
-                self.logger.error('Unable to execute_command. ' +
-                                  'proc: {}'.format(proc))
+            (out,err,proc_returncode) = execute_command(command=command,
+                                                        argument=argument,
+                                                        logger=self.logger,
+                                                        logfile=self.get_logfile(phase=phase),
+                                                        tail=self.output_tail)
         else:
             self.ready = False
             self.logger.error('Unable to execute_command. ' +
@@ -10,5 +10,23 @@ This package contains code for installing SDSS-IV software products.
 from __future__ import absolute_import, division, print_function, unicode_literals
 # The line above will help with 2to3 support.
 
-from .modules import Modules
-from .Install import Install
+from importlib import import_module
+
+# The classes of the package, imported on first use, so that a run imports
+# only the modules it needs, e.g. no Manifest for a single product install.
+classes = {'Modules': '.modules',
+           'Install': '.Install',
+           'Manifest': '.manifest',
+           'Mirror': '.mirror'}
+
+
+def __getattr__(name):
+    '''Import the class name of the package on first use.'''
+    if name in classes:
+        value = getattr(import_module(classes[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
+
+
+__all__ = list(classes)
@@ -0,0 +1,350 @@
+# License information goes here
+# -*- coding: utf-8 -*-
+"""Install the products listed in a manifest file.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+# The line above will help with 2to3 support.
+from sys import argv, executable
+from copy import copy
+from shutil import rmtree
+from tempfile import mkdtemp
+from os import remove
+from os.path import basename, exists, join
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from json import load
+from sdss_install.install4 import Install4
+from sdss_install.install5 import Install5
+from sdss_install.utils.cpu import get_cpu_count
+from sdss_install.utils.execute import execute_command
+from sdss_install.utils.report import report
+
+class Manifest:
+    '''
+        Install a list of product versions read from a YAML or JSON manifest,
+        running independent products concurrently and each product only after
+        the products it module loads (and which are also in the manifest).
+
+        The manifest is either a list of entries or a dict with a 'products'
+        list. Each entry is a dict with the keys 'product' and 'version', and
+        the optional keys 'github' (default: the --github option),
+        'dependencies' (a list of manifest products, which overrides the
+        module file dependencies) and 'options'
+        (a list of extra sdss_install command line arguments).
+    '''
+
+    # Options of the manifest run which are not passed to each product install
+    manifest_options = ['manifest', 'workers', 'github', 'report']
+
+    # Number of lines of the output of each install kept for error messages
+    output_tail = 100
+
+    def __init__(self, logger=None, options=None):
+        self.logger = logger
+        self.options = options
+        self.ready = False
+        self.products = None
+        self.dependencies = None
+        self.results = None
+
+    def set_ready(self):
+        '''Set self.ready after sanity check self.options.'''
+        self.ready = bool(self.logger and self.options and self.options.manifest)
+        if self.ready:
+            if (self.options.product != 'NO PACKAGE' or
+                self.options.product_version != 'NO VERSION'):
+                self.ready = False
+                self.logger.error('A product and version cannot be given ' +
+                                  'together with --manifest.')
+            elif not exists(self.options.manifest):
+                self.ready = False
+                self.logger.error('Nonexistent manifest file: {}'
+                                  .format(self.options.manifest))
+
+    def set_products(self):
+        '''Read the manifest file and set the list self.products.'''
+        self.products = list()
+        if self.ready:
+            try:
+                with open(self.options.manifest) as file:
+                    if self.options.manifest.endswith('.json'): manifest = load(file)
+                    else:
+                        import yaml
+                        manifest = yaml.safe_load(file)
+            except Exception as e:
+                manifest = None
+                self.logger.error('Unable to read manifest {0}: {1}'
+                                  .format(self.options.manifest,e))
+            entries = (manifest.get('products') if isinstance(manifest,dict)
+                       else manifest)
+            if isinstance(entries,list):
+                for entry in entries:
+                    if (isinstance(entry,dict) and
+                        entry.get('product') and entry.get('version')):
+                        product = dict()
+                        product['product'] = str(entry['product']).rstrip('/')
+                        product['version'] = str(entry['version']).rstrip('/')
+                        product['name'] = basename(product['product'])
+                        product['github'] = bool(entry.get('github',self.options.github))
+                        product['dependencies'] = entry.get('dependencies')
+                        product['options'] = [str(o) for o in entry.get('options',list())]
+                        self.products.append(product)
+                    else:
+                        self.ready = False
+                        self.logger.error('Invalid manifest entry: {}'.format(entry))
+            else:
+                self.ready = False
+                self.logger.error('Invalid manifest {}. '.format(self.options.manifest) +
+                                  'Expected a list of products.')
+            names = [product['name'] for product in self.products]
+            duplicates = sorted(set(name for name in names if names.count(name) > 1))
+            if duplicates:
+                self.ready = False
+                self.logger.error('Products listed more than once in the manifest: {}'
+                                  .format(', '.join(duplicates)))
+
+    def set_dependencies(self):
+        '''
+            Set the dict self.dependencies of product name to the names of the
+            manifest products it depends on, from the module load lines of each
+            product etc/<product>.module file, which are read concurrently.
+        '''
+        self.dependencies = dict()
+        if self.ready:
+            names = set(product['name'] for product in self.products)
+            with ThreadPoolExecutor(max_workers=self.get_workers()) as executor:
+                lines = dict(zip([product['name'] for product in self.products],
+                                 executor.map(self.get_module_lines,self.products)))
+            for product in self.products:
+                if product['dependencies'] is not None:
+                    dependencies = [basename(str(d).rstrip('/'))
+                                    for d in product['dependencies']]
+                else:
+                    dependencies = [l.strip().split()[2].split('/',1)[0]
+                                    for l in lines[product['name']]
+                                    if l.startswith('module load')
+                                    and len(l.strip().split()) > 2]
+                self.dependencies[product['name']] = sorted(
+                    set(d for d in dependencies if d in names and d != product['name']))
+                if self.dependencies[product['name']]:
+                    self.logger.debug('{0} depends on {1}'
+                        .format(product['name'],', '.join(self.dependencies[product['name']])))
+            self.check_cycles()
+
+    def check_cycles(self):
+        '''Check that the dependency graph is acyclic.'''
+        if self.ready:
+            state = dict()
+            def visit(name,trail):
+                if state.get(name) == 'done': return True
+                if state.get(name) == 'visiting':
+                    self.logger.error('Circular dependency in manifest: {}'
+                                      .format(' -> '.join(trail + [name])))
+                    return False
+                state[name] = 'visiting'
+                acyclic = all(visit(d,trail + [name]) for d in self.dependencies[name])
+                state[name] = 'done'
+                return acyclic
+            self.ready = all(visit(name,list()) for name in self.dependencies)
+
+    def get_module_lines(self,product=None):
+        '''Return the lines of the module file of the given manifest product.'''
+        lines = list()
+        if product and product['dependencies'] is None:
+            filename = join('etc',product['name'] + '.module')
+            if product['github']: out = self.get_github_file(product=product,
+                                                              filename=filename)
+            else: out = self.get_svn_file(product=product,filename=filename)
+            lines = out.splitlines() if out else list()
+        return lines
+
+    def get_product_options(self,product=None):
+        '''Return a copy of self.options for the given manifest product.'''
+        options = copy(self.options)
+        options.product = product['product']
+        options.product_version = product['version']
+        options.github = product['github']
+        return options
+
+    def get_github_file(self,product=None,filename=None):
+        '''Return the contents of filename in the product version on GitHub,
+        or in its mirror with --offline.'''
+        out = None
+        options = self.get_product_options(product=product)
+        install5 = Install5(logger=self.logger,options=options)
+        url = install5.get_remote_url()
+        if self.options.offline:
+            mirror_dir = install5.get_mirror_dir(url=url)
+            command = ['git','--git-dir',mirror_dir,'show',product['version'] + ':' + filename]
+            (out,err,proc_returncode) = (self.execute_command(command=command)
+                                         if mirror_dir else (None,'no mirror',1))
+            if proc_returncode != 0:
+                out = None
+                self.logger.debug('Unable to read {0} of {1}/{2} from the mirror: {3}'
+                    .format(filename,product['product'],product['version'],err))
+            return out
+        clone_dir = mkdtemp(prefix='sdss_install-manifest-')
+        try:
+            command = ['git','clone','--quiet','--depth','1','--no-checkout',
+                       '--filter=blob:none','--branch',product['version'],url,clone_dir]
+            (out,err,proc_returncode) = self.execute_command(command=command)
+            if proc_returncode == 0:
+                command = ['git','-C',clone_dir,'show','HEAD:' + filename]
+                (out,err,proc_returncode) = self.execute_command(command=command)
+            if proc_returncode != 0:
+                out = None
+                self.logger.debug('Unable to read {0} of {1}/{2}: {3}'
+                    .format(filename,product['product'],product['version'],err))
+        finally:
+            rmtree(clone_dir,ignore_errors=True)
+        return out
+
+    def get_svn_file(self,product=None,filename=None):
+        '''Return the contents of filename in the product version on SVN,
+        or in its snapshot with --offline.'''
+        out = None
+        options = self.get_product_options(product=product)
+        install4 = Install4(logger=self.logger,options=options)
+        install4.set_ready()
+        install4.set_product()
+        install4.set_svncommand()
+        if install4.ready and self.options.offline:
+            snapshot_dir = install4.get_snapshot_dir()
+            try:
+                with open(join(snapshot_dir,filename)) as file: out = file.read()
+            except (IOError, OSError, TypeError) as e:
+                self.logger.debug('Unable to read {0} of {1}/{2} from the snapshot: {3}'
+                    .format(filename,product['product'],product['version'],e))
+        elif install4.ready:
+            command = install4.svncommand + ['cat',join(install4.product['url'],filename)]
+            (out,err,proc_returncode) = self.execute_command(command=command)
+            if proc_returncode != 0:
+                out = None
+                self.logger.debug('Unable to read {0} of {1}/{2}: {3}'
+                    .format(filename,product['product'],product['version'],err))
+        return out
+
+    def get_workers(self):
+        '''Return the maximum number of concurrent product installs.'''
+        return max(1,self.options.workers if self.options.workers else 1)
+
+    def get_arguments(self):
+        '''
+            Return the command line arguments passed on to each product install,
+            rebuilt from self.options: the long form of each option which differs
+            from its default, except the options of the manifest run itself.
+        '''
+        from sdss_install.application.Argument import sdss_install
+        arguments = list()
+        for action in sdss_install()._actions:
+            if not action.option_strings or action.dest in self.manifest_options: continue
+            value = getattr(self.options,action.dest,action.default)
+            if value == action.default: continue
+            option = action.option_strings[-1]
+            if action.nargs == 0: arguments.append(option)
+            elif isinstance(value,list):
+                for item in value: arguments += [option,str(item)]
+            else: arguments += [option,str(value)]
+        return arguments
+
+    def get_command(self,product=None):
+        '''
+            Return the sdss_install command which installs the given manifest product.
+            Unless --jobs is given, the CPUs are shared by the concurrent installs.
+        '''
+        command = [executable,argv[0]] + self.get_arguments()
+        if not self.options.jobs:
+            jobs = max(1,get_cpu_count() // self.get_workers())
+            command += ['--jobs',str(jobs)]
+        if self.options.report: command += ['--report',self.get_report(product=product)]
+        command += product['options']
+        if product['github']: command.append('--github')
+        return command + [product['product'],product['version']]
+
+    def get_report(self,product=None):
+        '''Return the --report file of the install of the given manifest product.'''
+        return '{0}.{name}-{version}'.format(self.options.report,**product)
+
+    def add_report(self,product=None):
+        '''Merge the report of the install of the given manifest product into
+        the report of the manifest run, and remove its file.'''
+        filename = self.get_report(product=product)
+        try:
+            with open(filename) as file: data = load(file)
+            remove(filename)
+        except (IOError, OSError, ValueError) as e:
+            self.logger.debug('Unable to read report {0}: {1}'.format(filename,e))
+        else: report.add_report(name='{name}/{version}'.format(**product),data=data)
+
+    def install_product(self,product=None):
+        '''Install the given manifest product in a separate sdss_install process.'''
+        command = self.get_command(product=product)
+        self.logger.info('Installing {product}/{version}'.format(**product))
+        self.logger.debug(' '.join(command))
+        logfile = (join(self.options.log_dir,'{name}-{version}.log'.format(**product))
+                   if self.options.log_dir else None)
+        phase = report.start_phase(name='{name}/{version}'.format(**product))
+        try:
+            (out,err,proc_returncode) = self.execute_command(command=command,
+                                                             logfile=logfile,
+                                                             tail=self.output_tail)
+        finally: report.stop_phase(phase)
+        if self.options.report: self.add_report(product=product)
+        return (proc_returncode == 0,out,err)
+
+    def install(self):
+        '''Install the manifest products with at most --workers concurrent installs.'''
+        self.results = dict()
+        if self.ready:
+            products = dict((product['name'],product) for product in self.products)
+            pending = [product['name'] for product in self.products]
+            running = dict()
+            with ThreadPoolExecutor(max_workers=self.get_workers()) as executor:
+                while pending or running:
+                    for name in list(pending):
+                        dependencies = self.dependencies[name]
+                        if any(self.results.get(d) is False for d in dependencies):
+                            pending.remove(name)
+                            self.results[name] = False
+                            self.logger.error('Skipping {0}/{1}: a dependency failed'
+                                .format(name,products[name]['version']))
+                        elif all(self.results.get(d) for d in dependencies):
+                            pending.remove(name)
+                            future = executor.submit(self.install_product,products[name])
+                            running[future] = name
+                    if running:
+                        (done,_) = wait(list(running),return_when=FIRST_COMPLETED)
+                        for future in done:
+                            name = running.pop(future)
+                            (success,out,err) = future.result()
+                            self.results[name] = success
+                            if success:
+                                self.logger.info('Installed {0}/{1}'
+                                    .format(name,products[name]['version']))
+                            else:
+                                self.logger.error('Failed to install {0}/{1}:\n{2}{3}'
+                                    .format(name,products[name]['version'],
+                                            out if out else str(),err if err else str()))
+            self.ready = all(self.results.values())
+
+    def finalize(self):
+        '''Log the manifest installation final result message.'''
+        if self.results:
+            failed = [name for name in self.results if not self.results[name]]
+            if failed: self.logger.info('Failed products: {}'.format(', '.join(failed)))
+        report.finalize(logger=self.logger,filename=self.options.report)
+        self.logger.info(('Done!' if self.ready else 'Fail!') +
+                         ' ({0} of {1} products installed)'
+                         .format(sum(1 for r in (self.results or dict()).values() if r),
+                                 len(self.products) if self.products else 0))
+
+    def execute_command(self, command=None, logfile=None, tail=None):
+        '''Execute the passed terminal command.'''
+        (out,err,proc_returncode) = (None,None,None)
+        if command:
+            (out,err,proc_returncode) = execute_command(command=command,
+                                                        logfile=logfile,
+                                                        tail=tail)
+        else:
+            self.logger.error('Unable to execute_command. ' +
+                              'command: {}'.format(command))
+        return (out,err,proc_returncode)
@@ -0,0 +1,131 @@
+# License information goes here
+# -*- coding: utf-8 -*-
+"""Refresh the local mirrors used by sdss_install --offline.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+# The line above will help with 2to3 support.
+from copy import copy
+from os.path import basename
+from concurrent.futures import ThreadPoolExecutor
+from sdss_install.install4 import Install4
+from sdss_install.install5 import Install5
+from sdss_install.install.manifest import Manifest
+from sdss_install.utils.lock import Lock
+from sdss_install.utils.report import report
+
+class Mirror:
+    '''
+        Create or refresh, on a connected host, the mirror directory from which
+        sdss_install --offline installs: a bare mirror of each GitHub repository
+        under <mirror dir>/git, and an export of each SVN product version under
+        <mirror dir>/svn, next to a JSON file with its revisions. The products
+        are either the product (and for SVN the version) given on the command
+        line, or every product of the --manifest file.
+    '''
+
+    def __init__(self, logger=None, options=None):
+        self.logger = logger
+        self.options = options
+        self.ready = False
+        self.products = None
+        self.results = None
+
+    def set_ready(self):
+        '''Set self.ready after sanity check self.options.'''
+        self.ready = bool(self.logger and self.options)
+        if self.ready:
+            if self.options.offline:
+                self.ready = False
+                self.logger.error('The mirrors cannot be refreshed --offline.')
+            elif self.options.manifest: pass
+            elif self.options.product == 'NO PACKAGE':
+                self.ready = False
+                self.logger.error('You must specify a product or a --manifest!')
+            elif not self.options.github and self.options.product_version == 'NO VERSION':
+                self.ready = False
+                self.logger.error('You must specify the version (after a space) ' +
+                                  'of an SVN product!')
+
+    def set_products(self):
+        '''Set the list self.products, from the command line or the manifest.'''
+        self.products = list()
+        if self.ready:
+            if self.options.manifest:
+                manifest = Manifest(logger=self.logger,options=self.options)
+                manifest.set_ready()
+                manifest.set_products()
+                self.ready = manifest.ready
+                self.products = manifest.products
+            else:
+                product = dict()
+                product['product'] = self.options.product.rstrip('/')
+                product['version'] = self.options.product_version.rstrip('/')
+                product['name'] = basename(product['product'])
+                product['github'] = self.options.github
+                self.products.append(product)
+
+    def get_product_options(self,product=None):
+        '''Return a copy of self.options for the given product.'''
+        options = copy(self.options)
+        options.product = product['product']
+        options.product_version = product['version']
+        options.github = product['github']
+        return options
+
+    @report.phase
+    def refresh(self):
+        '''Refresh the mirror of each product, with at most --workers at a time.'''
+        self.results = dict()
+        if self.ready and self.products:
+            workers = max(1,min(self.options.workers or 1,len(self.products)))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self.refresh_product,self.products))
+            self.results = dict(zip([product['name'] for product in self.products],results))
+            self.ready = all(results)
+
+    def refresh_product(self,product=None):
+        '''Refresh the GitHub mirror or SVN snapshot of product. Return True on success.'''
+        phase = report.start_phase(name=product['name'] if product['version'] == 'NO VERSION'
+                                   else '{0}/{1}'.format(product['name'],product['version']))
+        try:
+            options = self.get_product_options(product=product)
+            if product['github']: return self.refresh_github(options=options)
+            else: return self.refresh_svn(options=options)
+        finally:
+            report.stop_phase(phase)
+
+    def refresh_github(self,options=None):
+        '''Create or update the bare mirror of the GitHub repository of the product.'''
+        install5 = Install5(logger=self.logger,options=options)
+        url = install5.get_remote_url()
+        mirror_dir = install5.get_mirror_dir(url=url)
+        refreshed = False
+        if mirror_dir:
+            with Lock(path=mirror_dir + '.lock'):
+                refreshed = install5.update_mirror(url=url,mirror_dir=mirror_dir)
+            if not refreshed: self.logger.error('Unable to refresh mirror {}'.format(mirror_dir))
+        else:
+            self.logger.error('No mirror directory for {}. '.format(url) +
+                              'Please set --mirror-dir or --cache-dir.')
+        return refreshed
+
+    def refresh_svn(self,options=None):
+        '''Export the SVN product version to its snapshot, if it changed.'''
+        install4 = Install4(logger=self.logger,options=options)
+        install4.set_ready()
+        install4.set_product()
+        install4.set_svncommand()
+        install4.set_exists()
+        install4.set_snapshot()
+        return bool(install4.ready)
+
+    def finalize(self):
+        '''Log the final result message.'''
+        if self.results:
+            failed = [name for name in self.results if not self.results[name]]
+            if failed: self.logger.info('Failed products: {}'.format(', '.join(failed)))
+        report.finalize(logger=self.logger,filename=self.options.report)
+        self.logger.info(('Done!' if self.ready else 'Fail!') +
+                         ' ({0} of {1} mirrors refreshed)'
+                         .format(sum(1 for r in (self.results or dict()).values() if r),
+                                 len(self.products) if self.products else 0))
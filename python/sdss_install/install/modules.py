@@ -3,10 +3,18 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 # The line above will help with 2to3 support.
 from sys import path, version_info
-from os import environ, makedirs, sep
+from os import environ, fchmod, fdopen, makedirs, remove, rename, sep, umask
 from os.path import basename, dirname, exists, isdir, join
 from subprocess import Popen, PIPE
+from tempfile import mkstemp
 from sdss_install.utils import Module
+from sdss_install.utils.lock import Lock
+from sdss_install.utils.report import report
+
+# The umask of the process, read once at import, before any concurrent
+# install thread starts, since umask() can only be read by setting it.
+UMASK = umask(0)
+umask(UMASK)
 
 class Modules:
 
@@ -25,10 +33,13 @@ class Modules:
         self.dependencies = None
         self.built = None
         self.module = None
+        self.environ = dict()
 
+    @report.phase
     def set_module(self):
         self.module = Module(logger=self.logger,options=self.options)
 
+    @report.phase
     def set_ready(self):
         '''Set up Modules.'''
         self.ready = (self.logger and
@@ -40,6 +51,7 @@ class Modules:
             self.ready = False
             self.logger.error("You do not appear to have Modules set up.")
             
+    @report.phase
     def set_file(self, ext='.module'):
         '''Set product module file path.'''
         if self.ready:
@@ -51,12 +63,12 @@ class Modules:
                          if filename and 'work' in self.directory
                          else None)
 
+    @report.phase
     def load_dependencies(self):
         '''Load dependencies.'''
         if self.ready:
             self.set_dependencies()
-            for (product,version) in self.dependencies:
-                self.load(product=product,version=version)
+            self.load_products(products=self.dependencies)
 
     def set_dependencies(self):
         '''Set the dependencies by looking for modules loaded in the modules file'''
@@ -74,18 +86,56 @@ class Modules:
         '''Hook to module load function.'''
         if self.ready:
             if product:
-                product_version = join(product,version) if version else product
-                try:
-                    self.module.set_command('load',arguments=product_version)
-                    self.module.execute_command()
-                    self.logger.info("module load %s (dependency)" % product_version)
-                except:
-                    self.logger.warning("unable to module load %s (dependency)"
-                                        % product_version)
+                self.load_products(products=[(product,version)])
             else:
                 self.logger.error("module load command requires a " +
                                     "product [version optional]")
 
+    def load_products(self,products=None):
+        '''
+            Load the modules of the given (product, version) pairs with a single
+            module load command, and apply the resulting environment changes to
+            os.environ, which is inherited by the build commands. If the modules
+            cannot be loaded together, they are loaded one by one.
+        '''
+        if self.ready and products:
+            product_versions = [join(product,version) if version else product
+                                for (product,version) in products]
+            environ_changes = self.get_environ_changes(product_versions=product_versions)
+            if environ_changes is None and len(product_versions) > 1:
+                environ_changes = dict()
+                for product_version in product_versions:
+                    changes = self.get_environ_changes(product_versions=[product_version])
+                    if changes is not None: environ_changes.update(changes)
+            if environ_changes:
+                for (key,value) in environ_changes.items():
+                    if value is None: environ.pop(key,None)
+                    else: environ[key] = value
+                self.environ.update(environ_changes)
+
+    def get_environ_changes(self,product_versions=None):
+        '''
+            Return the environment changes of module load product_versions,
+            or None if the modules could not be loaded.
+        '''
+        environ_changes = None
+        try:
+            self.module.set_command('load',arguments=product_versions)
+            self.module.execute_command()
+            if self.module.returncode == 0:
+                environ_changes = self.module.get_environ()
+        except Exception:
+            environ_changes = None
+        if environ_changes is None:
+            if len(product_versions) == 1:
+                self.logger.warning("unable to module load %s (dependency)"
+                                    % product_versions[0])
+        else:
+            for product_version in product_versions:
+                self.logger.info("module load %s (dependency)" % product_version)
+        return environ_changes
+
+    @report.phase
     def set_keywords(self, build_type=None):
         '''Set keywords to configure module.'''
         if self.ready:
@@ -145,6 +195,7 @@ class Modules:
                 self.keywords['sdss4tools_root'] = self.options.root
                 self.keywords['sdss4tools_longpath'] = self.options.longpath
 
+    @report.phase
     def set_directory(self):
         '''Make module file installation directory.'''
         self.check_options()
@@ -158,8 +209,10 @@ class Modules:
                     try:
                         makedirs(self.directory['modules'])
                     except OSError as ose:
-                        self.logger.error(ose.strerror)
-                        self.ready = False
+                        # Another install may have just created it
+                        if not isdir(self.directory['modules']):
+                            self.logger.error(ose.strerror)
+                            self.ready = False
 
     def check_options(self):
         '''
@@ -179,9 +232,11 @@ class Modules:
                                             .format(self.options.moduledir))
                             try: makedirs(self.options.moduledir)
                             except OSError as ose:
-                                self.ready = False
-                                self.logger.error(ose.strerror)
+                                if not isdir(self.options.moduledir):
+                                    self.ready = False
+                                    self.logger.error(ose.strerror)
 
+    @report.phase
     def build(self):
         '''
             Install the product modulefile
@@ -198,17 +253,30 @@ class Modules:
                 else:
                     self.logger.info("Adding module file %(modulefile)s"
                                         % self.product)
-                    with open(self.product['modulefile'],'w') as file:
-                        file.write(mod)
-                    if self.options.default:
-                        versionfile = ["#%Module1.0\n",
-                                       "set ModulesVersion \"%(version)s\"\n"
-                                       % self.product]
-                        self.product['versionfile'] = (
-                            join(self.directory['modules'],'.version'))
-                        with open(self.product['versionfile'],'w') as file:
-                            file.writelines(versionfile)
+                    # Serialize the installs of modulefiles of the product
+                    with Lock(path=join(self.directory['modules'],'.lock')):
+                        self.write_file(self.product['modulefile'],mod)
+                        if self.options.default:
+                            versionfile = ("#%Module1.0\n" +
+                                           "set ModulesVersion \"%(version)s\"\n"
+                                           % self.product)
+                            self.product['versionfile'] = (
+                                join(self.directory['modules'],'.version'))
+                            self.write_file(self.product['versionfile'],versionfile)
                     self.built = True
             elif basename(self.options.product)!='tree': self.built = False
 
-
+    def write_file(self,path=None,text=None):
+        '''
+            Write text to path through a temporary file renamed into place,
+            so that module commands never read a partially written file.
+        '''
+        (fd,tmp_path) = mkstemp(dir=dirname(path),prefix='.',suffix='.tmp')
+        try:
+            with fdopen(fd,'w') as file:
+                file.write(text)
+                fchmod(file.fileno(),0o666 & ~UMASK)
+            rename(tmp_path,path)
+        except (IOError, OSError):
+            remove(tmp_path)
+            raise
@@ -5,26 +5,23 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 # The line above will help with 2to3 support.
 
-from sdss_install.application import Argument
-
-import glob
-import logging
-import subprocess
-import datetime
-from sys import argv, executable, path
-from shutil import copyfile, copytree, rmtree
-from os import chdir, environ, getcwd, getenv, makedirs, walk
-from os.path import basename, dirname, exists, isdir, join
-from argparse import ArgumentParser
-try: from ConfigParser import SafeConfigParser, RawConfigParser
-except ImportError: from configparser import SafeConfigParser, RawConfigParser
+from json import dump, load
+from shutil import copy2, copyfile, copytree, rmtree
+from os import chdir, environ, getcwd, getenv, listdir, makedirs, rename, walk
+from os.path import basename, dirname, exists, isdir, islink, join
+from xml.etree import ElementTree
 from .most_recent_tag import most_recent_tag
-from subprocess import Popen, PIPE
+from sdss_install.utils.cache import get_mirror_root
+from sdss_install.utils.execute import execute_command, execute_commands
+from sdss_install.utils.sparse import get_sparse_paths, get_svn_plan
 
 
 class Install4:
     '''Class for sdss_install'ation of SVN repositories.'''
 
+    # Number of lines of command output kept for error messages
+    output_tail = 1000
+
     def __init__(self, logger=None, options=None):
         self.set_logger(logger=logger)
         self.set_options(options=options)
@@ -115,54 +112,312 @@ class Install4:
                 self.svncommand += ['--username', self.options.username]
 
     def set_exists(self):
-        '''Check for existence of the product URL.'''
+        '''
+            Check for existence of the product URL, and record the current
+            revision of the repository, to which the fetch is pinned, and the
+            last changed revision of the product. With --offline, check for the
+            snapshot of the product URL instead.
+        '''
+        if self.ready:
+            if self.options.offline:
+                snapshot = self.get_snapshot()
+                self.exists = bool(snapshot)
+                if self.exists:
+                    self.product['revision'] = snapshot.get('revision')
+                    self.product['last_changed_revision'] = snapshot.get('last_changed_revision')
+                    self.logger.info("Found snapshot {0} of %(url)s "
+                                     .format(self.get_snapshot_dir()) % self.product)
+                else:
+                    self.logger.error("No snapshot {0} of %(url)s for --offline. "
+                                      .format(self.get_snapshot_dir()) % self.product +
+                                      "Please run sdss_install_mirror on a connected host.")
+                    self.ready = False
+            else:
+                self.logger.info("Contacting {url} ".format(url=self.url))
+                command = self.svncommand + ['info','--xml',self.product['url']]
+                self.logger.debug(' '.join(command))
+                (out,err,proc_returncode) = self.execute_command(command=command,full=True)
+                self.exists = proc_returncode == 0
+                if self.exists:
+                    (self.product['revision'],
+                     self.product['last_changed_revision']) = self.parse_revision(out=out)
+                    self.logger.info("Found URL at %(url)s " % self.product +
+                                     ("(revision %(revision)s)" % self.product
+                                      if self.product['revision'] else str()))
+                else:
+                    self.logger.error("Nonexistent URL at %(url)s" % self.product)
+                    self.logger.error(err)
+                    self.ready = False
+
+    @staticmethod
+    def parse_revision(out=None):
+        '''
+            Return the revision and the last changed revision of the output of
+            svn info --xml, each None if not found.
+        '''
+        (revision,last_changed_revision) = (None,None)
+        try:
+            entry = ElementTree.fromstring(out).find('entry')
+            if entry is not None:
+                revision = entry.get('revision')
+                commit = entry.find('commit')
+                last_changed_revision = commit.get('revision') if commit is not None else None
+        except (ElementTree.ParseError, TypeError, ValueError):
+            (revision,last_changed_revision) = (None,None)
+        return (revision,last_changed_revision)
+
+    def get_snapshot_dir(self):
+        '''
+            Return the directory of the snapshot of the product URL, under the
+            svn directory of the mirror directory, or None.
+        '''
+        mirror_root = get_mirror_root(options=self.options)
+        path = self.product['url'][len(self.options.url):].strip('/')
+        return join(mirror_root,'svn',path) if mirror_root and path else None
+
+    def get_snapshot(self):
+        '''Return the metadata of the snapshot of the product URL, or None if absent.'''
+        snapshot = None
+        snapshot_dir = self.get_snapshot_dir()
+        if snapshot_dir and isdir(snapshot_dir):
+            try:
+                with open(snapshot_dir + '.json') as file: snapshot = load(file)
+            except (IOError, OSError, ValueError): snapshot = None
+        return snapshot
+
+    def set_snapshot(self):
+        '''
+            Export the product URL to its snapshot, for --offline installs, unless
+            the snapshot is already at the last changed revision of the product.
+        '''
         if self.ready:
-            self.logger.info("Contacting {url} ".format(url=self.url))
-            command = self.svncommand + ['ls',self.product['url']]
-            self.logger.debug(' '.join(command))
-            (out,err,proc_returncode) = self.execute_command(command=command)
-            self.logger.debug(out)
-            self.exists = proc_returncode == 0
-            if self.exists:
-                self.logger.info("Found URL at %(url)s " % self.product)
+            snapshot_dir = self.get_snapshot_dir()
+            snapshot = self.get_snapshot()
+            if (snapshot and snapshot.get('last_changed_revision') ==
+                self.product.get('last_changed_revision')):
+                self.logger.info("Snapshot {0} is up to date".format(snapshot_dir))
+            elif snapshot_dir:
+                self.product['sparse'] = None
+                self.product['checkout_or_export'] = 'export'
+                self.directory = {'work': snapshot_dir + '.tmp'}
+                if isdir(self.directory['work']): rmtree(self.directory['work'])
+                if not isdir(dirname(snapshot_dir)): makedirs(dirname(snapshot_dir))
+                self.fetch()
+                if self.ready:
+                    if isdir(snapshot_dir): rmtree(snapshot_dir)
+                    rename(self.directory['work'],snapshot_dir)
+                    with open(snapshot_dir + '.json','w') as file:
+                        dump({'url': self.product['url'],
+                              'revision': self.product.get('revision'),
+                              'last_changed_revision': self.product.get('last_changed_revision')},
+                             file)
+                    self.logger.info("Updated snapshot {0} to revision {1}"
+                        .format(snapshot_dir,self.product.get('revision')))
             else:
-                self.logger.error("Nonexistent URL at %(url)s" % self.product)
-                self.logger.error(err)
                 self.ready = False
+                self.logger.error("No mirror directory for the snapshot of %(url)s"
+                                  % self.product)
+
+    def get_url(self,path=None):
+        '''
+            Return the product URL, or the URL of path in the product, pinned to
+            the revision recorded by set_exists() with a peg revision.
+        '''
+        url = join(self.product['url'],path) if path else self.product['url']
+        revision = self.product.get('revision')
+        return url + '@' + revision if revision else url
 
     def fetch(self):
-        '''SVN checkout or export the product version.'''
+        '''
+            SVN checkout or export the product version. With --svn-parallel, an
+            export fetches the top-level subdirectories concurrently, and with
+            include or exclude paths only part of the product is fetched. With
+            --offline, the snapshot of the product is copied instead.
+        '''
         if self.ready:
-            command = (self.svncommand +
-                       [self.product['checkout_or_export'],
-                        self.product['url'],
-                        self.directory['work']])
-            self.logger.info("Running %(checkout_or_export)s of %(url)s"
-                             % self.product)
-            self.logger.debug(' '.join(command))
-            (out,err,proc_returncode) = self.execute_command(command=command)
-            self.logger.debug(out)
-            self.ready = not len(err)
-            if self.ready:
+            self.set_sparse()
+            if self.options.offline:
+                self.logger.info("Copying the snapshot of %(url)s" % self.product)
+            else:
+                self.logger.info("Running %(checkout_or_export)s of %(url)s"
+                                 % self.product)
+            if self.options.offline:
+                self.fetch_snapshot()
+            elif (self.product['sparse'] or
+                (self.options.svn_parallel and
+                 self.product['checkout_or_export'] == 'export')):
+                self.fetch_plan()
+            else:
+                command = (self.svncommand +
+                           [self.product['checkout_or_export'],
+                            self.get_url(),
+                            self.directory['work']])
+                self.logger.debug(' '.join(command))
+                (out,err,proc_returncode) = self.execute_command(command=command,phase='fetch')
+                self.ready = proc_returncode == 0 and not len(err)
+                if not self.ready:
+                    self.logger.error("svn error during %(checkout_or_export)s " +
+                                      "of %(url)s: " % self.product + err)
+            if self.ready and not self.options.offline:
                 self.logger.info("Completed svn %(checkout_or_export)s " +
                                  "of %(url)s" % self.product)
-            else: self.logger.error("svn error during %(checkout_or_export)s " +
-                                    "of %(url)s: " % self.product + err)
 
-    def execute_command(self, command=None):
-        '''Execute the passed terminal command.'''
-        (out,err,proc_returncode) = (None,None,None)
-        if command:
-            proc = Popen(command, stdout=PIPE, stderr=PIPE)
-            if proc:
-                (out, err) = proc.communicate() if proc else (None,None)
-                out = out.decode("utf-8") if isinstance(out,bytes) else out
-                err = err.decode("utf-8") if isinstance(err,bytes) else err
-                proc_returncode = proc.returncode if proc else None
+    def set_sparse(self):
+        '''
+            Set the include and exclude paths of the product from the --include
+            and --exclude options, or from the product etc/config.ini, unless
+            they are already set.
+        '''
+        if 'sparse' in self.product: return
+        config = None
+        if not (self.options.include or self.options.exclude):
+            if self.options.offline:
+                try:
+                    with open(join(self.get_snapshot_dir(),'etc','config.ini')) as file:
+                        config = file.read()
+                except (IOError, OSError): config = None
             else:
+                command = self.svncommand + ['cat',self.get_url(path=join('etc','config.ini'))]
+                (out,err,proc_returncode) = self.execute_command(command=command,full=True)
+                config = out if proc_returncode == 0 else None
+        self.product['sparse'] = get_sparse_paths(options=self.options,config=config)
+        if self.product['sparse']:
+            self.logger.info("Fetching only {0} of %(url)s".format(
+                'include: ' + ', '.join(self.product['sparse']['include'])
+                if self.product['sparse']['include'] else
+                'exclude: ' + ', '.join(self.product['sparse']['exclude'])) % self.product)
+
+    def list_directory(self,path=None):
+        '''Return the subdirectories of path in the product, or None on error.'''
+        if self.options.offline:
+            directory = join(self.get_snapshot_dir(),path) if path else self.get_snapshot_dir()
+            try: return sorted(name for name in listdir(directory)
+                               if isdir(join(directory,name)) and not islink(join(directory,name)))
+            except OSError: return None
+        command = self.svncommand + ['ls',self.get_url(path=path)]
+        (out,err,proc_returncode) = self.execute_command(command=command,full=True)
+        return ([line.rstrip('/') for line in out.splitlines() if line.endswith('/')]
+                if proc_returncode == 0 else None)
+
+    def fetch_snapshot(self):
+        '''
+            Copy the snapshot of the product (--offline) to the work directory,
+            or only its sparse paths, as planned by get_svn_plan().
+        '''
+        if self.ready:
+            snapshot_dir = self.get_snapshot_dir()
+            plan = (get_svn_plan(sparse=self.product['sparse'],
+                                 list_directory=self.list_directory)
+                    if self.product['sparse'] else [(str(),'infinity')])
+            try:
+                if plan is None: raise OSError('Unable to list {}'.format(snapshot_dir))
+                for (path,depth) in plan:
+                    source = join(snapshot_dir,path) if path else snapshot_dir
+                    target = join(self.directory['work'],path) if path else self.directory['work']
+                    if depth == 'infinity':
+                        copytree(source,target,symlinks=True)
+                    else:
+                        makedirs(target)
+                        if depth == 'files':
+                            for name in listdir(source):
+                                if not isdir(join(source,name)) or islink(join(source,name)):
+                                    copy2(join(source,name),join(target,name),
+                                          follow_symlinks=False)
+                self.logger.info("Completed copy of the snapshot of %(url)s" % self.product)
+            except (IOError, OSError) as e:
                 self.ready = False
-                self.logger.error('Unable to execute_command. ' +
-                                  'proc: {}'.format(proc))
+                self.logger.error("Unable to copy the snapshot {0}: {1}".format(snapshot_dir,e))
+
+    def fetch_plan(self):
+        '''
+            SVN export or checkout the product directory by directory, as planned
+            by get_svn_plan(), all at the same revision. Directories which are
+            fetched in full are exported with at most --workers concurrent
+            exports if --svn-parallel. A checkout is made with --depth, then
+            extended by svn update --set-depth, one directory at a time.
+        '''
+        if self.ready:
+            plan = get_svn_plan(sparse=self.product['sparse'],
+                                list_directory=self.list_directory)
+            (out,err,proc_returncode) = (None,str(),0)
+            if plan is None:
+                (err,proc_returncode) = ('Unable to list %(url)s' % self.product,None)
+            elif plan and self.product['checkout_or_export'] == 'checkout':
+                for (path,depth) in plan:
+                    if path:
+                        command = (self.svncommand +
+                                   ['update','--parents','--set-depth',depth,
+                                    '-r',self.product.get('revision') or 'HEAD',
+                                    join(self.directory['work'],path)])
+                    else:
+                        command = (self.svncommand +
+                                   ['checkout','--depth',depth,self.get_url(),
+                                    self.directory['work']])
+                    (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                     phase='fetch')
+                    if proc_returncode != 0 or len(err): break
+            elif plan:
+                commands = list()
+                for (path,depth) in plan:
+                    work_path = (join(self.directory['work'],path) if path
+                                 else self.directory['work'])
+                    if depth == 'empty':
+                        if not isdir(work_path): makedirs(work_path)
+                    elif depth == 'files':
+                        command = (self.svncommand + ['export','--depth','files',
+                                                      self.get_url(path=path),work_path])
+                        (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                         phase='fetch')
+                        if proc_returncode != 0 or len(err): break
+                    else:
+                        commands.append(self.svncommand + ['export',self.get_url(path=path),
+                                                           work_path])
+                else:
+                    workers = (max(1,min(self.options.workers or 1,len(commands)))
+                               if self.options.svn_parallel and commands else 1)
+                    self.logger.debug('Exporting {0} directories with {1} workers'
+                        .format(len(commands),workers))
+                    results = self.execute_commands(commands=commands,workers=workers,
+                                                    phase='fetch')
+                    for (out,err,proc_returncode) in results:
+                        if proc_returncode != 0 or len(err): break
+            self.ready = proc_returncode == 0 and not len(err)
+            if not self.ready:
+                self.logger.error("svn error during %(checkout_or_export)s " +
+                                  "of %(url)s: " % self.product + (err or str()))
+
+    def get_logfile(self, phase=None):
+        '''Return the log file of the given phase in the --log-dir directory, or None.'''
+        return (join(self.options.log_dir,
+                     "%(name)s-%(version)s" % self.product,
+                     phase + '.log')
+                if phase and self.options.log_dir and self.product else None)
+
+    def execute_commands(self, commands=None, workers=None, phase=None, full=False):
+        '''
+            Execute the passed terminal commands concurrently, at most workers
+            at a time, as execute_command() would one by one, and return the list
+            of their (out, err, returncode).
+        '''
+        return execute_commands(commands=commands,
+                                workers=workers,
+                                logger=self.logger,
+                                logfile=self.get_logfile(phase=phase),
+                                tail=None if full else self.output_tail)
+
+    def execute_command(self, command=None, phase=None, full=False):
+        '''
+            Execute the passed terminal command, streaming its output to the
+            debug log and, with a phase, to the --log-dir log file of the phase.
+            Only the last self.output_tail lines of the output are returned,
+            or the complete output if full, for commands whose output is parsed.
+        '''
+        (out,err,proc_returncode) = (None,None,None)
+        if command:
+            (out,err,proc_returncode) = execute_command(command=command,
+                                                        logger=self.logger,
+                                                        logfile=self.get_logfile(phase=phase),
+                                                        tail=None if full else self.output_tail)
         else:
             self.ready = False
             self.logger.error('Unable to execute_command. ' +
@@ -4,16 +4,22 @@
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 # The line above will help with 2to3 support.
-from shutil import rmtree#, copyfile, copytree
+from shutil import copytree, rmtree#, copyfile
 from os import getcwd, environ, makedirs, chdir, remove#, getenv, walk
 from os.path import isdir, join, exists, basename, dirname
-from subprocess import Popen, PIPE
 from inspect import stack, getmodule
 from re import search, compile, match
+from sdss_install.utils.cache import Cache, get_cache_dir, get_mirror_root
+from sdss_install.utils.lock import Lock
+from sdss_install.utils.sparse import get_git_patterns, get_sparse_paths
+from sdss_install.utils.execute import execute_command, execute_commands
 
 class Install5:
     '''Class for sdss_install'ation of GitHub repositories.'''
 
+    # Number of lines of command output kept for error messages
+    output_tail = 1000
+
     def __init__(self, logger=None, options=None):
         self.set_logger(logger=logger)
         self.set_options(options=options)
@@ -43,6 +49,10 @@ class Install5:
         self.directory = None
         self.github_remote_url = None
         self.external_product = None
+        self.refs = dict()
+        self.listed_refs = set()
+        self.ref_cache = None
+        self.mirrors = set()
     
     def set_ready(self):
         '''
@@ -229,62 +239,152 @@ class Install5:
                                                   else 'export')
 
     def is_type(self,type=None,github_url=None,product=None,version=None):
+        '''Check if the product is a repository, or the version a branch or tag.'''
         check_type = None
-        if not check_type:
-            check_type = self.check_origin(type=type,github_url=github_url,product=product,version=version,origin='master')
-        if not check_type:
-            check_type = self.check_origin(type=type,github_url=github_url,product=product,version=version,origin='main')
-        return check_type
-            
-    def check_origin(self,type=None,github_url=None,product=None,version=None,origin=None):
-        '''Check if the product_version is a valid Github branch.'''
         if self.ready:
-            if type:
-                product = product if product else self.options.product
+            if type in ('repository','branch','tag'):
                 version = version if version else self.options.product_version
-                github_url = (github_url if github_url
-                             else 'https://github.com/sdss' if self.options.https
-                             else 'git@github.com:sdss')
-                url = join(github_url,product + '.git')
-                options = {'repository' : '--heads', # for validating product
-                           'branch'     : '--heads', # for validating product_version
-                           'tag'        : '--tags',  # for validating product_version
-                           }
-                if type in options:
-                    product_version = (version
-                                       if type != 'repository'
-                                       else origin)
-                    command = ['git',
-                               'ls-remote',
-                               options[type],
-                               url,
-                               product_version]
-                    #self.logger.debug('Running command: %s' % ' '.join(command))
-                    (out,err,proc_returncode) = self.execute_command(command=command)
-                    if proc_returncode != 0:
-                        regex = '(?i)Permission denied \(publickey\)'
-                        matches = self.get_matches(regex=regex,string=err) if err else list()
-                        match = matches[0] if matches else str()
-                        s = ('While running the command\n{0}\nthe following error occurred:\n{1}\n'
-                            .format(' '.join(command),err))
-                        if match:
-                            s += ('Please see the following URL for more informaiton: \n' +
-                                  'https://help.github.com' +
-                                  '/en/articles/error-permission-denied-publickey'
-                                   )
-                        self.ready = False
-                        self.logger.error(s)
+                refs = self.get_refs(github_url=github_url,product=product,
+                                     version=version if type != 'repository' else None)
+                if refs:
+                    check_type = (('master' in refs['heads'] or 'main' in refs['heads'])
+                                  if type == 'repository' else
+                                  version in refs['heads'] if type == 'branch' else
+                                  version in refs['tags'])
+            else:
+                self.ready = False
+                self.logger.error('Invalid type. ' +
+                                  "Must be 'repository', 'branch', or 'tag'. " +
+                                  'type: {}'.format(type))
+        return bool(check_type)
+
+    def get_remote_url(self,github_url=None,product=None):
+        '''Return the GitHub URL of the repository of the given product.'''
+        product = product if product else self.options.product
+        github_url = (github_url if github_url
+                     else 'https://github.com/sdss' if self.options.https
+                     else 'git@github.com:sdss')
+        return join(github_url,product + '.git')
+
+    def set_ref_cache(self):
+        '''Set the on-disk cache of remote refs, if a cache directory is available.'''
+        cache_dir = get_cache_dir(options=self.options)
+        ttl = getattr(self.options,'ref_cache_ttl',None)
+        self.ref_cache = (Cache(directory=join(cache_dir,'refs'),ttl=ttl)
+                          if cache_dir and ttl else None)
+
+    def get_refs(self,github_url=None,product=None,version=None,fresh=False):
+        '''
+            Return a dict with the branch heads and tags of the product repository,
+            each a dict of ref name to commit SHA. The refs are obtained with a
+            single git ls-remote per repository and run, and are kept in memory
+            and in the on-disk cache for --ref-cache-ttl seconds. Cached refs are
+            listed again, and the cache overwritten, if they lack version or if
+            fresh refs are requested. With --offline, the refs are those of the
+            local mirror.
+        '''
+        refs = None
+        if self.ready:
+            url = self.get_remote_url(github_url=github_url,product=product)
+            refs = self.refs.get(url)
+            if refs is None and self.options.offline:
+                mirror_dir = self.get_mirror_dir(url=url)
+                if mirror_dir and isdir(mirror_dir):
+                    refs = self.set_refs(url=mirror_dir)
                 else:
                     self.ready = False
-                    self.logger.error('Invalid type. ' +
-                                      "Must be 'repository', 'branch', or 'tag'. " +
-                                      'type: {}'.format(type))
+                    self.logger.error('No mirror {0} of {1} for --offline. '
+                                      .format(mirror_dir,url) +
+                                      'Please run sdss_install_mirror on a connected host.')
+                if refs: self.refs[url] = refs
+            elif not self.options.offline and (
+                refs is None or self.is_stale(url=url,refs=refs,version=version,fresh=fresh)):
+                if refs is None:
+                    if self.ref_cache is None: self.set_ref_cache()
+                    refs = self.ref_cache.get(key=url) if self.ref_cache else None
+                    if refs: self.logger.debug('Using cached refs of {}'.format(url))
+                if not refs or self.is_stale(url=url,refs=refs,version=version,fresh=fresh):
+                    if refs: self.logger.debug('Listing the refs of {} again'.format(url))
+                    mirror_dir = self.get_mirror_dir(url=url)
+                    refs = self.set_refs(url=url,
+                                         mirror_dir=mirror_dir
+                                         if mirror_dir and isdir(mirror_dir) else None)
+                    if refs:
+                        self.listed_refs.add(url)
+                        if self.ref_cache: self.ref_cache.set(key=url,value=refs)
+                if refs: self.refs[url] = refs
+        return refs
+
+    def is_stale(self,url=None,refs=None,version=None,fresh=False):
+        '''
+            Return True if refs of url were not listed in this run, and either
+            lack the branch or tag version or fresh refs are requested.
+        '''
+        return (url not in self.listed_refs and
+                (fresh or bool(version and version not in refs['heads']
+                               and version not in refs['tags'])))
 
+    def set_refs(self,url=None,mirror_dir=None):
+        '''
+            Run git ls-remote on url and return the parsed ref table. With
+            mirror_dir, an existing mirror of url which is not yet up to date,
+            the mirror is fetched at the same time, under its lock, so that the
+            clone does not wait for it afterwards. A mirror which cannot be
+            locked is left as it is.
+        '''
+        refs = None
+        if self.ready:
+            command = ['git','ls-remote','--heads','--tags',url]
+            #self.logger.debug('Running command: %s' % ' '.join(command))
+            lock = (self.lock_mirror(mirror_dir=mirror_dir)
+                    if mirror_dir and mirror_dir not in self.mirrors else None)
+            if lock:
+                try:
+                    self.logger.info('Updating mirror {}'.format(mirror_dir))
+                    self.execute_command(command=['git','--git-dir',mirror_dir,
+                                                  'remote','set-url','origin',url])
+                    fetch = ['git','--git-dir',mirror_dir,'fetch','--prune','origin']
+                    ((out,err,proc_returncode),(fetch_out,fetch_err,fetch_returncode)) = (
+                        self.execute_commands(commands=[command,fetch],phase='fetch',
+                                              full=True))
+                finally:
+                    lock.release()
+                if fetch_returncode == 0: self.mirrors.add(mirror_dir)
+                else: self.logger.debug('Unable to update mirror {0}: {1}'
+                                        .format(mirror_dir,fetch_err))
             else:
+                (out,err,proc_returncode) = self.execute_command(command=command,full=True)
+            if proc_returncode == 0:
+                refs = self.parse_refs(out=out)
+            else:
+                regex = '(?i)Permission denied \(publickey\)'
+                matches = self.get_matches(regex=regex,string=err) if err else list()
+                match = matches[0] if matches else str()
+                s = ('While running the command\n{0}\nthe following error occurred:\n{1}\n'
+                    .format(' '.join(command),err))
+                if match:
+                    s += ('Please see the following URL for more informaiton: \n' +
+                          'https://help.github.com' +
+                          '/en/articles/error-permission-denied-publickey'
+                           )
                 self.ready = False
-                self.logger.error('Unable to check is_type. ' +
-                                  'type: {}'.format(type))
-        return bool(out)
+                self.logger.error(s)
+        return refs
+
+    @staticmethod
+    def parse_refs(out=None):
+        '''Parse the output of git ls-remote into dicts of heads and tags.'''
+        refs = {'heads': dict(), 'tags': dict()}
+        for line in (out.splitlines() if out else list()):
+            (sha,_,ref) = line.strip().partition('\t')
+            if ref.startswith('refs/heads/'):
+                refs['heads'][ref[len('refs/heads/'):]] = sha
+            elif ref.startswith('refs/tags/'):
+                name = ref[len('refs/tags/'):]
+                # Annotated tags are listed twice; keep the peeled commit SHA.
+                if name.endswith('^{}'): refs['tags'][name[:-3]] = sha
+                elif name not in refs['tags']: refs['tags'][name] = sha
+        return refs
 
     def set_sdss_github_remote_url(self):
         '''Set the SDSS GitHub HTTPS remote URL'''
@@ -306,7 +406,11 @@ class Install5:
         self.checkout()
         
     def clone(self):
-        '''Clone the GitHub repository for the product.'''
+        '''
+            Clone the GitHub repository for the product, from the local
+            mirror of the repository if available. With --shallow, only the
+            requested branch or tag is cloned, at depth 1.
+        '''
         if self.ready:
             github_remote_url = (self.external_product['github_remote_url']
                                  if self.external_product
@@ -315,11 +419,52 @@ class Install5:
             clone_dir = (self.external_product['install_dir']
                          if self.external_product else
                          self.directory['work'])
-            command = ['git','clone',github_remote_url,clone_dir]
-            #self.logger.debug('Running command: %s' % ' '.join(command))
-            (out,err,proc_returncode) = self.execute_command(command=command)
+            version = (self.external_product['version'] if self.external_product
+                       else self.product['version'] if self.product else None)
+            mirror_dir = self.get_mirror_dir(url=github_remote_url)
+            lock = self.lock_mirror(mirror_dir=mirror_dir)
+            try:
+                if lock and self.update_mirror(url=github_remote_url,mirror_dir=mirror_dir):
+                    # A local path makes git hardlink the objects, but it
+                    # ignores --depth, which needs a file:// URL.
+                    url = ('file://' + mirror_dir if self.options.shallow
+                           else mirror_dir)
+                elif self.options.offline:
+                    url = None
+                    self.ready = False
+                    self.logger.error('No mirror {0} of {1} for --offline. '
+                                      .format(mirror_dir,github_remote_url) +
+                                      'Please run sdss_install_mirror on a connected host.')
+                else:
+                    if lock: self.logger.warning('Cloning from {} instead'
+                                                 .format(github_remote_url))
+                    url = github_remote_url
+                    mirror_dir = None
+                if url and not self.external_product:
+                    self.set_sparse(git_dir=mirror_dir,revision=version)
+                # Only the product is sparse; self.product is also set for externals
+                no_checkout = bool(self.product.get('sparse')
+                                   if self.product and not self.external_product else False)
+                commands = (self.get_clone_commands(url=url,
+                                                    clone_dir=clone_dir,
+                                                    version=version,
+                                                    no_checkout=no_checkout)
+                            if url else list())
+                for command in commands:
+                    #self.logger.debug('Running command: %s' % ' '.join(command))
+                    (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                     phase='fetch')
+                    if proc_returncode == 0: break
+                    self.logger.debug('Retrying clone after error: {}'.format(err))
+            finally:
+                if lock: lock.release()
+            if url and proc_returncode == 0 and mirror_dir:
+                # Point origin back to GitHub, as for a direct clone.
+                command = ['git','-C',clone_dir,'remote','set-url','origin',github_remote_url]
+                (out,err,proc_returncode) = self.execute_command(command=command)
             # NOTE: err is non-empty even when git clone is successful.
-            if proc_returncode == 0:
+            if not url: pass # No mirror for --offline
+            elif proc_returncode == 0:
                 self.logger.info("Completed GitHub clone of repository {}"
                                     .format(basename(github_remote_url)
                                     .replace('.git',str())))
@@ -329,6 +474,180 @@ class Install5:
                                     .format(' '.join(command)) +
                                   'err: {}.'.format(err))
 
+    def delta(self,source_dir=None):
+        '''
+            Seed the work directory with a copy of source_dir, the git working
+            tree of an installed version of the product with its build products,
+            fetch into it only the tag of the product version, from the local
+            mirror if available, then check out the tag. The files which are
+            unchanged since source_dir keep their modification time, so make
+            only rebuilds what changed.
+        '''
+        if self.ready:
+            work_dir = self.directory['work']
+            version = self.product['version']
+            try: copytree(source_dir,work_dir,symlinks=True)
+            except (IOError,OSError) as e:
+                self.ready = False
+                self.logger.error('Unable to copy {0} to {1}: {2}'.format(source_dir,work_dir,e))
+        if self.ready:
+            mirror_dir = self.get_mirror_dir(url=self.github_remote_url)
+            lock = self.lock_mirror(mirror_dir=mirror_dir)
+            try:
+                if lock and self.update_mirror(url=self.github_remote_url,
+                                               mirror_dir=mirror_dir):
+                    url = mirror_dir
+                elif self.options.offline:
+                    url = None
+                else:
+                    if lock: self.logger.warning('Fetching from {} instead'
+                                                 .format(self.github_remote_url))
+                    url = self.github_remote_url
+                # A tag install has no origin, which checkout() removes again
+                self.execute_command(command=['git','-C',work_dir,'remote','remove','origin'])
+                commands = ([['git','-C',work_dir,'remote','add','origin',self.github_remote_url],
+                             ['git','-C',work_dir,'fetch','--no-tags',url,
+                              '+refs/tags/{0}:refs/tags/{0}'.format(version)]]
+                            if url else list())
+                for command in commands:
+                    (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                     phase='fetch')
+                    if proc_returncode != 0:
+                        self.ready = False
+                        self.logger.error('Error encountered while running command: {}. '
+                                            .format(' '.join(command)) +
+                                          'err: {}.'.format(err))
+                        break
+                if not url:
+                    self.ready = False
+                    self.logger.error('No mirror {0} of {1} for --offline.'
+                                      .format(mirror_dir,self.github_remote_url))
+            finally:
+                if lock: lock.release()
+        if self.ready:
+            self.logger.info("Fetched tag {0} into the copy of {1}".format(version,source_dir))
+            self.checkout()
+
+    def get_clone_commands(self,url=None,clone_dir=None,version=None,no_checkout=False):
+        '''
+            Return the git clone commands to try in turn: with --shallow, a
+            depth 1 clone of the version (with --filter-blobs, also without
+            file contents until checkout), falling back to a full clone if
+            the server refuses. With no_checkout, the clones have no working
+            tree until checkout(), for a sparse checkout.
+        '''
+        commands = list()
+        clone = ['git','clone','--no-checkout'] if no_checkout else ['git','clone']
+        if self.options.shallow and version:
+            shallow = clone + ['--depth','1','--branch',version]
+            if self.options.filter_blobs and not url.startswith('file://'):
+                commands.append(shallow + ['--filter=blob:none',url,clone_dir])
+            commands.append(shallow + [url,clone_dir])
+        commands.append(clone + [url,clone_dir])
+        return commands
+
+    def set_sparse(self,git_dir=None,work_dir=None,revision=None):
+        '''
+            Set the include and exclude paths of the product from the --include
+            and --exclude options, or from the product etc/config.ini read from
+            the bare repository git_dir or the clone work_dir at the given
+            revision. Without both, it is left unset until the clone exists.
+        '''
+        if self.ready and 'sparse' not in self.product:
+            config = None
+            if not (self.options.include or self.options.exclude):
+                if git_dir: command = ['git','--git-dir',git_dir]
+                elif work_dir: command = ['git','-C',work_dir]
+                else: return
+                command += ['show','{0}:{1}'.format(revision,join('etc','config.ini'))]
+                (out,err,proc_returncode) = self.execute_command(command=command,full=True)
+                config = out if proc_returncode == 0 else None
+            self.product['sparse'] = get_sparse_paths(options=self.options,config=config)
+            if self.product['sparse']:
+                self.logger.info("Checking out only {0} of %(name)s".format(
+                    'include: ' + ', '.join(self.product['sparse']['include'])
+                    if self.product['sparse']['include'] else
+                    'exclude: ' + ', '.join(self.product['sparse']['exclude'])) % self.product)
+
+    def set_sparse_checkout(self,install_dir=None):
+        '''Restrict the working tree of the clone install_dir to the sparse paths.'''
+        if self.ready:
+            command = ['git','-C',install_dir,'config','core.sparseCheckout','true']
+            (out,err,proc_returncode) = self.execute_command(command=command)
+            if proc_returncode == 0:
+                try:
+                    info_dir = join(install_dir,'.git','info')
+                    if not isdir(info_dir): makedirs(info_dir)
+                    with open(join(info_dir,'sparse-checkout'),'w') as file:
+                        patterns = get_git_patterns(sparse=self.product['sparse'])
+                        file.write('\n'.join(patterns) + '\n')
+                except (IOError, OSError) as e:
+                    err = str(e)
+                    proc_returncode = 1
+            if proc_returncode != 0:
+                self.ready = False
+                self.logger.error('Unable to set the sparse checkout of {0}: {1}'
+                                  .format(install_dir,err))
+
+    def get_mirror_dir(self,url=None):
+        '''
+            Return the bare mirror directory of the GitHub repository url, under
+            the git directory of the mirror directory, or None if mirrors
+            are disabled with --no-mirror (unless --offline) or there is no
+            mirror directory.
+        '''
+        mirror_dir = None
+        if url and (self.options.offline or not self.options.no_mirror):
+            mirror_root = get_mirror_root(options=self.options)
+            # Both git@github.com:sdss/product.git and
+            # https://github.com/sdss/product share the mirror sdss/product.git
+            path = url.rstrip('/').replace(':','/')
+            path = path[:-len('.git')] if path.endswith('.git') else path
+            owner_product = path.split('/')[-2:]
+            mirror_dir = (join(mirror_root,'git',*owner_product) + '.git'
+                          if mirror_root and all(owner_product) else None)
+        return mirror_dir
+
+    def lock_mirror(self,mirror_dir=None):
+        '''
+            Acquire and return the lock of the mirror mirror_dir, or return None
+            if there is no mirror or it cannot be locked, in which case the
+            mirror is not used.
+        '''
+        lock = Lock(path=mirror_dir + '.lock') if mirror_dir else None
+        if lock and not lock.acquire():
+            self.logger.warning('Unable to lock {}, not using the mirror'.format(lock.path))
+            lock = None
+        return lock
+
+    def update_mirror(self,url=None,mirror_dir=None):
+        '''
+            Create the bare mirror of the GitHub repository url, or fetch the new
+            objects into it, at most once per run. The caller holds the mirror
+            lock. Return True if the mirror is up to date. With --offline, the
+            mirror is used as it is, if it exists.
+        '''
+        if mirror_dir not in self.mirrors:
+            if self.options.offline:
+                if isdir(mirror_dir): self.mirrors.add(mirror_dir)
+                return mirror_dir in self.mirrors
+            if isdir(mirror_dir):
+                self.logger.info('Updating mirror {}'.format(mirror_dir))
+                commands = [['git','--git-dir',mirror_dir,'remote','set-url','origin',url],
+                            ['git','--git-dir',mirror_dir,'fetch','--prune','origin']]
+            else:
+                self.logger.info('Creating mirror {}'.format(mirror_dir))
+                commands = [['git','clone','--mirror',url,mirror_dir]]
+            for command in commands:
+                (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                 phase='fetch')
+                if proc_returncode != 0:
+                    self.logger.warning('Unable to update mirror {0}. err: {1}'
+                                        .format(mirror_dir,err))
+                    break
+            else: self.mirrors.add(mirror_dir)
+        return mirror_dir in self.mirrors
+
     def checkout(self):
         '''Checkout branch or tag and, if tag, remove git remote origin.'''
         if self.ready:
@@ -353,6 +672,12 @@ class Install5:
                         version = None
             else:
                 install_dir = self.directory['work']
+                self.set_sparse(work_dir=install_dir,
+                                revision=('tags/' + self.product['version']
+                                          if self.product['is_tag'] else
+                                          'origin/' + self.product['version']))
+                if self.product.get('sparse'):
+                    self.set_sparse_checkout(install_dir=install_dir)
                 if self.product['is_master']:
                     self.logger.debug('Skipping checkout for {} branch'
                         .format(self.product['version']))
@@ -369,14 +694,13 @@ class Install5:
                     else:
                         version = None
             if version and install_dir:
-                chdir(install_dir)
-                command = ['git','checkout',version]
+                command = ['git','-C',install_dir,'checkout',version]
                 #self.logger.debug('Running command: %s' % ' '.join(command))
-                (out,err,proc_returncode) = self.execute_command(command=command)
+                (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                 phase='fetch')
                 # NOTE: err is non-empty even when git checkout is successful.
                 if proc_returncode == 0:
-                    chdir(self.directory['original'])
-                    if remove:     self.export()
+                    if remove:     self.export(install_dir=install_dir)
                     if self.ready: self.logger.info(s)
                 else:
                     self.ready = False
@@ -384,12 +708,24 @@ class Install5:
                                         .format(' '.join(command)) +
                                       'err: {}.'.format(err))
             else: pass # version and install_dir can be None when is_master
+            if self.ready and not self.external_product and self.product.get('sparse'):
+                # Apply the sparse checkout to the files of the working tree
+                # which the checkout left alone, or to the working tree of a
+                # --no-checkout clone which was not checked out.
+                command = ['git','-C',install_dir,'read-tree','-mu','HEAD']
+                (out,err,proc_returncode) = self.execute_command(command=command,
+                                                                 phase='fetch')
+                if proc_returncode != 0:
+                    self.ready = False
+                    self.logger.error('Error encountered while running command: {}. '
+                                        .format(' '.join(command)) +
+                                      'err: {}.'.format(err))
 
-    def export(self):
-        '''Remove git remote origin.'''
+    def export(self,install_dir=None):
+        '''Remove git remote origin of install_dir (default: the work directory).'''
         if self.ready:
-            chdir(self.directory['work'])
-            command = ['git','remote','rm','origin']
+            install_dir = install_dir if install_dir else self.directory['work']
+            command = ['git','-C',install_dir,'remote','rm','origin']
             #self.logger.debug('Running command: %s' % ' '.join(command))
             (out,err,proc_returncode) = self.execute_command(command=command)
             if not proc_returncode == 0:
@@ -398,20 +734,37 @@ class Install5:
                                     .format(' '.join(command)) +
                                   'err: {}.'.format(err))
 
-    def execute_command(self, command=None):
-        '''Execute the passed terminal command.'''
+    def get_logfile(self, phase=None):
+        '''Return the log file of the given phase in the --log-dir directory, or None.'''
+        return (join(self.options.log_dir,
+                     "%(name)s-%(version)s" % self.product,
+                     phase + '.log')
+                if phase and self.options.log_dir and self.product else None)
+
+    def execute_commands(self, commands=None, workers=None, phase=None, full=False):
+        '''
+            Execute the passed terminal commands concurrently, at most workers
+            at a time, as execute_command() would one by one, and return the list
+            of their (out, err, returncode).
+        '''
+        return execute_commands(commands=commands,workers=workers,
+                                logger=self.logger,
+                                logfile=self.get_logfile(phase=phase),
+                                tail=None if full else self.output_tail)
+
+    def execute_command(self, command=None, phase=None, full=False):
+        '''
+            Execute the passed terminal command, streaming its output to the
+            debug log and, with a phase, to the --log-dir log file of the phase.
+            Only the last self.output_tail lines of the output are returned,
+            or the complete output if full, for commands whose output is parsed.
+        '''
         (out,err,proc_returncode) = (None,None,None)
         if command:
-            proc = Popen(command, stdout=PIPE, stderr=PIPE)
-            if proc:
-                (out, err) = proc.communicate() if proc else (None,None)
-                out = out.decode("utf-8") if isinstance(out,bytes) else out
-                err = err.decode("utf-8") if isinstance(err,bytes) else err
-                proc_returncode = proc.returncode if proc else None
-            else:
-                self.ready = False
-                self.logger.error('Unable to execute_command. ' +
-                                  'proc: {}'.format(proc))
+            (out,err,proc_returncode) = execute_command(command=command,
+                                                        logger=self.logger,
+                                                        logfile=self.get_logfile(phase=phase),
+                                                        tail=None if full else self.output_tail)
         else:
             self.ready = False
             self.logger.error('Unable to execute_command. ' +
@@ -0,0 +1,184 @@
+# encoding: utf-8
+#
+# conftest.py
+#
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+
+"""
+Fixtures of the benchmark suite: a sandbox with local stand-ins for GitHub
+(bare git repositories, reached through a git url.insteadOf rule) and SVN
+(a file:// repository made with svnadmin, if available), holding synthetic
+products of varying size, and a function which runs bin/sdss_install in it
+with --report and returns the recorded phases.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from os.path import abspath, dirname, join
+from shutil import rmtree, which
+
+import pytest
+
+
+PACKAGE_DIR = dirname(dirname(dirname(dirname(dirname(abspath(__file__))))))
+SDSS_INSTALL = join(PACKAGE_DIR, 'bin', 'sdss_install')
+
+GIT_ENVIRON = {'GIT_AUTHOR_NAME': 'benchmark', 'GIT_AUTHOR_EMAIL': 'benchmark@localhost',
+               'GIT_COMMITTER_NAME': 'benchmark', 'GIT_COMMITTER_EMAIL': 'benchmark@localhost'}
+
+MODULE = ('#%Module1.0\n'
+          'set product {name}\n'
+          'set version {version}\n'
+          'set PRODUCT_DIR {root}/$product/$version\n'
+          'setenv [string toupper $product]_DIR $PRODUCT_DIR\n'
+          '{needs_bin}prepend-path PATH $PRODUCT_DIR/bin\n'
+          '{needs_python}prepend-path PYTHONPATH $PRODUCT_DIR/lib/{pyversion}/site-packages\n'
+          '{needs_trunk_python}prepend-path PYTHONPATH $PRODUCT_DIR/python\n'
+          '{needs_ld_lib}prepend-path LD_LIBRARY_PATH $PRODUCT_DIR/lib\n'
+          '{needs_idl}prepend-path IDL_PATH +$PRODUCT_DIR/pro\n')
+
+SETUP = ('from setuptools import setup, find_packages\n'
+         'setup(name={0!r}, version={1!r}, package_dir={{"": "python"}},\n'
+         '      packages=find_packages("python"))\n')
+
+MAKEFILE = ('all:\n\t$(MAKE) -C src\n\n'
+            'install: all\n\n'
+            'clean:\n\t$(MAKE) -C src clean\n')
+
+SRC_MAKEFILE = ('SOURCES := $(wildcard *.c)\n'
+                'LIB := ../lib/lib{0}.a\n\n'
+                'all: $(LIB)\n\n'
+                '$(LIB): $(SOURCES:.c=.o)\n\tmkdir -p ../lib\n\t$(AR) rcs $@ $^\n\n'
+                'clean:\n\trm -f *.o $(LIB)\n')
+
+# Number of Python modules or C files of the synthetic products of each size
+SIZES = {'small': 10, 'large': 500}
+
+# The synthetic products: name -> (kind, size, external dependencies)
+PRODUCTS = {'pysmall': ('python', 'small', None),
+            'pylarge': ('python', 'large', None),
+            'makeprod': ('make', 'small', None),
+            'evilprod': ('evilmake', 'small', None),
+            'extprod': ('python', 'small', ['pysmall', 'makeprod'])}
+
+
+def run(command, cwd=None):
+    '''Run command, with a fixed git identity, and fail on error.'''
+    subprocess.run(command, cwd=cwd, check=True, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL, env=dict(os.environ, **GIT_ENVIRON))
+
+
+def write(path, text):
+    '''Write text to path, creating its directory.'''
+    if not os.path.isdir(dirname(path)): os.makedirs(dirname(path))
+    with open(path, 'w') as file: file.write(text)
+
+
+def make_product(directory, name, kind, size, external=None):
+    '''Write the tree of a synthetic product of the given kind and size.'''
+    write(join(directory, 'etc', name + '.module'), MODULE)
+    count = SIZES[size]
+    if kind == 'python':
+        write(join(directory, 'setup.py'), SETUP.format(name, '1.0.0'))
+        write(join(directory, 'python', name, '__init__.py'), '')
+        for i in range(count):
+            write(join(directory, 'python', name, 'module{0}.py'.format(i)),
+                  'def f{0}(x):\n    return x + {0}\n'.format(i))
+    else:
+        write(join(directory, 'Makefile'), MAKEFILE)
+        write(join(directory, 'src', 'Makefile'), SRC_MAKEFILE.format(name))
+        for i in range(count):
+            write(join(directory, 'src', 'f{0}.c'.format(i)),
+                  'int f{0}(int x) {{ return x + {0}; }}\n'.format(i))
+    if external:
+        dependencies = {e: {'install_product': {'url': 'https://github.com/sdss/' + e,
+                                                'version': '1.0.0'},
+                            'paths': {'python': ['python']}} for e in external}
+        write(join(directory, 'etc', 'external.json'), json.dumps(dependencies))
+        write(join(directory, 'etc', 'config.ini'),
+              '[external_dependencies]\njson_filepath = etc/external.json\n')
+
+
+def make_github(directory, source):
+    '''Make the bare repositories DIRECTORY/sdss/<product>.git with the tag
+    1.0.0 and the branch main, from the product trees under source.'''
+    for name in PRODUCTS:
+        work = join(source, name)
+        run(['git', 'init', '--quiet', '--initial-branch', 'main', work])
+        run(['git', 'add', '--all'], cwd=work)
+        run(['git', 'commit', '--quiet', '--message', 'Version 1.0.0'], cwd=work)
+        run(['git', 'tag', '1.0.0'], cwd=work)
+        run(['git', 'clone', '--quiet', '--bare', work,
+             join(directory, 'sdss', name + '.git')])
+
+
+def make_svn(directory, source):
+    '''Make the SVN repository directory with repo/<product>/tags/1.0.0 and
+    trunk, from the product trees under source.'''
+    run(['svnadmin', 'create', directory])
+    url = 'file://' + directory
+    for name in PRODUCTS:
+        for path in ('tags/1.0.0', 'trunk'):
+            run(['svn', 'import', '--quiet', '--message', 'Version 1.0.0',
+                 join(source, name), '/'.join([url, 'repo', name, path])])
+    return url
+
+
+@pytest.fixture(scope='session')
+def sandbox(tmp_path_factory):
+    '''Return the dict of the local GitHub and SVN stand-ins and the environment
+    of the benchmarked runs, or skip if git or Modules are not available.'''
+    if not which('git'): pytest.skip('git is not available')
+    if not os.environ.get('MODULESHOME'): pytest.skip('Modules are not set up')
+    directory = str(tmp_path_factory.mktemp('sandbox'))
+    source = join(directory, 'source')
+    for (name, (kind, size, external)) in PRODUCTS.items():
+        make_product(join(source, name), name, kind, size, external=external)
+    make_github(join(directory, 'github'), source)
+    svn_url = (make_svn(join(directory, 'svn'), source)
+               if which('svn') and which('svnadmin') else None)
+    gitconfig = join(directory, 'gitconfig')
+    write(gitconfig, '[url "file://{0}/"]\n\tinsteadOf = https://github.com/sdss/\n'
+          .format(join(directory, 'github', 'sdss')))
+    bin_dir = join(directory, 'bin')
+    if not which('evilmake'):
+        # A stand-in for evilmake, which builds evilmake-style trees with make
+        write(join(bin_dir, 'evilmake'), '#!/bin/sh\nexec make "$@"\n')
+        os.chmod(join(bin_dir, 'evilmake'), 0o755)
+    environ = dict(os.environ,
+                   GIT_CONFIG_GLOBAL=gitconfig,
+                   PATH=os.pathsep.join([bin_dir, os.environ.get('PATH', '')]),
+                   PYTHONPATH=os.pathsep.join([join(PACKAGE_DIR, 'python'),
+                                               os.environ.get('PYTHONPATH', '')]))
+    environ.pop('SDSS_INSTALL_CACHE_DIR', None)
+    environ.pop('SDSS_INSTALL_MIRROR_DIR', None)
+    return {'directory': directory, 'svn_url': svn_url, 'environ': environ}
+
+
+@pytest.fixture
+def install(sandbox, tmp_path):
+    '''Return a function which runs bin/sdss_install with the given arguments
+    and returns the phases of its run report. Each run starts from a new
+    product root, holding the cache directory, unless keep_root is True.'''
+    counter = {'run': 0}
+
+    def install(arguments, keep_root=False):
+        counter['run'] += 1
+        root = str(tmp_path.joinpath('root'))
+        if not keep_root: rmtree(root, ignore_errors=True)
+        report = str(tmp_path.joinpath('report-{0}.json'.format(counter['run'])))
+        command = ([sys.executable, SDSS_INSTALL, '--level', 'info', '--root', root,
+                    '--report', report] + arguments)
+        subprocess.run(command, cwd=str(tmp_path), env=sandbox['environ'], check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(report) as file: return json.load(file)['phases']
+
+    return install
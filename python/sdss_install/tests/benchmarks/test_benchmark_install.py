@@ -0,0 +1,94 @@
+# encoding: utf-8
+#
+# test_benchmark_install.py
+#
+# Run with: pytest python/sdss_install/tests/benchmarks --benchmark-only
+# and compare runs with --benchmark-autosave and --benchmark-compare.
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import pytest
+
+
+pytest.importorskip('pytest_benchmark')
+
+# Rounds of each benchmark; every round is a complete sdss_install run
+ROUNDS = 3
+
+
+def get_phases(phases):
+    '''Return the dict of the wall time of each top-level phase of a run report.'''
+    return {phase['name']: phase['wall'] for phase in phases if not phase['parent']}
+
+
+def run_benchmark(benchmark, install, arguments, **kwargs):
+    '''Benchmark sdss_install with arguments, and record the phases of the last run.'''
+    phases = benchmark.pedantic(install, args=(arguments,), kwargs=kwargs,
+                                rounds=ROUNDS, iterations=1)
+    benchmark.extra_info['phases'] = get_phases(phases)
+    return phases
+
+
+class TestGitHubInstall(object):
+    """Benchmarks of complete GitHub installs from local bare repositories."""
+
+    @pytest.mark.parametrize('product', ['pysmall', 'pylarge', 'makeprod'])
+    def test_tag(self, benchmark, install, product):
+        benchmark.group = 'github-tag'
+        run_benchmark(benchmark, install, ['-G', '--https', product, '1.0.0'])
+
+    @pytest.mark.parametrize('product', ['pysmall', 'makeprod'])
+    def test_branch(self, benchmark, install, product):
+        benchmark.group = 'github-branch'
+        run_benchmark(benchmark, install, ['-G', '--https', product, 'main'])
+
+    def test_evilmake(self, benchmark, install):
+        benchmark.group = 'github-tag'
+        run_benchmark(benchmark, install, ['-G', '--https', '-E', 'evilprod', '1.0.0'])
+
+    def test_external_dependencies(self, benchmark, install):
+        benchmark.group = 'github-tag'
+        # --force, since the install directory of each external dependency
+        # is created before it is checked
+        phases = run_benchmark(benchmark, install,
+                               ['-G', '--https', '--force', '--workers', '2', 'extprod', '1.0.0'])
+        assert 'Install.install_external_dependencies' in get_phases(phases)
+
+    def test_warm_mirror(self, benchmark, install):
+        benchmark.group = 'github-tag'
+        install(['-G', '--https', 'pylarge', '1.0.0'])
+        run_benchmark(benchmark, install, ['-G', '--https', '--force', 'pylarge', '1.0.0'],
+                      keep_root=True)
+
+    def test_warm_wheel(self, benchmark, install):
+        benchmark.group = 'github-tag'
+        install(['-G', '--https', '--wheel', 'pylarge', '1.0.0'])
+        run_benchmark(benchmark, install, ['-G', '--https', '--force', '--wheel',
+                                           'pylarge', '1.0.0'], keep_root=True)
+
+
+class TestSvnInstall(object):
+    """Benchmarks of complete SVN installs from a local file:// repository."""
+
+    @pytest.fixture(autouse=True)
+    def svn_url(self, sandbox):
+        if not sandbox['svn_url']: pytest.skip('svn and svnadmin are not available')
+        return sandbox['svn_url']
+
+    @pytest.mark.parametrize('product', ['pysmall', 'pylarge', 'makeprod'])
+    def test_tag(self, benchmark, install, svn_url, product):
+        benchmark.group = 'svn-tag'
+        run_benchmark(benchmark, install, ['--url', svn_url, product, '1.0.0'])
+
+    def test_tag_parallel(self, benchmark, install, svn_url):
+        benchmark.group = 'svn-tag'
+        run_benchmark(benchmark, install, ['--url', svn_url, '--svn-parallel',
+                                           'pylarge', '1.0.0'])
+
+    def test_trunk(self, benchmark, install, svn_url):
+        benchmark.group = 'svn-trunk'
+        run_benchmark(benchmark, install, ['--url', svn_url, 'pysmall', 'trunk'])
@@ -17,3 +17,27 @@ Those conftest.py will only be applies to the tests in that subdirectory and
 underlying directories. See https://docs.pytest.org/en/2.7.3/plugins.html for
 more information.
 """
+
+import pytest
+
+from sdss_install.application import Argument
+from sdss_install.install import Install
+
+
+@pytest.fixture
+def make_install(tmpdir):
+    """Return a factory of ready GitHub Installs of product a in the product
+    root tmpdir, with the extra command line args and product keys."""
+
+    def make_install(*args, **product):
+        version = product.pop('version', '1.0.0')
+        options = Argument('sdss_install', args=['-G'] + list(args) + ['a', version]).options
+        install = Install(options=options)
+        install.ready = True
+        install.product = dict({'name': 'a', 'version': version, 'is_tag': True,
+                                'is_not_tag': False}, **product)
+        install.directory = {'original': str(tmpdir),
+                             'install': str(tmpdir.join('a', version))}
+        return install
+
+    return make_install
@@ -0,0 +1,55 @@
+# encoding: utf-8
+#
+# test_artifacts.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from os import lstat, readlink, symlink
+from os.path import islink
+
+from sdss_install.utils.artifacts import Artifacts
+
+
+class TestArtifacts(object):
+    """Tests for the artifact cache."""
+
+    def test_store_restore(self, tmpdir):
+        source = tmpdir.mkdir('install')
+        source.mkdir('bin').join('tool').write('#!/bin/sh\n')
+        symlink('bin/tool', str(source.join('tool')))
+        artifacts = Artifacts(directory=str(tmpdir.join('artifacts')))
+        key = {'product': 'a', 'revision': '0123abc', 'dependencies': []}
+        assert artifacts.restore(key=key, destination=str(tmpdir.join('x'))) is False
+        assert artifacts.store(key=key, source=str(source))
+        destination = tmpdir.join('restored')
+        assert artifacts.restore(key=key, destination=str(destination))
+        assert destination.join('bin', 'tool').read() == '#!/bin/sh\n'
+        assert islink(str(destination.join('tool')))
+        assert readlink(str(destination.join('tool'))) == 'bin/tool'
+        assert lstat(str(destination.join('bin', 'tool'))).st_nlink == 3
+        other = dict(key, revision='4567def')
+        assert artifacts.get_path(key=other) != artifacts.get_path(key=key)
+
+    def test_branch(self, tmpdir, make_install):
+        install = make_install('--artifact-cache', version='main', is_tag=False, is_not_tag=True)
+        install.directory['work'] = str(tmpdir.mkdir('work'))
+        install.artifact_key = {'product': 'a'}
+        install.set_artifact_key()
+        assert install.artifact_key is None
+
+    def test_install_path(self, tmpdir, make_install):
+        keys = list()
+        for root in ('r1', 'r2'):
+            install = make_install('--artifact-cache')
+            install.directory['install'] = str(tmpdir.join(root, 'a', '1.0.0'))
+            install.directory['work'] = str(tmpdir.ensure(root, 'a', '.1.0.0.work', dir=True))
+            install.get_revision = lambda: '0123abc'
+            install.set_artifact_key()
+            keys.append(install.artifact_key)
+        assert keys[0]['install'] == str(tmpdir.join('r1', 'a', '1.0.0'))
+        artifacts = Artifacts(directory=str(tmpdir.join('artifacts')))
+        assert artifacts.get_path(key=keys[0]) != artifacts.get_path(key=keys[1])
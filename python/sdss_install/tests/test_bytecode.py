@@ -0,0 +1,57 @@
+# encoding: utf-8
+#
+# test_bytecode.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import pytest
+
+from sdss_install.application import Argument
+
+
+
+class TestCompileBytecode(object):
+    """Tests for the compilation of the installed Python trees to bytecode."""
+
+    @pytest.mark.parametrize(('mode', 'flags'), [('timestamp', 0),
+                                                 ('checked-hash', 3),
+                                                 ('unchecked-hash', 1)])
+    def test_compile(self, tmpdir, make_install, mode, flags):
+        tmpdir.join('a', '1.0.0', 'python', 'a', '__init__.py').write('x = 1\n', ensure=True)
+        tmpdir.join('a', '1.0.0', 'lib', 'python3.11', 'site-packages', 'b.py').write(
+            'y = 2\n', ensure=True)
+        tmpdir.join('a', '1.0.0', 'src', 'c.py').write('z = 3\n', ensure=True)
+        install = make_install('--compile-bytecode', '--bytecode-mode', mode, '--jobs', '2')
+        assert install.get_python_dirs() == [
+            str(tmpdir.join('a', '1.0.0', 'python')),
+            str(tmpdir.join('a', '1.0.0', 'lib', 'python3.11', 'site-packages'))]
+        install.compile_bytecode()
+        pycs = tmpdir.join('a', '1.0.0').visit('*.pyc')
+        assert sorted(pyc.purebasename.split('.')[0] for pyc in pycs) == ['__init__', 'b']
+        for pyc in tmpdir.join('a', '1.0.0').visit('*.pyc'):
+            assert pyc.read_binary()[4] == flags
+
+    def test_no_parallel_make(self, tmpdir, make_install, monkeypatch):
+        tmpdir.join('a', '1.0.0', 'python', 'a.py').write('x = 1\n', ensure=True)
+        workers = list()
+        monkeypatch.setattr('compileall.compile_dir',
+                            lambda *args, **kwargs: workers.append(kwargs['workers']) or True)
+        install = make_install('--jobs', '3')
+        install.no_parallel_make = True
+        assert install.get_make_command() == ['make']
+        install.compile_python_dirs()
+        assert workers == [3]
+
+    def test_disabled(self, tmpdir, make_install):
+        tmpdir.join('a', '1.0.0', 'python', 'a.py').write('x = 1\n', ensure=True)
+        make_install().compile_bytecode()
+        assert not list(tmpdir.join('a', '1.0.0').visit('*.pyc'))
+
+    def test_options(self):
+        options = Argument('sdss_install', args=['--compile-bytecode', 'a', '1.0.0']).options
+        assert (options.compile_bytecode, options.bytecode_mode) == (True, 'checked-hash')
+        assert (options.product, options.product_version) == ('a', '1.0.0')
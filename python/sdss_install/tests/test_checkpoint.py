@@ -0,0 +1,92 @@
+# encoding: utf-8
+#
+# test_checkpoint.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import subprocess
+
+from sdss_install.utils.checkpoint import Checkpoint
+
+
+class TestCheckpoint(object):
+    """Tests for the checkpoint of the completed phases of an install."""
+
+    key = {'product': 'a', 'version': '1.0.0', 'github': True}
+
+    def test_add_load(self, tmpdir):
+        checkpoint = Checkpoint(directory=str(tmpdir), key=self.key)
+        assert not checkpoint.load()
+        checkpoint.revision = '0123abc'
+        assert checkpoint.add(phase='build')
+        assert checkpoint.add(phase='fetch')
+        assert not tmpdir.listdir(lambda path: path.ext == '.tmp')
+        loaded = Checkpoint(directory=str(tmpdir), key=dict(self.key))
+        assert loaded.load()
+        assert loaded.phases == ['fetch', 'build']
+        assert loaded.revision == '0123abc'
+        assert 'fetch' in loaded and 'build_package' not in loaded
+
+    def test_other_key(self, tmpdir):
+        Checkpoint(directory=str(tmpdir), key=self.key).add(phase='fetch')
+        other = Checkpoint(directory=str(tmpdir), key=dict(self.key, version='1.0.1'))
+        assert not other.load()
+        assert other.phases == []
+
+    def test_reset_remove(self, tmpdir):
+        checkpoint = Checkpoint(directory=str(tmpdir), key=self.key)
+        checkpoint.revision = '0123abc'
+        for phase in Checkpoint.PHASES: checkpoint.add(phase=phase)
+        checkpoint.reset(phase='install_directory')
+        assert checkpoint.phases == ['fetch']
+        checkpoint.reset()
+        assert checkpoint.phases == [] and checkpoint.revision is None
+        checkpoint.remove()
+        assert not tmpdir.join(Checkpoint.filename).check()
+
+
+class TestWorkDirectory(object):
+    """Tests for the work directory of an install, without a checkpoint."""
+
+    def test_test_option(self, tmpdir, make_install, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.join('a-1.0.0', 'old').ensure()
+        install = make_install('--test')
+        install.import_data = lambda: None
+        install.export_data = lambda: None
+        install.set_directory_work()
+        assert install.ready and install.checkpoint is None
+        assert install.directory['work'] == str(tmpdir.join('a-1.0.0'))
+        assert not tmpdir.join('a-1.0.0', 'old').check()
+
+
+class TestRevision(object):
+    """Tests for the revision recorded by the checkpoint of a fetch."""
+
+    def test_fetch(self, tmpdir, make_install):
+        work = tmpdir.mkdir('work')
+        git = ['git', '-C', str(work), '-c', 'user.name=a', '-c', 'user.email=a@a']
+        subprocess.check_call(git + ['init', '-q'])
+        subprocess.check_call(git + ['commit', '-q', '--allow-empty', '-m', 'a'])
+        head = subprocess.check_output(git + ['rev-parse', 'HEAD'],
+                                       universal_newlines=True).strip()
+        install = make_install(version='main', is_tag=False, is_not_tag=True)
+        install.directory['work'] = str(work)
+        install.checkpoint = Checkpoint(directory=str(work), key=TestCheckpoint.key)
+        install.import_data = lambda: None
+
+        class Install5(object):
+            def fetch(self): pass
+
+            def get_refs(self, version=None, fresh=False):
+                raise AssertionError('git ls-remote after the fetch')
+
+        install.install5 = Install5()
+        install.fetch()
+        assert install.ready
+        assert install.checkpoint.revision == head
+        assert install.checkpoint.phases == ['fetch']
@@ -0,0 +1,45 @@
+# encoding: utf-8
+#
+# test_cpu.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from sdss_install.utils.cpu import get_cgroups, get_cpu_count, get_cpu_quota
+
+
+class TestCpu(object):
+    """Tests for the available CPU count."""
+
+    def test_cgroups(self, tmpdir):
+        tmpdir.join('cgroup').write('12:cpu,cpuacct:/batch/job\n4:memory:/batch\n0::/user/job\n')
+        assert get_cgroups(str(tmpdir.join('cgroup'))) == {'v2': '/user/job', 'cpu': '/batch/job'}
+        assert get_cgroups(str(tmpdir.join('missing'))) == {'v2': '/', 'cpu': '/'}
+
+    def test_cgroup_v2(self, tmpdir):
+        tmpdir.join('cgroup').write('0::/user/job\n')
+        cgroup = str(tmpdir.join('cgroup'))
+        tmpdir.join('root', 'user', 'job', 'cpu.max').write('150000 100000\n', ensure=True)
+        assert get_cpu_quota(str(tmpdir.join('root')), cgroup) == 1.5
+        tmpdir.join('root', 'user', 'job', 'cpu.max').write('max 100000\n')
+        assert get_cpu_quota(str(tmpdir.join('root')), cgroup) is None
+        tmpdir.join('root', 'user', 'cpu.max').write('100000 100000\n')
+        assert get_cpu_quota(str(tmpdir.join('root')), cgroup) == 1
+        tmpdir.join('root', 'cpu.max').write('300000 100000\n')
+        assert get_cpu_quota(str(tmpdir.join('root')), str(tmpdir.join('missing'))) == 3
+
+    def test_cgroup_v1(self, tmpdir):
+        tmpdir.join('cgroup').write('3:cpu,cpuacct:/batch/job\n0::/\n')
+        cgroup = str(tmpdir.join('cgroup'))
+        job = tmpdir.join('root', 'cpu', 'batch', 'job')
+        job.join('cpu.cfs_quota_us').write('200000\n', ensure=True)
+        job.join('cpu.cfs_period_us').write('100000\n')
+        assert get_cpu_quota(str(tmpdir.join('root')), cgroup) == 2
+        job.join('cpu.cfs_quota_us').write('-1\n')
+        assert get_cpu_quota(str(tmpdir.join('root')), cgroup) is None
+
+    def test_cpu_count(self):
+        assert get_cpu_count() >= 1
@@ -0,0 +1,55 @@
+# encoding: utf-8
+#
+# test_delta.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from sdss_install.install import Install
+
+
+def make_tree(tmpdir, version, source=True):
+    '''Make an install of version of product a, a git working tree if source.'''
+    tmpdir.join('a', version, 'etc', 'a.module' if source else 'config.ini').write(
+        '', ensure=True)
+    if source: tmpdir.join('a', version, '.git').ensure(dir=True)
+
+
+class TestDelta(object):
+    """Tests for the choice of the installed version which seeds a --delta install."""
+
+    def test_version_key(self):
+        versions = ['v5_13_10', 'v5_13_1', 'v5_9_0', 'main', '1.0.0', 'v5_13_1a']
+        assert sorted(versions, key=Install.get_version_key) == [
+            '1.0.0', 'main', 'v5_9_0', 'v5_13_1', 'v5_13_1a', 'v5_13_10']
+
+    def test_source(self, tmpdir, make_install):
+        assert make_install('--delta', version='v5_13_1').get_delta_source() is None
+        for version in ('v5_9_0', 'v5_13_0', 'v5_14_0'): make_tree(tmpdir, version)
+        make_tree(tmpdir, 'v5_13_0a', source=False)
+        tmpdir.join('a', '.v5_13_0b.old', '.git').ensure(dir=True)
+        assert (make_install('--delta', version='v5_13_1').get_delta_source() ==
+                str(tmpdir.join('a', 'v5_13_0')))
+        assert (make_install('--delta', version='v5_0_0').get_delta_source() ==
+                str(tmpdir.join('a', 'v5_9_0')))
+        assert (make_install('--delta', version='v5_14_0').get_delta_source() ==
+                str(tmpdir.join('a', 'v5_13_0')))
+
+    def test_evilmake(self, tmpdir, monkeypatch, make_install):
+        monkeypatch.chdir(tmpdir)
+        commands = list()
+        for seeded in (False, True):
+            install = make_install('--delta', version='v5_13_1')
+            install.options.evilmake = True
+            install.options.skip_module = True
+            install.build_type = ['evilmake']
+            install.directory['install'] = str(tmpdir.mkdir(str(seeded)))
+            install.move_directory_work = lambda: None
+            install.execute_command = lambda command=None, argument=None, phase=None: (
+                commands.append(command) or ('', '', 0))
+            install.seeded = seeded
+            install.build()
+        assert commands == [['evilmake', 'clean'], ['evilmake'], ['evilmake']]
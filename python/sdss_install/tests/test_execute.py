@@ -0,0 +1,81 @@
+# encoding: utf-8
+#
+# test_execute.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+
+from sdss_install.utils.execute import execute_command, execute_commands
+
+
+class TestExecuteCommand(object):
+    """Tests for the streaming command executor."""
+
+    def test_output(self):
+        command = [sys.executable, '-c',
+                   'import sys; print("out"); sys.stderr.write("err\\n"); sys.exit(3)']
+        (out, err, returncode) = execute_command(command=command)
+        assert (out, err, returncode) == ('out\n', 'err\n', 3)
+
+    def test_tail(self, tmpdir):
+        logfile = str(tmpdir.join('logs', 'build.log'))
+        command = [sys.executable, '-c', 'for i in range(1000): print(i)']
+        (out, err, returncode) = execute_command(command=command, tail=2, logfile=logfile)
+        assert out == '998\n999\n'
+        with open(logfile) as file: lines = file.readlines()
+        assert len(lines) == 1002
+        assert lines[-1] == '# returncode: 0\n'
+
+    def test_signal(self):
+        command = [sys.executable, '-c', 'import os, signal; os.kill(os.getpid(), signal.SIGTERM)']
+        (out, err, returncode) = execute_command(command=command)
+        assert returncode == -15
+
+    def test_missing_command(self):
+        (out, err, returncode) = execute_command(command=['sdss_install_no_such_command'])
+        assert out is None and returncode is None
+        assert err.startswith('Unable to run')
+
+
+class TestExecuteCommands(object):
+    """Tests for the concurrent command executor."""
+
+    def test_output(self, tmpdir):
+        logfile = str(tmpdir.join('logs', 'fetch.log'))
+        commands = [[sys.executable, '-c', 'for i in range(1000): print(i)'],
+                    [sys.executable, '-c', 'import sys; sys.stderr.write("err\\n"); sys.exit(3)'],
+                    ['sdss_install_no_such_command']]
+        results = execute_commands(commands=commands, tail=2, logfile=logfile)
+        assert results[0] == ('998\n999\n', '', 0)
+        assert results[1] == ('', 'err\n', 3)
+        assert results[2][0] is None and results[2][1].startswith('Unable to run')
+        with open(logfile) as file: lines = file.readlines()
+        assert len(lines) == 1007
+        assert execute_commands(commands=[]) == []
+
+    def test_concurrent(self):
+        command = [sys.executable, '-c', 'import time; time.sleep(0.5)']
+        start = time()
+        assert execute_commands(commands=[command] * 4) == [('', '', 0)] * 4
+        assert time() - start < 1.5
+        start = time()
+        execute_commands(commands=[command] * 2, workers=1)
+        assert time() - start >= 1.0
+
+    def test_running_loop(self):
+        async def run():
+            return execute_commands(commands=[['true'], ['false']])
+        assert [result[2] for result in asyncio.run(run())] == [0, 1]
+
+    def test_thread(self):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            results = executor.submit(execute_commands, commands=[['true'], ['false']]).result()
+        assert [result[2] for result in results] == [0, 1]
@@ -0,0 +1,65 @@
+# encoding: utf-8
+#
+# test_imports.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import subprocess
+import sys
+from os.path import abspath, dirname, join
+
+from pytest import mark
+
+
+PACKAGE_DIR = dirname(dirname(dirname(dirname(abspath(__file__)))))
+
+# Modules which are slow to import, or only needed by some runs
+DEFERRED = ['yaml', 'pygments', 'distutils', 'configparser',
+            'sdss_install.utils.logger', 'sdss_install.install4',
+            'sdss_install.install5', 'sdss_install.install.manifest',
+            'sdss_install.install.mirror', 'sdss_install.utils.index',
+            'sqlite3']
+
+
+def get_modules(code):
+    '''Return the set of the modules imported by code, run in a new interpreter.'''
+    code += '\nimport sys\nprint("\\n".join(sys.modules))'
+    out = subprocess.check_output([sys.executable, '-c', code],
+                                  cwd=PACKAGE_DIR, universal_newlines=True,
+                                  env={'PYTHONPATH': join(PACKAGE_DIR, 'python')})
+    return set(out.split())
+
+
+class TestImports(object):
+    """Tests that slow imports are deferred until they are needed."""
+
+    def test_version(self):
+        out = subprocess.check_output([sys.executable, '-X', 'importtime',
+                                       join(PACKAGE_DIR, 'bin', 'sdss_install'), '--version'],
+                                      stderr=subprocess.STDOUT, universal_newlines=True,
+                                      env={'PYTHONPATH': join(PACKAGE_DIR, 'python')})
+        imported = set(line.split('|')[-1].strip() for line in out.splitlines()
+                       if line.startswith('import time:'))
+        assert 'sdss_install.application' in imported
+        assert not imported.intersection(DEFERRED + ['sdss_install.install'])
+
+    @mark.parametrize(('code', 'imported'),
+                      [('import sdss_install', []),
+                       ('from sdss_install.install import Install', []),
+                       ('from sdss_install.application import Argument\n' +
+                        'from sdss_install.install import Install\n' +
+                        'options = Argument("sdss_install",\n' +
+                        '                   args=["-G", "prod", "1.0.0"]).options\n' +
+                        'Install(options=options).set_install5()', ['sdss_install.install5'])])
+    def test_deferred(self, code, imported):
+        modules = get_modules(code)
+        assert modules.issuperset(imported)
+        assert not modules.intersection(set(DEFERRED) - set(imported))
+
+    def test_config(self):
+        import sdss_install
+        assert isinstance(sdss_install.config, dict)
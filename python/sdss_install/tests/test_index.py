@@ -0,0 +1,69 @@
+# encoding: utf-8
+#
+# test_index.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import sqlite3
+from argparse import Namespace
+
+import pytest
+
+from sdss_install.utils.index import Index, get_index_path, get_size
+
+
+def get_record(version='1.0.0', **kwargs):
+    '''Return the record of an install of product a.'''
+    install = {'repository': 'github', 'product': 'a', 'version': version,
+               'revision': '0123abc', 'build_type': 'python', 'path': '/r/a/' + version,
+               'size': 2048, 'started': '2026-01-01T00:00:00',
+               'finished': '2026-01-01T00:01:00', 'wall': 60.0}
+    install.update(kwargs)
+    return install
+
+
+class TestIndex(object):
+    """Tests for the SQLite index of the installed products."""
+
+    def test_add_select(self, tmpdir):
+        index = Index(path=str(tmpdir.join('index.db')))
+        index.add(install=get_record(), dependencies=[('tree', '1.0', 'module')])
+        index.add(install=get_record(version='main'))
+        index.add(install=get_record(revision='4567def'),
+                  dependencies=[('b', '2.0.0', 'external')])
+        installs = index.select()
+        assert [install['version'] for install in installs] == ['1.0.0', 'main']
+        assert installs[0]['revision'] == '4567def'
+        assert index.select(product='a', version='main')[0]['path'] == '/r/a/main'
+        assert index.select(product='b') == []
+        (columns, rows) = index.query('SELECT dependency, kind FROM dependencies')
+        assert columns == ['dependency', 'kind']
+        assert rows == [('b', 'external')]
+
+    def test_readonly(self, tmpdir):
+        index = Index(path=str(tmpdir.join('index.db')))
+        index.add(install=get_record())
+        with pytest.raises(sqlite3.Error):
+            index.query('DELETE FROM installs')
+        assert len(index.select()) == 1
+
+    def test_lines(self, tmpdir):
+        index = Index(path=str(tmpdir.join('index.db')))
+        assert index.get_lines() == []
+        index.add(install=get_record())
+        lines = index.get_lines()
+        assert lines[0].split() == ['product', 'version', 'repository', 'revision',
+                                    'build_type', 'size', 'finished', 'path']
+        assert lines[1].split()[:6] == ['a', '1.0.0', 'github', '0123abc', 'python', '2.0K']
+        assert index.get_lines(sql='SELECT count(*) AS n FROM installs') == ['n', '1']
+
+    def test_path(self, tmpdir):
+        assert get_index_path(Namespace(index='/i.db', root='/r')) == '/i.db'
+        assert get_index_path(Namespace(index=None, root='/r')) == '/r/.sdss_install.db'
+        tmpdir.join('a', 'b').write('x' * 10, ensure=True)
+        tmpdir.join('c').write('x' * 5)
+        assert get_size(str(tmpdir)) == 15
@@ -0,0 +1,142 @@
+# encoding: utf-8
+#
+# test_install4.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import logging
+import sys
+from os.path import join
+
+from sdss_install.application import Argument
+from sdss_install.install4 import Install4
+
+
+def get_install4(tmpdir, args):
+    options = Argument('sdss_install', args=args + ['repo/prod', '1.0.0']).options
+    install4 = Install4(logger=logging.getLogger('sdss_install'), options=options)
+    install4.set_ready()
+    install4.set_product()
+    install4.set_svncommand()
+    install4.directory = {'work': str(tmpdir.join('work'))}
+    return install4
+
+
+class TestSvnExport(object):
+    """Tests for the revision pinned SVN export of Install4."""
+
+    def test_parse_revision(self):
+        out = ('<?xml version="1.0" encoding="UTF-8"?>\n<info>\n'
+               '<entry kind="dir" path="1.0.0" revision="1234">\n'
+               '<url>https://svn.sdss.org/repo/prod/tags/1.0.0</url>\n'
+               '<commit revision="1200"></commit>\n</entry>\n</info>\n')
+        assert Install4.parse_revision(out=out) == ('1234', '1200')
+        assert Install4.parse_revision(out='svn: E170000') == (None, None)
+
+    def test_fetch_parallel(self, tmpdir):
+        install4 = get_install4(tmpdir, ['--svn-parallel', '--workers', '2'])
+        install4.product['revision'] = '1234'
+        commands = list()
+
+        def execute_command(command=None, phase=None, full=False):
+            commands.append(command)
+            out = 'bin/\nsetup.py\npython/\n' if 'ls' in command else str()
+            return (out, str(), 0 if 'cat' not in command else 1)
+
+        def execute_commands(commands=None, workers=None, phase=None):
+            assert workers == 2
+            return [execute_command(command=command, phase=phase) for command in commands]
+
+        install4.execute_command = execute_command
+        install4.execute_commands = execute_commands
+        install4.fetch()
+        assert install4.ready
+        assert install4.product['sparse'] is None
+        url = install4.product['url']
+        work = str(tmpdir.join('work'))
+        assert commands[0] == ['svn', 'cat', url + '/etc/config.ini@1234']
+        assert commands[1] == ['svn', 'ls', url + '@1234']
+        assert commands[2] == ['svn', 'export', '--depth', 'files', url + '@1234', work]
+        assert sorted(commands[3:]) == [
+            ['svn', 'export', url + '/bin@1234', join(work, 'bin')],
+            ['svn', 'export', url + '/python@1234', join(work, 'python')]]
+
+    def test_fetch_sparse(self, tmpdir):
+        install4 = get_install4(tmpdir, [])
+        install4.product['revision'] = '1234'
+        commands = list()
+        config = '[sdss_install]\ninclude = cal/flat\n'
+
+        def execute_command(command=None, phase=None, full=False):
+            commands.append(command)
+            return (config if 'cat' in command else str(), str(), 0)
+
+        def execute_commands(commands=None, workers=None, phase=None):
+            return [execute_command(command=command, phase=phase) for command in commands]
+
+        install4.execute_command = execute_command
+        install4.execute_commands = execute_commands
+        install4.fetch()
+        assert install4.ready
+        assert install4.product['sparse'] == {'include': ['etc', 'cal/flat'], 'exclude': []}
+        url = install4.product['url']
+        work = str(tmpdir.join('work'))
+        assert commands[1:] == [
+            ['svn', 'export', '--depth', 'files', url + '@1234', work],
+            ['svn', 'export', url + '/etc@1234', join(work, 'etc')],
+            ['svn', 'export', url + '/cal/flat@1234', join(work, 'cal', 'flat')]]
+        assert tmpdir.join('work', 'cal').check(dir=True)
+
+    def test_fetch_plan_empty(self, tmpdir, monkeypatch):
+        install4 = get_install4(tmpdir, [])
+        install4.product['sparse'] = {'include': ['etc'], 'exclude': []}
+        install4.execute_commands = lambda commands=None, workers=None, phase=None: [
+            ('', '', 0) for command in commands]
+        plans = {'empty': [('data', 'empty')], 'unlisted': None}
+        for (name, plan) in plans.items():
+            monkeypatch.setattr(sys.modules[Install4.__module__], 'get_svn_plan',
+                                lambda sparse=None, list_directory=None: plan)
+            install4.ready = True
+            install4.fetch_plan()
+            assert install4.ready == (plan is not None)
+        assert tmpdir.join('work', 'data').check(dir=True)
+
+
+class TestSnapshot(object):
+    """Tests for the --offline SVN installs of Install4 from snapshots."""
+
+    def test_fetch_snapshot(self, tmpdir):
+        mirror_dir = tmpdir.join('mirror')
+        snapshot = mirror_dir.join('svn', 'repo', 'prod', 'tags', '1.0.0')
+        snapshot.join('etc', 'config.ini').write('[sdss_install]\ninclude = python\n',
+                                                 ensure=True)
+        snapshot.join('python', 'prod', '__init__.py').write('', ensure=True)
+        snapshot.join('data', 'big.fits').write('', ensure=True)
+        snapshot.join('setup.py').write('')
+        mirror_dir.join('svn', 'repo', 'prod', 'tags', '1.0.0.json').write(
+            '{"revision": "1234", "last_changed_revision": "1200"}')
+        install4 = get_install4(tmpdir, ['--offline', '--mirror-dir', str(mirror_dir)])
+
+        def execute_command(command=None, phase=None, full=False):
+            raise AssertionError('svn run --offline: {}'.format(command))
+
+        install4.execute_command = execute_command
+        install4.set_exists()
+        assert install4.ready
+        assert install4.product['last_changed_revision'] == '1200'
+        install4.fetch()
+        assert install4.ready
+        work = tmpdir.join('work')
+        assert work.join('setup.py').check()
+        assert work.join('etc', 'config.ini').check()
+        assert work.join('python', 'prod', '__init__.py').check()
+        assert not work.join('data').check()
+
+    def test_no_snapshot(self, tmpdir):
+        install4 = get_install4(tmpdir, ['--offline', '--mirror-dir', str(tmpdir)])
+        install4.set_exists()
+        assert not install4.ready
@@ -0,0 +1,205 @@
+# encoding: utf-8
+#
+# test_install5.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import logging
+import sys
+
+from sdss_install.application import Argument
+from sdss_install.install5 import Install5
+from sdss_install.utils.cache import Cache
+from sdss_install.utils.sparse import get_git_patterns, get_sparse_paths, get_svn_plan
+
+
+class TestRefs(object):
+    """Tests for the remote ref table of Install5."""
+
+    def test_parse_refs(self):
+        out = ('1111\trefs/heads/main\n'
+               '2222\trefs/heads/feature/x\n'
+               '3333\trefs/tags/1.0.0\n'
+               '4444\trefs/tags/1.0.0^{}\n'
+               '5555\trefs/tags/0.9.0\n')
+        refs = Install5.parse_refs(out=out)
+        assert refs['heads'] == {'main': '1111', 'feature/x': '2222'}
+        assert refs['tags'] == {'1.0.0': '4444', '0.9.0': '5555'}
+
+    def test_parse_refs_empty(self):
+        assert Install5.parse_refs(out=None) == {'heads': {}, 'tags': {}}
+
+    def test_cache_miss(self, tmpdir):
+        options = Argument('sdss_install', args=['-G', '--https', '--root', str(tmpdir),
+                                                 'prod', '1.0.1']).options
+        listed = list()
+
+        def get_install5(tags):
+            install5 = Install5(logger=logging.getLogger('test'), options=options)
+            install5.ready = True
+
+            def set_refs(url=None, mirror_dir=None):
+                listed.append(url)
+                return {'heads': {'main': '1111'}, 'tags': dict(tags)}
+
+            install5.set_refs = set_refs
+            return install5
+
+        assert get_install5({'1.0.0': '2222'}).is_type(type='tag', version='1.0.0')
+        assert len(listed) == 1
+        # The cached refs lack the tag pushed since, so they are listed again
+        install5 = get_install5({'1.0.0': '2222', '1.0.1': '3333'})
+        assert install5.is_type(type='tag', version='1.0.0')
+        assert len(listed) == 1
+        assert install5.is_type(type='tag', version='1.0.1')
+        assert len(listed) == 2
+        assert not install5.is_type(type='tag', version='1.0.2')
+        assert len(listed) == 2
+        install5 = get_install5({'1.0.1': '3333'})
+        assert install5.get_refs(fresh=True)['tags'] == {'1.0.1': '3333'}
+        assert len(listed) == 3
+        assert install5.get_refs(fresh=True)['tags'] == {'1.0.1': '3333'}
+        assert len(listed) == 3
+
+    def test_unlocked_mirror(self, tmpdir, monkeypatch):
+        options = Argument('sdss_install', args=['-G', 'prod', '1.0.0']).options
+        install5 = Install5(logger=logging.getLogger('test_install5'), options=options)
+        install5.ready = True
+        monkeypatch.setattr('sdss_install.utils.lock.Lock.acquire', lambda self: False)
+        commands = list()
+        install5.execute_command = lambda command=None, phase=None, full=False: (
+            commands.append(command) or ('1111\trefs/tags/1.0.0\n', '', 0))
+        install5.execute_commands = None
+        refs = install5.set_refs(url='https://github.com/sdss/prod.git',
+                                 mirror_dir=str(tmpdir.join('prod.git')))
+        assert refs['tags'] == {'1.0.0': '1111'}
+        assert commands == [['git', 'ls-remote', '--heads', '--tags',
+                             'https://github.com/sdss/prod.git']]
+        assert str(tmpdir.join('prod.git')) not in install5.mirrors
+
+
+class TestExecuteCommand(object):
+    """Tests for the output of the commands run by Install5."""
+
+    def test_tail(self, caplog):
+        options = Argument('sdss_install', args=['-G', 'prod', '1.0.0']).options
+        install5 = Install5(logger=logging.getLogger('test_install5'), options=options)
+        command = [sys.executable, '-c', 'for i in range(1500): print(i)']
+        with caplog.at_level(logging.DEBUG, logger='test_install5'):
+            (out, err, returncode) = install5.execute_command(command=command)
+        assert out.splitlines() == [str(i) for i in range(500, 1500)]
+        assert len(caplog.records) == 1500
+        (out, err, returncode) = install5.execute_command(command=command, full=True)
+        assert len(out.splitlines()) == 1500
+
+
+class TestClone(object):
+    """Tests for the clone commands of Install5."""
+
+    def test_external_of_sparse_product(self, tmpdir):
+        options = Argument('sdss_install', args=['-G', '--no-mirror', 'prod', '1.0.0']).options
+        install5 = Install5(logger=logging.getLogger('test_install5'), options=options)
+        install5.ready = True
+        install5.product = {'name': 'prod', 'version': '1.0.0',
+                            'sparse': {'include': ['etc'], 'exclude': []}}
+        install5.external_product = {'github_remote_url': 'https://github.com/sdss/ext1.git',
+                                     'install_dir': str(tmpdir.join('ext1')),
+                                     'version': 'main'}
+        commands = list()
+        install5.execute_command = lambda command=None, phase=None, full=False: (
+            commands.append(command) or ('', '', 0))
+        install5.clone()
+        assert install5.ready
+        assert commands == [['git', 'clone', 'https://github.com/sdss/ext1.git',
+                             str(tmpdir.join('ext1'))]]
+
+    def test_unlocked_mirror(self, tmpdir, monkeypatch):
+        options = Argument('sdss_install', args=['-G', '--mirror-dir', str(tmpdir.join('mirror')),
+                                                 'prod', '1.0.0']).options
+        install5 = Install5(logger=logging.getLogger('test_install5'), options=options)
+        install5.ready = True
+        install5.product = {'name': 'prod', 'version': '1.0.0', 'sparse': None}
+        install5.github_remote_url = 'https://github.com/sdss/prod.git'
+        install5.directory = {'work': str(tmpdir.join('work'))}
+        monkeypatch.setattr('sdss_install.utils.lock.Lock.acquire', lambda self: False)
+        commands = list()
+        install5.execute_command = lambda command=None, phase=None, full=False: (
+            commands.append(command) or ('', '', 0))
+        install5.clone()
+        assert install5.ready
+        assert commands == [['git', 'clone', 'https://github.com/sdss/prod.git',
+                             str(tmpdir.join('work'))]]
+
+    def test_delta_unlocked_mirror(self, tmpdir, monkeypatch):
+        options = Argument('sdss_install', args=['-G', '--mirror-dir', str(tmpdir.join('mirror')),
+                                                 'prod', '1.0.1']).options
+        install5 = Install5(logger=logging.getLogger('test_install5'), options=options)
+        install5.ready = True
+        install5.product = {'name': 'prod', 'version': '1.0.1'}
+        install5.github_remote_url = 'https://github.com/sdss/prod.git'
+        install5.directory = {'work': str(tmpdir.join('work'))}
+        tmpdir.join('1.0.0', 'README').write('1.0.0', ensure=True)
+        monkeypatch.setattr('sdss_install.utils.lock.Lock.acquire', lambda self: False)
+        commands = list()
+        install5.execute_command = lambda command=None, phase=None, full=False: (
+            commands.append(command) or ('', '', 0))
+        install5.checkout = lambda: None
+        install5.delta(source_dir=str(tmpdir.join('1.0.0')))
+        assert install5.ready
+        assert commands[-1] == ['git', '-C', str(tmpdir.join('work')), 'fetch', '--no-tags',
+                                'https://github.com/sdss/prod.git',
+                                '+refs/tags/1.0.1:refs/tags/1.0.1']
+
+
+class TestCache(object):
+    """Tests for the on-disk cache."""
+
+    def test_set_get(self, tmpdir):
+        cache = Cache(directory=str(tmpdir), ttl=60)
+        assert cache.get(key='url') is None
+        assert cache.set(key='url', value={'heads': {'main': '1111'}})
+        assert cache.get(key='url') == {'heads': {'main': '1111'}}
+
+    def test_unserializable(self, tmpdir):
+        cache = Cache(directory=str(tmpdir), ttl=60)
+        assert not cache.set(key='url', value=object())
+        assert cache.get(key='url') is None
+        assert not tmpdir.listdir()
+
+    def test_unwritable(self, tmpdir):
+        cache = Cache(directory=str(tmpdir.join('file', 'cache')), ttl=60)
+        tmpdir.join('file').write('')
+        assert not cache.set(key='url', value=1)
+
+    def test_disabled(self, tmpdir):
+        cache = Cache(directory=str(tmpdir), ttl=0)
+        assert not cache.set(key='url', value=1)
+        assert cache.get(key='url') is None
+
+
+class TestSparse(object):
+    """Tests for the sparse fetch paths."""
+
+    def test_sparse_paths(self):
+        config = '[sdss_install]\ninclude = data/cal, /bin/\nexclude = data/cal/raw\n'
+        sparse = get_sparse_paths(options=None, config=config)
+        assert sparse == {'include': ['etc', 'data/cal', 'bin'], 'exclude': ['data/cal/raw']}
+        assert get_git_patterns(sparse=sparse) == ['/*', '!/*/', '/etc', '/data/cal', '/bin',
+                                                   '!/data/cal/raw']
+        assert get_sparse_paths(options=None, config='[sdss_install]\nevilmake = True\n') is None
+
+    def test_svn_plan(self):
+        tree = {'': ['data', 'etc'], 'data': ['cal', 'raw'], 'data/raw': ['a', 'b']}
+        plan = get_svn_plan(sparse={'include': [], 'exclude': ['data/raw/b']},
+                            list_directory=lambda path: tree.get(path, []))
+        assert plan == [('', 'files'), ('data', 'files'), ('data/cal', 'infinity'),
+                        ('data/raw', 'files'), ('data/raw/a', 'infinity'), ('etc', 'infinity')]
+        plan = get_svn_plan(sparse={'include': ['etc', 'data/raw/a'], 'exclude': []},
+                            list_directory=lambda path: tree.get(path, []))
+        assert plan == [('', 'files'), ('etc', 'infinity'), ('data', 'empty'),
+                        ('data/raw', 'empty'), ('data/raw/a', 'infinity')]
+        assert get_svn_plan(sparse=None, list_directory=lambda path: None) is None
@@ -0,0 +1,117 @@
+# encoding: utf-8
+#
+# test_lock.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import subprocess
+import sys
+from os.path import abspath, dirname, join
+from threading import Thread
+from time import sleep
+
+from sdss_install.utils.lock import Lock
+
+
+PACKAGE_DIR = dirname(dirname(dirname(dirname(abspath(__file__)))))
+
+# Try to acquire the lock argv[1] without waiting, and print the result
+TRY_LOCK = ('import sys\n'
+            'from sdss_install.utils.lock import Lock\n'
+            'print(Lock(path=sys.argv[1], timeout=0).acquire())\n')
+
+
+def try_lock(path):
+    '''Return True if another process acquires the lock path without waiting.'''
+    out = subprocess.check_output([sys.executable, '-c', TRY_LOCK, path],
+                                  universal_newlines=True,
+                                  env={'PYTHONPATH': join(PACKAGE_DIR, 'python')})
+    return out.strip() == 'True'
+
+
+
+class TestLock(object):
+    """Tests for the lock of a lock file across processes and threads."""
+
+    def test_processes(self, tmpdir):
+        path = str(tmpdir.join('a', '.1.0.0.lock'))
+        with Lock(path=path) as lock:
+            assert lock.file is not None
+            assert not try_lock(path)
+        assert try_lock(path)
+
+    def test_threads(self, tmpdir):
+        path = str(tmpdir.join('.lock'))
+        held = list()
+
+        def hold(i):
+            with Lock(path=path, poll=0.01):
+                held.append(i)
+                sleep(0.01)
+                held.append(i)
+
+        threads = [Thread(target=hold, args=(i,)) for i in range(4)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        # Each thread appended its two entries while holding the lock
+        assert all(held[j] == held[j + 1] for j in range(0, 8, 2))
+
+    def test_timeout(self, tmpdir):
+        path = str(tmpdir.join('.lock'))
+        with Lock(path=path):
+            lock = Lock(path=path, timeout=0.05, poll=0.01)
+            assert not lock.acquire()
+            assert lock.waited
+        assert lock.acquire()
+        lock.release()
+
+
+class TestLockInstall(object):
+    """Tests for the reuse of an install completed while waiting for its lock."""
+
+    def hold(self, tmpdir, done):
+        '''Lock the install of a 1.0.0 as another process would, which has
+        already made its install directory, and complete it if done.'''
+        tmpdir.join('a', '1.0.0').ensure(dir=True)
+        lock = Lock(path=str(tmpdir.join('a', '.1.0.0.lock')))
+        lock.acquire()
+
+        def finish():
+            sleep(0.2)
+            if done: tmpdir.join('a', '.1.0.0.done').ensure()
+            lock.release()
+
+        thread = Thread(target=finish)
+        thread.start()
+        return thread
+
+    def test_reused(self, tmpdir, make_install):
+        thread = self.hold(tmpdir, done=True)
+        install = make_install()
+        install.lock_install()
+        thread.join()
+        assert install.ready and install.reused
+        install.unlock_install()
+
+    def test_failed(self, tmpdir, make_install):
+        thread = self.hold(tmpdir, done=False)
+        install = make_install()
+        install.lock_install()
+        thread.join()
+        assert install.ready and not install.reused
+        install.mark_install()
+        assert tmpdir.join('a', '.1.0.0.done').check()
+        install.unlock_install()
+
+    def test_stale(self, tmpdir, make_install):
+        tmpdir.join('a', '1.0.0').ensure(dir=True)
+        tmpdir.join('a', '.1.0.0.done').ensure()
+        install = make_install()
+        install.lock_install()
+        assert install.ready and not install.reused
+        assert not tmpdir.join('a', '.1.0.0.done').check()
+        install.unlock_install()
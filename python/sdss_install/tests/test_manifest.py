@@ -0,0 +1,93 @@
+# encoding: utf-8
+#
+# test_manifest.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import logging
+from json import dumps
+
+from sdss_install.application import Argument
+from sdss_install.install import Manifest
+from sdss_install.utils.report import Report
+
+
+def get_manifest(tmpdir, products, workers=2, args=None):
+    filename = tmpdir.join('manifest.json')
+    filename.write(dumps({'products': products}))
+    options = Argument('sdss_install', args=['--manifest', str(filename),
+                                             '--workers', str(workers)] +
+                       (args or list())).options
+    manifest = Manifest(logger=logging.getLogger('sdss_install'), options=options)
+    manifest.set_ready()
+    manifest.set_products()
+    manifest.set_dependencies()
+    return manifest
+
+
+class TestManifest(object):
+    """Tests for the manifest scheduler."""
+
+    def test_install_order(self, tmpdir):
+        manifest = get_manifest(tmpdir, [
+            {'product': 'c', 'version': '1.0', 'dependencies': ['a', 'b']},
+            {'product': 'b', 'version': '1.0', 'dependencies': ['a', 'tree']},
+            {'product': 'a', 'version': '1.0', 'dependencies': []}])
+        assert manifest.ready
+        assert manifest.dependencies == {'a': [], 'b': ['a'], 'c': ['a', 'b']}
+        installed = list()
+        manifest.install_product = lambda product: (installed.append(product['name']) or
+                                                    (True, None, None))
+        manifest.install()
+        assert manifest.ready
+        assert installed == ['a', 'b', 'c']
+
+    def test_failed_dependency(self, tmpdir):
+        manifest = get_manifest(tmpdir, [
+            {'product': 'a', 'version': '1.0', 'dependencies': []},
+            {'product': 'b', 'version': '1.0', 'dependencies': ['a']},
+            {'product': 'c', 'version': '1.0', 'dependencies': []}])
+        manifest.install_product = lambda product: (product['name'] != 'a', None, None)
+        manifest.install()
+        assert not manifest.ready
+        assert manifest.results == {'a': False, 'b': False, 'c': True}
+
+    def test_cycle(self, tmpdir):
+        manifest = get_manifest(tmpdir, [
+            {'product': 'a', 'version': '1.0', 'dependencies': ['b']},
+            {'product': 'b', 'version': '1.0', 'dependencies': ['a']}])
+        assert not manifest.ready
+
+    def test_arguments(self, tmpdir, monkeypatch):
+        manifest = get_manifest(tmpdir, [{'product': 'a', 'version': '1.0',
+                                          'dependencies': [], 'options': ['-n']}],
+                                args=['--work', '3', '-GF', '--root', '/tmp/root',
+                                      '--incl', 'etc', '--include=bin'])
+        assert manifest.ready and manifest.get_workers() == 3
+        monkeypatch.setattr('sdss_install.install.manifest.get_cpu_count', lambda: 8)
+        arguments = ['--force', '--root', '/tmp/root', '--include', 'etc', '--include', 'bin']
+        command = manifest.get_command(product=manifest.products[0])
+        assert command[2:] == arguments + ['--jobs', '2', '-n', '--github', 'a', '1.0']
+        manifest.options.jobs = 1
+        command = manifest.get_command(product=manifest.products[0])
+        assert command[2:] == (['--jobs', '1'] + arguments +
+                               ['-n', '--github', 'a', '1.0'])
+
+    def test_report(self, tmpdir, monkeypatch):
+        filename = str(tmpdir.join('report.json'))
+        manifest = get_manifest(tmpdir, [{'product': 'a', 'version': '1.0', 'dependencies': []}],
+                                args=['--report', filename])
+        product = manifest.products[0]
+        command = manifest.get_command(product=product)
+        assert command[command.index('--report') + 1] == filename + '.a-1.0'
+        assert command.count('--report') == 1
+        report = Report()
+        monkeypatch.setattr('sdss_install.install.manifest.report', report)
+        tmpdir.join('report.json.a-1.0').write(dumps({'total': {'wall': 1.0}}))
+        manifest.add_report(product=product)
+        assert report.get_data()['products'] == {'a/1.0': {'total': {'wall': 1.0}}}
+        assert not tmpdir.join('report.json.a-1.0').check()
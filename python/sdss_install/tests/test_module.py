@@ -0,0 +1,48 @@
+# encoding: utf-8
+#
+# test_module.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from os import stat
+from stat import S_IMODE
+
+from sdss_install.install.modules import UMASK, Modules
+from sdss_install.utils import Module
+
+
+class TestParseEnviron(object):
+    """Tests for the parsing of modulecmd python output."""
+
+    def test_lmod(self):
+        out = ('os.environ["TREE_DIR"] = "/sdss/tree/dr17";\n'
+               'os.environ["PATH"] = "/sdss/tree/dr17/bin:/usr/bin";\n'
+               '_mlstatus = True\n')
+        assert Module.parse_environ(out=out) == {'TREE_DIR': '/sdss/tree/dr17',
+                                                 'PATH': '/sdss/tree/dr17/bin:/usr/bin'}
+
+    def test_tcl(self):
+        out = ("os.environ['IDLUTILS_DIR'] = '/sdss/idlutils/v5'\n"
+               "del os.environ['OLD_DIR']\n"
+               "os.chdir('/tmp')\n")
+        assert Module.parse_environ(out=out) == {'IDLUTILS_DIR': '/sdss/idlutils/v5',
+                                                 'OLD_DIR': None}
+
+    def test_not_executed(self):
+        out = "os.environ['A'] = __import__('os').getcwd()\nos.environ['B'] = 'b'\n"
+        assert Module.parse_environ(out=out) == {'B': 'b'}
+
+
+class TestWriteFile(object):
+    """Tests for the atomic write of module files."""
+
+    def test_write_file(self, tmpdir):
+        path = str(tmpdir.join('1.0.0'))
+        Modules().write_file(path=path, text='#%Module1.0\n')
+        assert tmpdir.join('1.0.0').read() == '#%Module1.0\n'
+        assert S_IMODE(stat(path).st_mode) == 0o666 & ~UMASK
+        assert tmpdir.listdir() == [tmpdir.join('1.0.0')]
@@ -0,0 +1,55 @@
+# encoding: utf-8
+#
+# test_report.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from json import load
+
+from sdss_install.utils import execute
+from sdss_install.utils.report import Report, get_network_bytes
+
+
+class TestReport(object):
+    """Tests for the run report."""
+
+    def test_phases(self, tmpdir, monkeypatch):
+        report = Report()
+        monkeypatch.setattr(execute, 'report', report)
+
+        class Phases(object):
+            @report.phase
+            def run(self):
+                execute.execute_command(command=['echo', 'report'])
+
+        phase = report.start_phase(name='outer')
+        Phases().run()
+        report.stop_phase(phase)
+        data = report.get_data()
+        assert [p['name'] for p in data['phases']] == ['outer', 'Phases.run']
+        assert data['phases'][1]['parent'] == 'outer'
+        assert [p['commands'] for p in data['phases']] == [1, 1]
+        assert data['phases'][0]['output_bytes'] == len('report\n')
+        assert data['commands'][0]['phase'] == 'Phases.run'
+        assert data['commands'][0]['returncode'] == 0
+        assert data['total']['commands'] == 1
+        assert len(report.get_summary()) == 4
+        filename = str(tmpdir.join('report.json'))
+        report.write(filename=filename)
+        with open(filename) as file:
+            assert load(file)['commands'][0]['command'] == 'echo report'
+        assert 'network_received_bytes' in data['phases'][0]
+
+    def test_network_bytes(self, tmpdir):
+        net_dev = tmpdir.join('dev')
+        net_dev.write('Inter-|   Receive |  Transmit\n'
+                      ' face |bytes    packets errs drop fifo frame compressed multicast|bytes\n'
+                      '    lo:  500 5 0 0 0 0 0 0  500 5 0 0 0 0 0 0\n'
+                      '  eth0: 1000 9 0 0 0 0 0 0  200 3 0 0 0 0 0 0\n'
+                      '  eth1:   24 1 0 0 0 0 0 0    8 1 0 0 0 0 0 0\n')
+        assert get_network_bytes(filename=str(net_dev)) == (1024, 208)
+        assert get_network_bytes(filename=str(tmpdir.join('missing'))) == (0, 0)
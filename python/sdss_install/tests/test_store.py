@@ -0,0 +1,64 @@
+# encoding: utf-8
+#
+# test_store.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from os import stat
+
+from sdss_install.utils.store import Store
+
+
+def make_tree(tmpdir, version, extra=None):
+    '''Write the install tree of version of product a, and return its directory.'''
+    tree = tmpdir.join('a', version)
+    tree.join('python', 'a', '__init__.py').write('x = 1\n', ensure=True)
+    tree.join('bin', 'run').write('#!/bin/sh\n', ensure=True)
+    tree.join('bin', 'run').chmod(0o755)
+    tree.join('etc', 'config.ini').write('#!/bin/sh\n', ensure=True)
+    if extra: tree.join('python', 'a', 'extra.py').write(extra)
+    return tree
+
+
+class TestStore(object):
+    """Tests for the content-addressed store of install trees."""
+
+    def test_dedup(self, tmpdir):
+        store = Store(directory=str(tmpdir.join('.store')))
+        first = make_tree(tmpdir, '1.0.0')
+        second = make_tree(tmpdir, '1.0.1', extra='y = 2\n')
+        assert store.dedup(tree=str(first)) == (0, 0, 0)
+        assert store.dedup(tree=str(second)) == (3, 26, 0)
+        for name in (('python', 'a', '__init__.py'), ('bin', 'run'), ('etc', 'config.ini')):
+            assert stat(str(first.join(*name))).st_ino == stat(str(second.join(*name))).st_ino
+        # Files with the same contents but other permissions are kept apart
+        assert (stat(str(first.join('bin', 'run'))).st_ino !=
+                stat(str(first.join('etc', 'config.ini'))).st_ino)
+        assert second.join('bin', 'run').stat().mode & 0o777 == 0o755
+        assert second.join('python', 'a', 'extra.py').read() == 'y = 2\n'
+        assert store.dedup(tree=str(second)) == (0, 0, 0)
+
+    def test_select(self, tmpdir):
+        store = Store(directory=str(tmpdir.join('.store')))
+        first = make_tree(tmpdir, '1.0.0')
+        second = make_tree(tmpdir, '1.0.1')
+        store.dedup(tree=str(first))
+        assert store.dedup(tree=str(second),
+                           select=lambda path: path.endswith('.py')) == (1, 6, 0)
+
+    def test_collect(self, tmpdir):
+        store = Store(directory=str(tmpdir.join('.store')))
+        first = make_tree(tmpdir, '1.0.0', extra='y = 2\n')
+        second = make_tree(tmpdir, '1.0.1')
+        store.dedup(tree=str(first))
+        store.dedup(tree=str(second))
+        assert store.collect() == (0, 0)
+        first.remove()
+        assert store.collect(test=True) == (1, 6)
+        assert store.collect() == (1, 6)
+        assert store.collect() == (0, 0)
+        assert second.join('python', 'a', '__init__.py').read() == 'x = 1\n'
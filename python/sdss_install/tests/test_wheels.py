@@ -0,0 +1,41 @@
+# encoding: utf-8
+#
+# test_wheels.py
+
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from os.path import basename
+
+from sdss_install.utils.wheels import Wheels, get_abi
+
+
+class TestWheels(object):
+    """Tests for the cache of the wheels of the tagged Python products."""
+
+    key = {'product': 'a', 'version': '1.0.0', 'abi': 'cpython-311-x86_64-linux-gnu',
+           'revision': '0123456789abcdef'}
+
+    def test_path(self, tmpdir):
+        wheels = Wheels(directory=str(tmpdir))
+        assert wheels.get_path(key=self.key) == str(
+            tmpdir.join('a', '1.0.0', 'cpython-311-x86_64-linux-gnu-0123456789ab'))
+        assert wheels.get_path(key=dict(self.key, revision=None)).endswith('linux-gnu')
+        assert Wheels().get_path(key=self.key) is None
+        assert get_abi()
+
+    def test_store_get(self, tmpdir):
+        wheel = tmpdir.join('build', 'a-1.0.0-py3-none-any.whl')
+        wheel.write('wheel', ensure=True)
+        wheels = Wheels(directory=str(tmpdir.join('wheels')))
+        assert wheels.get(key=self.key) == []
+        assert wheels.store(key=self.key, wheels=[str(wheel)])
+        cached = wheels.get(key=self.key)
+        assert [basename(path) for path in cached] == [wheel.basename]
+        assert not tmpdir.join('wheels', 'a', '1.0.0').listdir(lambda path: path.ext == '.tmp')
+        # A wheel of the same key is kept
+        assert wheels.store(key=self.key, wheels=[str(wheel)])
+        assert wheels.get(key=dict(self.key, revision='fedcba9876543210')) == []
@@ -1,3 +1,11 @@
 
-from .logger import log
-from .module import Module
+def __getattr__(name):
+    '''Import log and Module on first use, since the logging system installs
+    an exception hook, and neither is needed by every run.'''
+    if name == 'log':
+        from .logger import log
+        return log
+    elif name == 'Module':
+        from .module import Module
+        return Module
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
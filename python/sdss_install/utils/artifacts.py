@@ -0,0 +1,94 @@
+# encoding: utf-8
+#
+# @Filename: artifacts.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from hashlib import sha256
+from json import dump, dumps
+from os import link, listdir, lstat, makedirs, readlink, rename, symlink
+from os.path import isdir, join
+from shutil import copy2, copystat, rmtree
+from stat import S_ISDIR, S_ISLNK
+from tempfile import mkdtemp
+
+from .lock import Lock
+
+
+def link_tree(source=None, destination=None):
+    '''Recreate the directory tree source as destination, hardlinking files.
+
+    Files are copied when they cannot be hardlinked, e.g. across filesystems.
+    Symbolic links are recreated as they are. Return the number of copied files.
+    '''
+    copied = 0
+    makedirs(destination)
+    for name in listdir(source):
+        (src, dst) = (join(source, name), join(destination, name))
+        mode = lstat(src).st_mode
+        if S_ISLNK(mode): symlink(readlink(src), dst)
+        elif S_ISDIR(mode): copied += link_tree(source=src, destination=dst)
+        else:
+            try: link(src, dst)
+            except OSError:
+                copy2(src, dst)
+                copied += 1
+    copystat(source, destination)
+    return copied
+
+
+class Artifacts:
+    '''Store of finished install trees, keyed by everything which determines the build.
+
+    Each artifact is a directory named after the sha256 of the JSON encoded
+    key, next to a JSON file with the key itself. Artifacts are written to a
+    temporary directory and renamed into place, and are shared with the
+    install directories by hardlinks, so storing and restoring is cheap
+    when the cache and the product root are on the same filesystem.
+    '''
+
+    def __init__(self, directory=None):
+        self.directory = directory
+
+    def get_path(self, key=None):
+        '''Return the directory of the artifact with the given key dict.'''
+        digest = sha256(dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+        return join(self.directory, digest) if self.directory and key else None
+
+    def restore(self, key=None, destination=None):
+        '''Restore the artifact with the given key as destination. Return True on success.'''
+        restored = False
+        path = self.get_path(key=key)
+        if path and isdir(path):
+            with Lock(path + '.lock'):
+                try:
+                    link_tree(source=path, destination=destination)
+                    restored = True
+                except (IOError, OSError):
+                    rmtree(destination, ignore_errors=True)
+        return restored
+
+    def store(self, key=None, source=None):
+        '''Store the directory tree source as the artifact with the given key.
+        Return True on success.'''
+        stored = False
+        path = self.get_path(key=key)
+        if path and isdir(source):
+            with Lock(path + '.lock'):
+                if isdir(path): stored = True
+                else:
+                    tmp_path = None
+                    try:
+                        tmp_path = mkdtemp(dir=self.directory, suffix='.tmp')
+                        link_tree(source=source, destination=join(tmp_path, 'tree'))
+                        with open(path + '.json', 'w') as file:
+                            dump(key, file, indent=2, sort_keys=True)
+                        rename(join(tmp_path, 'tree'), path)
+                        stored = True
+                    except (IOError, OSError):
+                        stored = False
+                    finally:
+                        if tmp_path: rmtree(tmp_path, ignore_errors=True)
+        return stored
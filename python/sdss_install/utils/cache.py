@@ -0,0 +1,92 @@
+# encoding: utf-8
+#
+# @Filename: cache.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from hashlib import sha1
+from json import dump, load
+from os import environ, fdopen, makedirs, remove, rename
+from os.path import isdir, join
+from tempfile import mkstemp
+from time import time
+
+
+def get_cache_dir(options=None):
+    '''Return the sdss_install cache directory, or None if it cannot be determined.
+
+    The directory is taken from the --cache-dir option, if given,
+    otherwise it is the .cache directory of the product root.
+    '''
+    cache_dir = getattr(options, 'cache_dir', None) if options else None
+    if not cache_dir:
+        root = getattr(options, 'root', None) if options else None
+        root = root if root else environ.get('SDSS_INSTALL_PRODUCT_ROOT')
+        cache_dir = join(root, '.cache') if root else None
+    return cache_dir
+
+
+def get_mirror_root(options=None):
+    '''Return the directory of the GitHub mirrors and SVN snapshots, or None.
+
+    The directory is taken from the --mirror-dir option, if given,
+    otherwise it is the sdss_install cache directory.
+    '''
+    mirror_root = getattr(options, 'mirror_dir', None) if options else None
+    return mirror_root if mirror_root else get_cache_dir(options=options)
+
+
+class Cache:
+    '''Small on-disk cache of JSON serializable values with a time-to-live.
+
+    Each key is stored in its own file, which is written to a temporary
+    file first and renamed into place, so concurrent sdss_install processes
+    never read a partially written entry.
+    '''
+
+    def __init__(self, directory=None, ttl=None):
+        self.directory = directory
+        self.ttl = ttl
+
+    def get_path(self, key=None):
+        '''Return the path of the file holding the given key.'''
+        digest = sha1(key.encode('utf-8')).hexdigest() if key else None
+        return (join(self.directory, digest + '.json')
+                if self.directory and digest else None)
+
+    def get(self, key=None):
+        '''Return the cached value of key, or None if absent or expired.'''
+        value = None
+        path = self.get_path(key=key)
+        if path and (self.ttl is None or self.ttl > 0):
+            try:
+                with open(path) as file: entry = load(file)
+            except (IOError, OSError, ValueError): entry = None
+            if entry and entry.get('key') == key:
+                age = time() - entry.get('time', 0)
+                if self.ttl is None or 0 <= age < self.ttl:
+                    value = entry.get('value')
+        return value
+
+    def set(self, key=None, value=None):
+        '''Store value under key. Return True on success.'''
+        stored = False
+        path = self.get_path(key=key)
+        if path and (self.ttl is None or self.ttl > 0):
+            try:
+                if not isdir(self.directory): makedirs(self.directory)
+            except OSError: pass
+            tmp_path = None
+            try:
+                (fd, tmp_path) = mkstemp(dir=self.directory, suffix='.tmp')
+                with fdopen(fd, 'w') as file:
+                    dump({'key': key, 'time': time(), 'value': value}, file)
+                rename(tmp_path, path)
+                stored = True
+            except (IOError, OSError, TypeError, ValueError):
+                if tmp_path:
+                    try: remove(tmp_path)
+                    except OSError: pass
+        return stored
@@ -0,0 +1,87 @@
+# encoding: utf-8
+#
+# @Filename: checkpoint.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from json import dump, load
+from os import fdopen, remove, rename
+from os.path import join
+from tempfile import mkstemp
+
+
+class Checkpoint:
+    '''The completed phases of an install, kept in a JSON file of its work directory.
+
+    The file records the key of the install, e.g. the product, version and
+    build options, the revision which was fetched and the completed phases,
+    in the order of PHASES. A checkpoint is only loaded if its key is that
+    of the current install. The file is written to a temporary file first
+    and renamed into place, so an interrupted install never leaves a
+    partially written checkpoint.
+    '''
+
+    filename = '.sdss_install.checkpoint'
+
+    # The phases of an install, in order
+    PHASES = ['fetch', 'install_directory', 'modulefile',
+              'build', 'build_documentation', 'build_package']
+
+    def __init__(self, directory=None, key=None):
+        self.directory = directory
+        self.key = key
+        self.revision = None
+        self.phases = list()
+
+    def __contains__(self, phase):
+        return phase in self.phases
+
+    def get_path(self):
+        '''Return the path of the checkpoint file, or None.'''
+        return join(self.directory, self.filename) if self.directory else None
+
+    def load(self):
+        '''Load the checkpoint file. Return True if it is a checkpoint of self.key.'''
+        try:
+            with open(self.get_path()) as file: data = load(file)
+        except (IOError, OSError, TypeError, ValueError): data = None
+        loaded = isinstance(data, dict) and data.get('key') == self.key
+        if loaded:
+            self.revision = data.get('revision')
+            self.phases = [phase for phase in self.PHASES if phase in data.get('phases', list())]
+        return loaded
+
+    def save(self):
+        '''Write the checkpoint file. Return True on success.'''
+        saved = False
+        tmp_path = None
+        try:
+            (fd, tmp_path) = mkstemp(dir=self.directory, suffix='.tmp')
+            with fdopen(fd, 'w') as file:
+                dump({'key': self.key, 'revision': self.revision, 'phases': self.phases}, file)
+            rename(tmp_path, self.get_path())
+            saved = True
+        except (IOError, OSError, TypeError, ValueError):
+            if tmp_path:
+                try: remove(tmp_path)
+                except OSError: pass
+        return saved
+
+    def add(self, phase=None):
+        '''Record the completed phase. Return True on success.'''
+        if phase not in self.phases:
+            self.phases = [p for p in self.PHASES if p in self.phases or p == phase]
+        return self.save()
+
+    def reset(self, phase=None):
+        '''Forget phase and the phases after it, or all phases.'''
+        index = self.PHASES.index(phase) if phase in self.PHASES else 0
+        self.phases = [p for p in self.phases if self.PHASES.index(p) < index]
+        if phase is None: self.revision = None
+
+    def remove(self):
+        '''Remove the checkpoint file, if any.'''
+        try: remove(self.get_path())
+        except (OSError, TypeError): pass
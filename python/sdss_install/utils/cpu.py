@@ -0,0 +1,85 @@
+# encoding: utf-8
+#
+# @Filename: cpu.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from math import ceil
+from multiprocessing import cpu_count
+from os.path import join
+
+
+def get_cgroups(filename='/proc/self/cgroup'):
+    '''Return the cgroup v2 path and the cgroup v1 cpu controller path of the process.
+
+    Both are read from filename, in the format of /proc/self/cgroup, and
+    default to the root cgroup.
+    '''
+    cgroups = {'v2': '/', 'cpu': '/'}
+    try:
+        with open(filename) as file:
+            for line in file:
+                (hierarchy, controllers, path) = line.rstrip('\n').split(':', 2)
+                if hierarchy == '0' and not controllers: cgroups['v2'] = path
+                elif 'cpu' in controllers.split(','): cgroups['cpu'] = path
+    except (IOError, OSError, ValueError):
+        pass
+    return cgroups
+
+
+def get_cgroup_dirs(directory=None, path=None):
+    '''Return the directory of the cgroup path under directory, and those of its parents.'''
+    dirs = [directory]
+    for name in (path or '/').strip('/').split('/'):
+        if name: dirs.insert(0, join(dirs[0], name))
+    return dirs
+
+
+def get_cpu_quota(cgroup_root='/sys/fs/cgroup', cgroup='/proc/self/cgroup'):
+    '''Return the CPU limit of the cgroup of the process, or None if unlimited.
+
+    The cgroup of the process is read from cgroup. The limit is the smallest
+    of those of the cgroup and its parents, from the cgroup v2 cpu.max files,
+    or else from the CFS quotas of the cgroup v1 cpu controller.
+    '''
+    cgroups = get_cgroups(filename=cgroup)
+    quotas = list()
+    for directory in get_cgroup_dirs(directory=cgroup_root, path=cgroups['v2']):
+        try:
+            with open(join(directory, 'cpu.max')) as file:
+                (limit, period) = file.read().split()[:2]
+            if limit != 'max': quotas.append(int(limit) / int(period))
+        except (IOError, OSError, ValueError):
+            pass
+    if not quotas:
+        for directory in get_cgroup_dirs(directory=join(cgroup_root, 'cpu'),
+                                         path=cgroups['cpu']):
+            try:
+                with open(join(directory, 'cpu.cfs_quota_us')) as file:
+                    limit = int(file.read())
+                with open(join(directory, 'cpu.cfs_period_us')) as file:
+                    period = int(file.read())
+                if limit > 0 and period > 0: quotas.append(limit / period)
+            except (IOError, OSError, ValueError):
+                pass
+    return min(quotas) if quotas else None
+
+
+def get_cpu_count():
+    '''Return the number of CPUs available to the process.
+
+    This is the number of CPUs of the process affinity mask, if supported,
+    further limited by the CPU quota of its cgroup (e.g. in containers and
+    batch jobs).
+    '''
+    try:
+        from os import sched_getaffinity
+        count = len(sched_getaffinity(0))
+    except (ImportError, OSError):
+        try: count = cpu_count()
+        except NotImplementedError: count = 1
+    quota = get_cpu_quota()
+    if quota: count = min(count, int(ceil(quota)))
+    return max(1, count)
@@ -0,0 +1,211 @@
+# encoding: utf-8
+#
+# @Filename: execute.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import asyncio
+from collections import deque
+from os import WEXITSTATUS, WIFEXITED, WIFSIGNALED, WTERMSIG, makedirs, wait4
+from os.path import dirname, isdir
+from subprocess import Popen, PIPE
+from sys import version_info
+from threading import Lock, Thread, current_thread, main_thread
+from time import time
+
+from .report import report
+
+
+def wait(proc):
+    '''Wait for the process proc and return (returncode, rusage).'''
+    try:
+        (pid, status, rusage) = wait4(proc.pid, 0)
+    except OSError:
+        rusage = None
+    else:
+        if WIFEXITED(status): proc.returncode = WEXITSTATUS(status)
+        elif WIFSIGNALED(status): proc.returncode = -WTERMSIG(status)
+    return (proc.wait(), rusage)
+
+
+def open_logfile(logfile=None, command=None, logger=None):
+    '''Open logfile for appending, write command to it and return it, or None.'''
+    log = None
+    if logfile:
+        try:
+            if dirname(logfile) and not isdir(dirname(logfile)):
+                makedirs(dirname(logfile))
+            log = open(logfile, 'a')
+            log.write('$ {}\n'.format(' '.join(command)))
+        except (IOError, OSError) as e:
+            log = None
+            if logger: logger.warning('Unable to write {0}: {1}'.format(logfile, e))
+    return log
+
+
+class Output(object):
+    '''The output of a command, collected line by line from both of its pipes.
+
+    Each line is decoded, counted, logged at debug level if a logger is given,
+    and appended to the log file if one is open. Only the last tail lines of
+    each pipe are kept if tail is given.
+    '''
+
+    def __init__(self, argument=None, logger=None, log=None, tail=None):
+        self.argument = argument if argument else 'replace'
+        self.logger = logger
+        self.log = log
+        self.lines = {'out': deque(maxlen=tail) if tail else list(),
+                      'err': deque(maxlen=tail) if tail else list()}
+        self.size = 0
+        self.lock = Lock()
+
+    def add(self, key, line):
+        '''Add the bytes line read from the pipe key ('out' or 'err').'''
+        with self.lock:
+            self.size += len(line)
+            line = line.decode('utf-8', self.argument)
+            self.lines[key].append(line)
+            if self.logger: self.logger.debug(line.rstrip('\n'))
+            if self.log: self.log.write(line)
+
+    def get(self):
+        '''Return the collected (out, err).'''
+        return (''.join(self.lines['out']), ''.join(self.lines['err']))
+
+
+def close_logfile(log=None, returncode=None):
+    '''Write returncode to the open logfile log and close it.'''
+    if log:
+        log.write('# returncode: {}\n'.format(returncode))
+        log.close()
+
+
+def execute_command(command=None, argument=None, logger=None, logfile=None,
+                    tail=None, cwd=None):
+    '''Execute the passed terminal command, streaming its output.
+
+    Both pipes are read line by line while the command runs, so the output
+    of long builds is neither buffered in memory nor delayed until the end.
+
+    Parameters:
+        command (list):
+            The command and its arguments.
+        argument (str):
+            The error handling of the utf-8 decoding of the output
+            (default: 'replace').
+        logger (logging.Logger):
+            If given, each output line is logged at debug level as it arrives.
+        logfile (str):
+            If given, the command and its output are appended to this file.
+        tail (int):
+            If given, only the last tail lines of stdout and of stderr are
+            kept and returned, otherwise the complete output.
+        cwd (str):
+            The directory in which to run the command.
+
+    Each command is recorded in the run report, with its wall time, CPU
+    time, output bytes and filesystem bytes.
+
+    Returns:
+        A tuple (out, err, returncode). If the command could not be started,
+        out is None, err the error message and returncode None.
+    '''
+    (out, err, returncode) = (None, None, None)
+    if command:
+        log = open_logfile(logfile=logfile, command=command, logger=logger)
+        start = time()
+        try:
+            proc = Popen(command, stdout=PIPE, stderr=PIPE, cwd=cwd)
+        except (IOError, OSError) as e:
+            proc = None
+            err = 'Unable to run {0}: {1}'.format(' '.join(command), e)
+        if proc:
+            output = Output(argument=argument, logger=logger, log=log, tail=tail)
+
+            def read(pipe, key):
+                for line in iter(pipe.readline, b''): output.add(key, line)
+                pipe.close()
+
+            readers = [Thread(target=read, args=(proc.stdout, 'out')),
+                       Thread(target=read, args=(proc.stderr, 'err'))]
+            for reader in readers:
+                reader.daemon = True
+                reader.start()
+            for reader in readers: reader.join()
+            (returncode, rusage) = wait(proc)
+            report.add_command(command=command, start=start, returncode=returncode,
+                               output_bytes=output.size, rusage=rusage)
+            (out, err) = output.get()
+        close_logfile(log=log, returncode=returncode)
+    return (out, err, returncode)
+
+
+async def execute_command_async(command=None, argument=None, logger=None, logfile=None,
+                                tail=None, cwd=None):
+    '''Execute the passed terminal command as an asyncio subprocess.
+
+    This is the awaitable counterpart of execute_command(), with the same
+    parameters and return value, so that several commands can run
+    concurrently in one thread. Both pipes are read as the command runs.
+    The command is recorded in the run report without its resource usage,
+    since the subprocess is reaped by the event loop.
+    '''
+    (out, err, returncode) = (None, None, None)
+    if command:
+        log = open_logfile(logfile=logfile, command=command, logger=logger)
+        start = time()
+        try:
+            proc = await asyncio.create_subprocess_exec(*command, stdout=PIPE, stderr=PIPE,
+                                                        cwd=cwd)
+        except (IOError, OSError) as e:
+            proc = None
+            err = 'Unable to run {0}: {1}'.format(' '.join(command), e)
+        if proc:
+            output = Output(argument=argument, logger=logger, log=log, tail=tail)
+
+            async def read(stream, key):
+                while True:
+                    line = await stream.readline()
+                    if not line: break
+                    output.add(key, line)
+
+            await asyncio.gather(read(proc.stdout, 'out'), read(proc.stderr, 'err'))
+            returncode = await proc.wait()
+            report.add_command(command=command, start=start, returncode=returncode,
+                               output_bytes=output.size)
+            (out, err) = output.get()
+        close_logfile(log=log, returncode=returncode)
+    return (out, err, returncode)
+
+
+def execute_commands(commands=None, workers=None, **kwargs):
+    '''Execute the passed terminal commands concurrently, at most workers at a
+    time (default: all), in an asyncio event loop.
+
+    The keyword arguments are those of execute_command(). Return the list of
+    the (out, err, returncode) tuples of the commands, in order. In a thread
+    which already runs an event loop, or outside of the main thread on Python
+    3.7, whose asyncio child watcher only works there, the commands are
+    executed one by one.
+    '''
+    commands = list(commands) if commands else list()
+    semaphore = None
+
+    async def execute(command):
+        async with semaphore:
+            return await execute_command_async(command=command, **kwargs)
+
+    async def execute_all():
+        nonlocal semaphore
+        semaphore = asyncio.Semaphore(workers if workers else max(1, len(commands)))
+        return await asyncio.gather(*[execute(command) for command in commands])
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        if version_info >= (3, 8) or current_thread() is main_thread():
+            return list(asyncio.run(execute_all())) if commands else list()
+    return [execute_command(command=command, **kwargs) for command in commands]
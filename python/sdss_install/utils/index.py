@@ -0,0 +1,166 @@
+# encoding: utf-8
+#
+# @Filename: index.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sqlite3
+from os import environ, lstat, walk
+from os.path import exists, join
+
+from sdss_install.utils.report import format_bytes
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS installs (
+    repository TEXT NOT NULL,
+    product TEXT NOT NULL,
+    version TEXT NOT NULL,
+    revision TEXT,
+    build_type TEXT,
+    path TEXT,
+    modulefile TEXT,
+    size INTEGER,
+    started TEXT,
+    finished TEXT,
+    wall REAL,
+    PRIMARY KEY (repository, product, version)
+);
+CREATE TABLE IF NOT EXISTS dependencies (
+    repository TEXT NOT NULL,
+    product TEXT NOT NULL,
+    version TEXT NOT NULL,
+    dependency TEXT NOT NULL,
+    dependency_version TEXT,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (repository, product, version, dependency, kind)
+);
+CREATE INDEX IF NOT EXISTS dependencies_dependency ON dependencies (dependency);
+'''
+
+# The columns of the installs table, in order
+COLUMNS = ['repository', 'product', 'version', 'revision', 'build_type', 'path',
+           'modulefile', 'size', 'started', 'finished', 'wall']
+
+# The columns printed by --list
+LIST_COLUMNS = ['product', 'version', 'repository', 'revision', 'build_type',
+                'size', 'finished', 'path']
+
+
+def get_index_path(options=None):
+    '''Return the path of the install index, or None if it cannot be determined.
+
+    The path is taken from the --index option, if given, otherwise it is
+    the file .sdss_install.db of the product root.
+    '''
+    path = getattr(options, 'index', None) if options else None
+    if not path:
+        root = getattr(options, 'root', None) if options else None
+        root = root if root else environ.get('SDSS_INSTALL_PRODUCT_ROOT')
+        path = join(root, '.sdss_install.db') if root else None
+    return path
+
+
+def get_size(directory=None):
+    '''Return the total size in bytes of the files of directory, without following links.'''
+    size = 0
+    for (dirpath, dirnames, filenames) in walk(directory):
+        for filename in filenames:
+            try: size += lstat(join(dirpath, filename)).st_size
+            except OSError: pass
+    return size
+
+
+def format_table(columns=None, rows=None):
+    '''Return the lines of a table of rows, with a column width fit to its values.'''
+    rows = [['' if value is None else str(value) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in rows])
+              for (i, column) in enumerate(columns)]
+    return ['  '.join(value.ljust(width) for (value, width) in zip(row, widths)).rstrip()
+            for row in [columns] + rows]
+
+
+class Index:
+    '''SQLite index of the installed products of a product root.
+
+    The installs table has a row per installed product version, with its
+    revision, build type, install path and size and the times of its last
+    install. The dependencies table has a row per module (loaded by the
+    modulefile) or external dependency of each install. Each install is
+    recorded in a single transaction, so concurrent sdss_install processes
+    and readers only ever see complete installs.
+
+    Parameters:
+        path (str):
+            The SQLite database file, created if missing.
+        timeout (float):
+            Seconds to wait for a concurrent writer to commit.
+    '''
+
+    def __init__(self, path=None, timeout=60):
+        self.path = path
+        self.timeout = timeout
+
+    def connect(self, readonly=False):
+        '''Return a connection to the index, which is created unless readonly.'''
+        if readonly:
+            connection = sqlite3.connect('file:{0}?mode=ro'.format(self.path),
+                                         timeout=self.timeout, uri=True)
+        else:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.executescript(SCHEMA)
+        return connection
+
+    def add(self, install=None, dependencies=None):
+        '''Record install, a dict of COLUMNS, and its dependencies, a list of
+        (dependency, version, kind) tuples, replacing any previous record.'''
+        key = (install['repository'], install['product'], install['version'])
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute('INSERT OR REPLACE INTO installs ({0}) VALUES ({1})'
+                                   .format(', '.join(COLUMNS), ', '.join('?' * len(COLUMNS))),
+                                   [install.get(column) for column in COLUMNS])
+                connection.execute('DELETE FROM dependencies WHERE ' +
+                                   'repository = ? AND product = ? AND version = ?', key)
+                connection.executemany('INSERT OR REPLACE INTO dependencies ' +
+                                       'VALUES (?, ?, ?, ?, ?, ?)',
+                                       [key + tuple(d) for d in dependencies or list()])
+        finally:
+            connection.close()
+
+    def query(self, sql=None, parameters=()):
+        '''Run the read-only query sql and return its column names and rows.'''
+        connection = self.connect(readonly=True)
+        try:
+            cursor = connection.execute(sql, parameters)
+            columns = [description[0] for description in cursor.description or list()]
+            return (columns, cursor.fetchall())
+        finally:
+            connection.close()
+
+    def select(self, product=None, version=None):
+        '''Return the installs, of product and version if given, as a list of dicts.'''
+        conditions = [(column, value) for (column, value)
+                      in (('product', product), ('version', version)) if value]
+        where = (' WHERE ' + ' AND '.join(column + ' = ?' for (column, value) in conditions)
+                 if conditions else '')
+        (columns, rows) = self.query('SELECT * FROM installs' + where +
+                                     ' ORDER BY product, version, repository',
+                                     [value for (column, value) in conditions])
+        return [dict(zip(columns, row)) for row in rows]
+
+    def get_lines(self, sql=None, product=None, version=None):
+        '''Return the lines of a table of the result of sql, or of the installs.'''
+        if not exists(self.path): return list()
+        if sql:
+            (columns, rows) = self.query(sql)
+        else:
+            columns = LIST_COLUMNS
+            rows = [[format_bytes(install[column])
+                     if column == 'size' and install[column] is not None
+                     else install[column] for column in columns]
+                    for install in self.select(product=product, version=version)]
+        return format_table(columns=columns, rows=rows)
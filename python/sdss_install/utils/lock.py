@@ -0,0 +1,87 @@
+# encoding: utf-8
+#
+# @Filename: lock.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from fcntl import lockf, LOCK_EX, LOCK_NB, LOCK_UN
+from os import makedirs
+from os.path import abspath, dirname, isdir
+from threading import Lock as ThreadLock
+from time import sleep, time
+
+
+class Lock:
+    '''Exclusive advisory lock on a lock file.
+
+    The lock is a POSIX record lock (fcntl), which, unlike flock, is also
+    honoured across hosts on NFS mounts served with a lock manager. The lock
+    is released when the process exits, so a crashed install never leaves a
+    stale lock behind. Threads of the same process are serialized by an
+    additional in-process lock per lock file, since record locks only
+    exclude other processes.
+
+    Parameters:
+        path (str):
+            The lock file, created if missing.
+        timeout (float):
+            Give up waiting after timeout seconds (default: wait forever).
+        poll (float):
+            Seconds between attempts to acquire the lock.
+    '''
+
+    thread_locks = dict()
+    thread_locks_lock = ThreadLock()
+
+    def __init__(self, path=None, timeout=None, poll=0.5):
+        self.path = abspath(path) if path else None
+        self.timeout = timeout
+        self.poll = poll
+        self.file = None
+        self.waited = False
+
+    def acquire(self):
+        '''Acquire the lock, waiting for other holders. Return True on success.'''
+        if self.file is None and self.path:
+            with Lock.thread_locks_lock:
+                thread_lock = Lock.thread_locks.setdefault(self.path, ThreadLock())
+            start = time()
+            while not thread_lock.acquire(False):
+                self.waited = True
+                if self.timeout is not None and time() - start > self.timeout: return False
+                sleep(self.poll)
+            try:
+                if not isdir(dirname(self.path)): makedirs(dirname(self.path))
+            except OSError: pass
+            try: self.file = open(self.path, 'a')
+            except (IOError, OSError): self.file = None
+            while self.file is not None:
+                try:
+                    lockf(self.file, LOCK_EX | LOCK_NB)
+                    break
+                except (IOError, OSError):
+                    self.waited = True
+                    if self.timeout is not None and time() - start > self.timeout:
+                        self.file.close()
+                        self.file = None
+                    else: sleep(self.poll)
+            if self.file is None: thread_lock.release()
+        return self.file is not None
+
+    def release(self):
+        '''Release the lock.'''
+        if self.file is not None:
+            try: lockf(self.file, LOCK_UN)
+            except (IOError, OSError): pass
+            self.file.close()
+            self.file = None
+            Lock.thread_locks[self.path].release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
@@ -20,10 +20,6 @@ import traceback
 import warnings
 from logging.handlers import TimedRotatingFileHandler
 
-from pygments import highlight
-from pygments.formatters import TerminalFormatter
-from pygments.lexers import get_lexer_by_name
-
 from .color_print import color_text
 
 
@@ -42,6 +38,10 @@ logging.Logger._print = print_log_level
 def print_exception_formatted(type, value, tb):
     """A custom hook for printing tracebacks with colours."""
 
+    from pygments import highlight
+    from pygments.formatters import TerminalFormatter
+    from pygments.lexers import get_lexer_by_name
+
     tbtext = ''.join(traceback.format_exception(type, value, tb))
     lexer = get_lexer_by_name('pytb', stripall=True)
     formatter = TerminalFormatter()
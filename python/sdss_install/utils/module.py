@@ -8,11 +8,17 @@
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import ast
 import string
+from json import dumps
 from os import environ
-from subprocess import Popen, PIPE
-from os.path import join, exists
+from os.path import join, exists, getmtime
 from re import search, compile
+from .cache import Cache, get_cache_dir
+from .execute import execute_command
+
+# ast.Index wraps subscripts before Python 3.9
+Index = getattr(ast, 'Index', ())
 
 
 class Module:
@@ -20,11 +26,18 @@ class Module:
     Replaces system module's python shell, which
     has poor pipe handling.'''
 
+    # Detected Modules installations, by detection key, shared by the
+    # Module instances of a process.
+    detected = dict()
+
     def __init__(self,logger=None,options=None):
         self.set_logger(logger=logger)
         self.set_options(options=options)
-        self.set_modules()
-        self.set_version()
+        self.set_detection_key()
+        if not self.load_detection():
+            self.set_modules()
+            self.set_version()
+            self.save_detection()
         self.set_version_major_minor_patch()
 
     def set_logger(self,logger=None):
@@ -44,6 +57,64 @@ class Module:
                 self.logger.error('Unable to set_options' +
                                   'self.options: {}'.format(self.options))
 
+    def set_detection_key(self):
+        '''
+            Set the key of the Modules detection cache from $MODULESHOME
+            (or --modules-home), the modification times of the lmod and
+            modulecmd.tcl commands and $TCLSH.
+        '''
+        self.detection_key = None
+        if self.ready:
+            modules_home = (self.options.modules_home if self.options.modules_home
+                            else environ.get('MODULESHOME'))
+            if modules_home:
+                commands = [join(modules_home, "libexec", "lmod"),
+                            join(modules_home, "modulecmd.tcl"),
+                            join(modules_home, "libexec", "modulecmd.tcl")]
+                mtimes = list()
+                for command in commands:
+                    try: mtimes.append(getmtime(command))
+                    except OSError: mtimes.append(None)
+                self.detection_key = dumps([modules_home, mtimes, environ.get('TCLSH')])
+
+    def get_detection_cache(self):
+        '''Return the on-disk Modules detection cache, or None.'''
+        cache_dir = get_cache_dir(options=self.options)
+        return Cache(directory=join(cache_dir,'modules')) if cache_dir else None
+
+    def load_detection(self):
+        '''
+            Set the Modules paths, flavour and version from the in-process or
+            on-disk detection cache. Return True if found.
+        '''
+        loaded = False
+        if self.ready and self.detection_key:
+            detection = Module.detected.get(self.detection_key)
+            if not detection:
+                cache = self.get_detection_cache()
+                detection = cache.get(key=self.detection_key) if cache else None
+            if detection:
+                self.modules_home = detection['modules_home']
+                self.modules_lang = detection['modules_lang']
+                self.tclsh = detection['tclsh']
+                self.version = detection['version']
+                self.set_ready()
+                loaded = bool(self.ready)
+                if loaded: Module.detected[self.detection_key] = detection
+                else: self.ready = bool(self.logger and self.options)
+        return loaded
+
+    def save_detection(self):
+        '''Save the detected Modules paths, flavour and version.'''
+        if self.ready and self.detection_key and self.version:
+            detection = {'modules_home': self.modules_home,
+                         'modules_lang': self.modules_lang,
+                         'tclsh': self.tclsh,
+                         'version': self.version}
+            Module.detected[self.detection_key] = detection
+            cache = self.get_detection_cache()
+            if cache: cache.set(key=self.detection_key,value=detection)
+
     def set_modules(self):
         self.set_modules_home()
         self.set_modules_lang()
@@ -74,10 +145,13 @@ class Module:
 
     def set_modules_lang(self):
         self.modules_lang = dict()
-        self.modules_lang['lmod'] = self.modules_home['lmod'] and exists(self.modules_home['lmod'])
-        self.modules_lang['lua'] = ( self.modules_lang['lmod'] and
-                                     self.modules_home['lua'] and exists(self.modules_home['lua']) )
-        self.modules_lang['tcl'] = self.modules_home['tcl'] and exists(self.modules_home['tcl'])
+        self.modules_lang['lmod'] = bool(self.modules_home.get('lmod') and
+                                         exists(self.modules_home['lmod']))
+        self.modules_lang['lua'] = bool(self.modules_lang['lmod'] and
+                                        self.modules_home.get('lua') and
+                                        exists(self.modules_home['lua']))
+        self.modules_lang['tcl'] = bool(self.modules_home.get('tcl') and
+                                        exists(self.modules_home['tcl']))
 
     def set_tclsh(self):
         '''Set tclsh exec directory.'''
@@ -102,15 +176,20 @@ class Module:
                       (self.tclsh and exists(self.tclsh) and self.modules_lang['tcl'])))
 
     def set_command(self, command=None, arguments=None):
+        '''
+            Set the modulecmd command, which prints the environment changes in
+            python syntax. The arguments are a string or a list of strings.
+        '''
         self.command = list()
         if self.ready:
             if command:
-                self.command = ([self.modules_home['lmod'], 'bash', command]
+                self.command = ([self.modules_home['lmod'], 'python', command]
                                 if self.modules_lang['lua'] else
                                 [self.tclsh, self.modules_home['tcl'], 'python', command]
                                 if self.modules_lang['tcl'] else None )
                 if self.command and arguments:
-                    self.command.append(join(arguments))
+                    self.command += (list(arguments) if isinstance(arguments,(list,tuple))
+                                     else [arguments])
             else:
                 self.ready = False
                 self.logger.error('Unable to set_command. ' +
@@ -118,27 +197,68 @@ class Module:
 
     def execute_command(self):
         if self.command:
-            proc = Popen(self.command, stdout=PIPE, stderr=PIPE)
-            if proc:
-                (self.stdout, self.stderr) = proc.communicate() if proc else (None,None)
-                self.returncode = proc.returncode if proc else None
-            else:
-                self.ready = False
-                self.logger.error('Unable to execute_command. ' +
-                                  'proc: {}.'.format(proc))
+            (self.stdout, self.stderr, self.returncode) = execute_command(command=self.command)
         else:
             self.ready = False
             self.logger.error('Unable to execute_command. ' +
                               'self.command: {}.'.format(self.command))
 
+    def get_environ(self):
+        '''
+            Return the environment changes printed by the last executed command,
+            as a dict of variable name to value, or to None if it is unset.
+        '''
+        stdout = (self.stdout.decode('utf-8','replace')
+                  if isinstance(self.stdout,bytes) else self.stdout)
+        return self.parse_environ(out=stdout)
+
+    @staticmethod
+    def parse_environ(out=None):
+        '''
+            Parse the os.environ assignments and deletions of modulecmd python
+            output, without executing it. Other statements are ignored.
+        '''
+        environ_changes = dict()
+        try: statements = ast.parse(out).body if out else list()
+        except SyntaxError:
+            statements = list()
+            for line in out.splitlines():
+                try: statements += ast.parse(line.strip()).body
+                except SyntaxError: pass
+        for statement in statements:
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+                key = Module.get_environ_key(statement.targets[0])
+                if key:
+                    try: environ_changes[key] = str(ast.literal_eval(statement.value))
+                    except ValueError: pass
+            elif isinstance(statement, ast.Delete):
+                for target in statement.targets:
+                    key = Module.get_environ_key(target)
+                    if key: environ_changes[key] = None
+        return environ_changes
+
+    @staticmethod
+    def get_environ_key(node=None):
+        '''Return the variable name of an os.environ['NAME'] node, otherwise None.'''
+        key = None
+        if (isinstance(node, ast.Subscript) and
+            isinstance(node.value, ast.Attribute) and node.value.attr == 'environ' and
+            isinstance(node.value.value, ast.Name) and node.value.value.id == 'os'):
+            index = node.slice.value if isinstance(node.slice, Index) else node.slice
+            try: key = ast.literal_eval(index)
+            except ValueError: key = None
+        return key if isinstance(key, str) else None
+
     def set_version(self):
         '''Set the Modules Release Tcl version string returned by modules --version.'''
         self.version = str()
         if self.ready:
             self.set_command("--version")
             self.execute_command()
-            self.version = (self.stderr.strip()
-                            if self.returncode == 0 and self.stderr else None)
+            stderr = (self.stderr.decode('utf-8','replace')
+                      if isinstance(self.stderr,bytes) else self.stderr)
+            self.version = (stderr.strip()
+                            if self.returncode == 0 and stderr else None)
 
     def set_version_major_minor_patch(self):
         '''From the the Modules Release Tcl version string, set version major, minor, and patch.'''
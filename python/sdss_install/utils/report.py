@@ -0,0 +1,208 @@
+# encoding: utf-8
+#
+# @Filename: report.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from datetime import datetime
+from functools import wraps
+from json import dump
+from resource import getrusage, RUSAGE_CHILDREN, RUSAGE_SELF
+from sys import argv
+from threading import Lock, local
+from time import time
+
+
+# ru_inblock and ru_oublock count 512 byte blocks
+BLOCK_SIZE = 512
+
+# The network interface counters of the network namespace of the process
+NET_DEV = '/proc/self/net/dev'
+
+
+def get_network_bytes(filename=NET_DEV):
+    '''Return the bytes received and sent by the network interfaces, except
+    loopback, or (0, 0) if they are not available, e.g. outside Linux.'''
+    (received, sent) = (0, 0)
+    try:
+        with open(filename) as file: lines = file.readlines()[2:]
+    except (IOError, OSError): lines = list()
+    for line in lines:
+        (interface, _, counters) = line.partition(':')
+        counters = counters.split()
+        if interface.strip() != 'lo' and len(counters) > 8:
+            received += int(counters[0])
+            sent += int(counters[8])
+    return (received, sent)
+
+
+def get_usage():
+    '''Return the resource usage of the process and its finished subprocesses,
+    and the network bytes of the host.'''
+    (received, sent) = get_network_bytes()
+    usage = {'network_received_bytes': received, 'network_sent_bytes': sent}
+    for rusage in (getrusage(RUSAGE_SELF), getrusage(RUSAGE_CHILDREN)):
+        for (key, value) in (('cpu_user', rusage.ru_utime),
+                             ('cpu_system', rusage.ru_stime),
+                             ('read_bytes', rusage.ru_inblock * BLOCK_SIZE),
+                             ('write_bytes', rusage.ru_oublock * BLOCK_SIZE)):
+            usage[key] = usage.get(key, 0) + value
+    return usage
+
+
+def format_bytes(size):
+    '''Return the byte count size in human readable units.'''
+    for unit in ('B', 'K', 'M', 'G'):
+        if size < 1024: break
+        size /= 1024
+    return '{0:.0f}{1}'.format(size, unit) if unit == 'B' else '{0:.1f}{1}'.format(size, unit)
+
+
+class Report:
+    '''Record the wall time, CPU time, subprocesses and bytes of each phase of a run.
+
+    Phases may be nested and may run in several threads; each subprocess is
+    attributed to the innermost phase of the thread which runs it. The CPU
+    time and filesystem bytes of a phase are those of the whole process and
+    its subprocesses, so they include concurrent phases of other threads.
+    The network bytes of a phase are the traffic of the network interfaces
+    of the host during the phase, so they also include that of any other
+    process, and are not known for single subprocesses.
+    '''
+
+    def __init__(self):
+        self.start = time()
+        self.usage = get_usage()
+        self.phases = list()
+        self.commands = list()
+        self.reports = dict()
+        self.lock = Lock()
+        self.local = local()
+
+    def get_stack(self):
+        '''Return the stack of running phases of the current thread.'''
+        if not hasattr(self.local, 'stack'): self.local.stack = list()
+        return self.local.stack
+
+    def start_phase(self, name=None):
+        '''Start the phase name and return its record.'''
+        stack = self.get_stack()
+        phase = {'name': name,
+                 'parent': stack[-1]['name'] if stack else None,
+                 'start': round(time() - self.start, 3),
+                 'wall': None,
+                 'commands': 0,
+                 'output_bytes': 0}
+        phase['usage'] = get_usage()
+        phase['time'] = time()
+        with self.lock: self.phases.append(phase)
+        stack.append(phase)
+        return phase
+
+    def stop_phase(self, phase=None):
+        '''Stop the given phase and record its totals.'''
+        stack = self.get_stack()
+        if phase in stack: stack.remove(phase)
+        usage = get_usage()
+        phase['wall'] = round(time() - phase.pop('time'), 3)
+        for (key, value) in phase.pop('usage').items():
+            phase[key] = usage[key] - value
+            if key.startswith('cpu'): phase[key] = round(phase[key], 3)
+
+    def phase(self, method):
+        '''Decorate a method so that each call is recorded as a phase.'''
+        @wraps(method)
+        def wrapper(instance, *args, **kwargs):
+            phase = self.start_phase(name='{0}.{1}'.format(type(instance).__name__,
+                                                           method.__name__))
+            try: return method(instance, *args, **kwargs)
+            finally: self.stop_phase(phase)
+        return wrapper
+
+    def add_command(self, command=None, start=None, returncode=None,
+                    output_bytes=0, rusage=None):
+        '''Record a finished subprocess, with its resource usage if known.'''
+        stack = self.get_stack()
+        record = {'command': ' '.join(command) if command else None,
+                  'phase': stack[-1]['name'] if stack else None,
+                  'start': round(start - self.start, 3) if start else None,
+                  'wall': round(time() - start, 3) if start else None,
+                  'returncode': returncode,
+                  'output_bytes': output_bytes}
+        if rusage is not None:
+            record['cpu_user'] = round(rusage.ru_utime, 3)
+            record['cpu_system'] = round(rusage.ru_stime, 3)
+            record['read_bytes'] = rusage.ru_inblock * BLOCK_SIZE
+            record['write_bytes'] = rusage.ru_oublock * BLOCK_SIZE
+        with self.lock:
+            self.commands.append(record)
+            for phase in stack:
+                phase['commands'] += 1
+                phase['output_bytes'] += output_bytes
+
+    def add_report(self, name=None, data=None):
+        '''Record the report data of the separate sdss_install process name.'''
+        with self.lock: self.reports[name] = data
+
+    def get_data(self):
+        '''Return the report as a dict.'''
+        usage = get_usage()
+        with self.lock:
+            phases = [phase for phase in self.phases if phase['wall'] is not None]
+            commands = list(self.commands)
+            reports = dict(self.reports)
+        total = {'wall': round(time() - self.start, 3),
+                 'commands': len(commands),
+                 'output_bytes': sum(c['output_bytes'] for c in commands)}
+        for (key, value) in self.usage.items():
+            total[key] = usage[key] - value
+            if key.startswith('cpu'): total[key] = round(total[key], 3)
+        data = {'argv': argv,
+                'date': datetime.fromtimestamp(self.start).isoformat(),
+                'total': total,
+                'phases': phases,
+                'commands': commands}
+        if reports: data['products'] = reports
+        return data
+
+    def get_summary(self):
+        '''Return the lines of a summary table of the phases and the total.'''
+        data = self.get_data()
+        row = '{0:<40} {1:>9} {2:>9} {3:>8} {4:>9} {5:>9} {6:>9}'
+        lines = [row.format('Phase', 'Wall (s)', 'CPU (s)', 'Commands', 'Output', 'Disk I/O',
+                            'Network')]
+        depth = dict()
+        for phase in data['phases'] + [dict(data['total'], name='Total')]:
+            depth[phase['name']] = (depth.get(phase.get('parent'), -1) + 1
+                                    if phase.get('parent') else 0)
+            lines.append(row.format('  ' * depth[phase['name']] + phase['name'],
+                                    '{0:.2f}'.format(phase['wall']),
+                                    '{0:.2f}'.format(phase['cpu_user'] + phase['cpu_system']),
+                                    phase['commands'],
+                                    format_bytes(phase['output_bytes']),
+                                    format_bytes(phase['read_bytes'] + phase['write_bytes']),
+                                    format_bytes(phase['network_received_bytes'] +
+                                                 phase['network_sent_bytes'])))
+        return lines
+
+    def write(self, filename=None):
+        '''Write the report to the JSON file filename.'''
+        with open(filename, 'w') as file:
+            dump(self.get_data(), file, indent=2)
+
+    def finalize(self, logger=None, filename=None):
+        '''Log the summary table, at info level if a report filename is given,
+        and write the report to filename.'''
+        log = logger.info if filename else logger.debug
+        for line in self.get_summary(): log(line)
+        if filename:
+            try:
+                self.write(filename=filename)
+                logger.info('Wrote report {}'.format(filename))
+            except (IOError, OSError) as e:
+                logger.error('Unable to write report {0}: {1}'.format(filename, e))
+
+
+report = Report()
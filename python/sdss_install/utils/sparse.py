@@ -0,0 +1,108 @@
+# encoding: utf-8
+#
+# @Filename: sparse.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from os.path import dirname, join
+from re import split
+
+
+# Always fetched, since it holds the module file and etc/config.ini
+REQUIRED_PATHS = ['etc']
+
+
+def get_paths(value=None):
+    '''Return the list of paths of an option value, a list or a string of
+    paths separated by commas or whitespace, relative to the product root.'''
+    values = value if isinstance(value, (list, tuple)) else [value] if value else list()
+    paths = list()
+    for value in values:
+        for path in split(r'[,\s]+', value):
+            path = path.strip('/')
+            if path and path not in paths: paths.append(path)
+    return paths
+
+
+def get_sparse_paths(options=None, config=None):
+    '''Return the dict of include and exclude paths of a sparse fetch, or None.
+
+    The paths are taken from the --include and --exclude options if given,
+    otherwise from the include and exclude options of the [sdss_install]
+    section of config, the text of the product etc/config.ini.
+    '''
+    include = get_paths(getattr(options, 'include', None))
+    exclude = get_paths(getattr(options, 'exclude', None))
+    if not (include or exclude) and config:
+        try: from ConfigParser import RawConfigParser
+        except ImportError: from configparser import RawConfigParser
+        parser = RawConfigParser()
+        try: parser.read_string(config)
+        except Exception: parser = None
+        if parser and parser.has_section('sdss_install'):
+            if parser.has_option('sdss_install', 'include'):
+                include = get_paths(parser.get('sdss_install', 'include'))
+            if parser.has_option('sdss_install', 'exclude'):
+                exclude = get_paths(parser.get('sdss_install', 'exclude'))
+    if include:
+        include = [path for path in REQUIRED_PATHS if path not in include] + include
+    exclude = [path for path in exclude if path not in REQUIRED_PATHS]
+    return {'include': include, 'exclude': exclude} if include or exclude else None
+
+
+def get_git_patterns(sparse=None):
+    '''Return the git sparse-checkout patterns of the given sparse paths.
+
+    With include paths, only the top-level files and the included paths are
+    checked out, otherwise everything but the excluded paths.
+    '''
+    patterns = ['/*']
+    if sparse['include']:
+        patterns += ['!/*/'] + ['/' + path for path in sparse['include']]
+    patterns += ['!/' + path for path in sparse['exclude']]
+    return patterns
+
+
+def get_svn_plan(sparse=None, list_directory=None):
+    '''Return the list of (path, depth) pairs which fetch the given sparse paths.
+
+    The paths are relative to the product root, '' being the root itself,
+    and the depth is 'empty', 'files' or 'infinity'. Each path follows its
+    parent directory. Directories holding excluded paths are fetched with
+    depth 'files' and their subdirectories one by one, as listed by the
+    list_directory(path) function, which returns the subdirectory names
+    of path, or None on error. Excluded paths must be directories.
+
+    With sparse None, this is the list of the top-level subdirectories,
+    after the top-level files. Return None if a listing fails.
+    '''
+    include = sparse['include'] if sparse else list()
+    exclude = sparse['exclude'] if sparse else list()
+    plan = list()
+
+    def add(path):
+        if path in exclude: return True
+        if path and not any(e.startswith(path + '/') for e in exclude):
+            plan.append((path, 'infinity'))
+            return True
+        plan.append((path, 'files'))
+        subdirs = list_directory(path)
+        return subdirs is not None and all(add(join(path, subdir) if path else subdir)
+                                           for subdir in subdirs)
+
+    if include:
+        plan.append(('', 'files'))
+        for path in include:
+            if any(path.startswith(other + '/') for other in include): continue
+            parent = dirname(path)
+            parents = list()
+            while parent:
+                parents.insert(0, parent)
+                parent = dirname(parent)
+            plan += [(parent, 'empty') for parent in parents
+                     if (parent, 'empty') not in plan]
+            if not add(path): return None
+    elif not add(''): return None
+    return plan
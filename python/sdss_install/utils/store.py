@@ -0,0 +1,117 @@
+# encoding: utf-8
+#
+# @Filename: store.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from hashlib import sha256
+from os import environ, link, listdir, lstat, makedirs, remove, rename, rmdir, walk
+from os.path import dirname, isdir, join
+from stat import S_ISREG, S_IMODE
+
+from .lock import Lock
+
+
+def get_store_dir(options=None):
+    '''Return the directory of the content-addressed store of the product root, or None.'''
+    root = getattr(options, 'root', None) if options else None
+    root = root if root else environ.get('SDSS_INSTALL_PRODUCT_ROOT')
+    return join(root, '.store') if root else None
+
+
+def get_digest(path=None, size=1 << 20):
+    '''Return the sha256 hex digest of the contents of the file path.'''
+    digest = sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(size), b''): digest.update(block)
+    return digest.hexdigest()
+
+
+class Store:
+    '''Content-addressed store of the files of install trees.
+
+    Each distinct file, by contents and permission bits, is kept once as a
+    blob, objects/<digest[:2]>/<digest[2:]>-<mode>, and the files of the
+    install trees are replaced by hardlinks to the blobs. Since hardlinks
+    share their modification time, the trees and the store must be on the
+    same filesystem and the deduplicated files must not be modified in
+    place. A blob which is only linked from the store is no longer used by
+    any install tree and is removed by collect().
+
+    Parameters:
+        directory (str):
+            The store directory, created if missing.
+    '''
+
+    def __init__(self, directory=None):
+        self.directory = directory
+
+    def get_path(self, path=None, st=None):
+        '''Return the blob of the file path, of lstat result st.'''
+        digest = get_digest(path)
+        return join(self.directory, 'objects', digest[:2],
+                    '{0}-{1:o}'.format(digest[2:], S_IMODE(st.st_mode)))
+
+    def add(self, path=None, st=None):
+        '''Replace the file path by a hardlink to its blob, adding the blob if
+        missing. Return the number of bytes saved.'''
+        saved = 0
+        blob = self.get_path(path=path, st=st)
+        try: blob_st = lstat(blob)
+        except OSError: blob_st = None
+        if blob_st is None:
+            if not isdir(dirname(blob)): makedirs(dirname(blob))
+            link(path, blob)
+        elif blob_st.st_ino != st.st_ino or blob_st.st_dev != st.st_dev:
+            tmp_path = path + '.store.tmp'
+            link(blob, tmp_path)
+            try: rename(tmp_path, path)
+            except OSError:
+                remove(tmp_path)
+                raise
+            saved = st.st_size
+        return saved
+
+    def dedup(self, tree=None, select=None):
+        '''Deduplicate the regular files of tree, or those for which
+        select(path) is true, against the store. Return the number of files
+        and bytes deduplicated and the number of files which could not be
+        linked, e.g. across filesystems.'''
+        (files, saved, failed) = (0, 0, 0)
+        with Lock(join(self.directory, '.lock')):
+            for (dirpath, dirnames, filenames) in walk(tree):
+                if '.git' in dirnames: dirnames.remove('.git')
+                for filename in filenames:
+                    path = join(dirpath, filename)
+                    if select and not select(path): continue
+                    try:
+                        st = lstat(path)
+                        if not S_ISREG(st.st_mode): continue
+                        size = self.add(path=path, st=st)
+                    except (IOError, OSError):
+                        failed += 1
+                    else:
+                        files += 1 if size else 0
+                        saved += size
+        return (files, saved, failed)
+
+    def collect(self, test=False):
+        '''Remove the blobs which are no longer linked from any install tree,
+        unless test. Return the number of blobs and bytes removed.'''
+        (blobs, size) = (0, 0)
+        objects = join(self.directory, 'objects')
+        if isdir(objects):
+            with Lock(join(self.directory, '.lock')):
+                for prefix in sorted(listdir(objects)):
+                    prefix_dir = join(objects, prefix)
+                    for name in listdir(prefix_dir):
+                        path = join(prefix_dir, name)
+                        st = lstat(path)
+                        if st.st_nlink == 1:
+                            if not test: remove(path)
+                            blobs += 1
+                            size += st.st_size
+                    if not test and not listdir(prefix_dir): rmdir(prefix_dir)
+        return (blobs, size)
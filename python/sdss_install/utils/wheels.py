@@ -0,0 +1,72 @@
+# encoding: utf-8
+#
+# @Filename: wheels.py
+# @License: BSD 3-Clause
+# @Copyright SDSS 2026
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from glob import glob
+from os import makedirs, rename
+from os.path import basename, dirname, isdir, join
+from shutil import copy2, rmtree
+from sys import implementation
+from sysconfig import get_config_var
+from tempfile import mkdtemp
+
+from .lock import Lock
+
+
+def get_abi():
+    '''Return the ABI tag of the running interpreter, e.g. cpython-311-x86_64-linux-gnu.'''
+    return get_config_var('SOABI') or implementation.cache_tag
+
+
+class Wheels:
+    '''Store of the wheels built from the tagged Python products.
+
+    The wheels of a product version are kept in the directory
+    <product>/<version>/<abi>-<revision>, so a wheel is only reused by the
+    interpreters which can import its extensions, and a moved tag is built
+    again. The wheels are copied to a temporary directory first and renamed
+    into place, so concurrent installs never see a partial entry.
+    '''
+
+    def __init__(self, directory=None):
+        self.directory = directory
+
+    def get_path(self, key=None):
+        '''Return the directory of the wheels of key, a dict of the product,
+        version, abi and revision.'''
+        if not (self.directory and key): return None
+        name = key['abi'] + ('-' + key['revision'][:12] if key.get('revision') else '')
+        return join(self.directory, key['product'], key['version'], name)
+
+    def get(self, key=None):
+        '''Return the list of the cached wheels of key, empty if there are none.'''
+        path = self.get_path(key=key)
+        return sorted(glob(join(path, '*.whl'))) if path and isdir(path) else list()
+
+    def store(self, key=None, wheels=None):
+        '''Store the wheel files as the wheels of key. Return True on success.'''
+        stored = False
+        path = self.get_path(key=key)
+        if path and wheels:
+            try:
+                if not isdir(dirname(path)): makedirs(dirname(path))
+            except OSError: pass
+            with Lock(path + '.lock'):
+                if isdir(path): stored = True
+                else:
+                    tmp_path = None
+                    try:
+                        tmp_path = mkdtemp(dir=dirname(path), suffix='.tmp')
+                        for wheel in wheels: copy2(wheel, join(tmp_path, basename(wheel)))
+                        rename(tmp_path, path)
+                        tmp_path = None
+                        stored = True
+                    except (IOError, OSError):
+                        stored = False
+                    finally:
+                        if tmp_path: rmtree(tmp_path, ignore_errors=True)
+        return stored
@@ -37,8 +37,9 @@ def run(packages, install_requires):
           include_package_data=True,
           packages=packages,
           install_requires=install_requires,
+          python_requires='>=3.7',
           package_dir={'': 'python'},
-          scripts=['bin/sdss_install'],
+          scripts=['bin/sdss_install','bin/sdss_install_mirror'],
           classifiers=[
               'Development Status :: 4 - Beta',
               'Intended Audience :: Science/Research',
@@ -46,8 +47,9 @@ def run(packages, install_requires):
               'Natural Language :: English',
               'Operating System :: OS Independent',
               'Programming Language :: Python',
-              'Programming Language :: Python :: 2.6',
-              'Programming Language :: Python :: 2.7',
+              'Programming Language :: Python :: 3',
+              'Programming Language :: Python :: 3 :: Only',
+              'Programming Language :: Python :: 3.7',
               'Topic :: Documentation :: Sphinx',
               'Topic :: Software Development :: Libraries :: Python Modules',
           ],